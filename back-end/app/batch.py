@@ -0,0 +1,263 @@
+"""Batch reconciliation from the command line.
+
+Runs ReconciliationService over many (provider, bank, recon_type) pairs on a
+process pool and writes, per pair, the Excel report and a JSON summary:
+
+    python -m app.batch --input-dir files/ --output-dir out/ --workers 8
+    python -m app.batch --manifest pairs.csv --output-dir out/
+
+Pairs come from a manifest (CSV with `provider,bank,recon_type[,name]`
+columns, or a JSON list of objects with the same keys; relative paths are
+resolved against the manifest's directory) or from a directory scan, where
+`NAME.provider.EXT` and `NAME.bank.EXT` form one pair and the recon type
+is the name of the folder holding them when that is a known recon type
+(e.g. `files/tele/2025-01-01.provider.xlsx`), else `--recon-type`.
+With `--mode full` the reports also list the provider rows missing in the
+bank file.
+
+Each pair's summary JSON is written last, atomically, and records the
+input files' sizes and modification times. Re-running the same command
+after a crash skips every pair whose summary is present and whose inputs
+are unchanged; failed pairs are retried. `--force` reprocesses everything.
+"""
+import argparse
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app import config
+from app.services.profiles import get_registry
+from app.services.reconciliation import RECON_MODES
+from app.utils.log import configure_logging
+
+# Named explicitly: run as `python -m app.batch` the module is __main__, outside the `app` logger
+logger = logging.getLogger("app.batch")
+
+SUMMARY_VERSION = 1
+BATCH_SUMMARY_FILE = "batch_summary.json"
+PAIR_SIDES = ("provider", "bank")
+
+
+class BatchPair:
+
+    def __init__(self, name: str, provider: str, bank: str, recon_type: str):
+        self.name = name
+        self.provider = os.path.abspath(provider)
+        self.bank = os.path.abspath(bank)
+        self.recon_type = str(recon_type).lower().strip()
+
+    def output_paths(self, output_dir: str):
+        """(report_path, summary_path) for this pair, grouped by recon type."""
+        base = os.path.join(output_dir, self.recon_type, self.name)
+        return base + ".xlsx", base + ".json"
+
+    def input_stats(self) -> dict:
+        stats = {}
+        for side in PAIR_SIDES:
+            path = getattr(self, side)
+            st = os.stat(path)
+            stats[side] = {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        return stats
+
+
+def read_manifest(path: str, default_recon_type: str) -> list:
+    base = os.path.dirname(os.path.abspath(path))
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    else:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            entries = list(csv.DictReader(f))
+
+    pairs = []
+    for i, entry in enumerate(entries, start=1):
+        entry = {str(k).strip().lower(): v for k, v in entry.items()}
+        try:
+            provider, bank = entry["provider"], entry["bank"]
+        except KeyError as e:
+            raise ValueError(f"Manifest entry {i} is missing {e}")
+        recon_type = entry.get("recon_type") or default_recon_type
+        name = entry.get("name") or os.path.splitext(os.path.basename(bank))[0]
+        pairs.append(BatchPair(name, os.path.join(base, provider), os.path.join(base, bank), recon_type))
+    return pairs
+
+
+def scan_directory(input_dir: str, default_recon_type: str) -> list:
+    """Pairs `NAME.provider.EXT` with `NAME.bank.EXT` files anywhere under `input_dir`."""
+    known = set(get_registry().names())
+    found = {}
+    for root, _, files in os.walk(input_dir):
+        for filename in files:
+            stem, _ = os.path.splitext(filename)
+            name, _, side = stem.rpartition(".")
+            if not name or side.lower() not in PAIR_SIDES:
+                continue
+            folder = os.path.basename(root).lower()
+            recon_type = folder if folder in known else default_recon_type
+            found.setdefault((recon_type, name), {})[side.lower()] = os.path.join(root, filename)
+
+    pairs = []
+    for (recon_type, name), sides in sorted(found.items()):
+        missing = [side for side in PAIR_SIDES if side not in sides]
+        if missing:
+            logger.warning("Skipping pair without a %s file", " or ".join(missing),
+                           extra={"recon_type": recon_type, "pair": name})
+            continue
+        pairs.append(BatchPair(name, sides["provider"], sides["bank"], recon_type))
+    return pairs
+
+
+def is_done(pair: BatchPair, output_dir: str, mode: str = "left") -> bool:
+    """True when a successful summary exists for the same, unchanged inputs and mode (and its report is there)."""
+    report_path, summary_path = pair.output_paths(output_dir)
+    try:
+        with open(summary_path, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (
+        summary.get("version") == SUMMARY_VERSION
+        and summary.get("status") == "done"
+        and summary.get("recon_type") == pair.recon_type
+        and summary.get("mode", "left") == mode
+        and summary.get("inputs") == pair.input_stats()
+        and os.path.exists(report_path)
+    )
+
+
+def _write_json_atomic(path: str, content: dict):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(content, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def _init_worker():
+    # Each batch worker is already a process: parse the two files of a pair on threads
+    config.PARSE_POOL_KIND = "thread"
+    configure_logging()
+
+
+def run_pair(pair: BatchPair, output_dir: str, engine: str | None = None, mode: str = "left") -> dict:
+    """Reconciles one pair and writes its report and summary; runs inside a pool worker."""
+    from app.services.cache import ParsedFrameCache
+    from app.services.reconciliation import ReconciliationService, status_counts
+
+    report_path, summary_path = pair.output_paths(output_dir)
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    summary = {
+        "version": SUMMARY_VERSION,
+        "name": pair.name,
+        "recon_type": pair.recon_type,
+        "mode": mode,
+        "inputs": pair.input_stats(),
+        "report": report_path,
+    }
+    started = time.perf_counter()
+    tmp_report = f"{report_path}.{os.getpid()}.tmp.xlsx"
+    try:
+        with open(pair.provider, "rb") as f:
+            eth_content = f.read()
+        with open(pair.bank, "rb") as f:
+            zzb_content = f.read()
+
+        # Every file is read once per run (the summaries make re-runs skip it), so caching it would only fill the disk
+        service = ReconciliationService(cache=ParsedFrameCache(enabled=False))
+        result_df = service.process_files(eth_content, zzb_content, pair.recon_type, engine, mode)
+        del eth_content, zzb_content
+        service.write_excel_report(result_df, tmp_report, pair.recon_type, mode=mode)
+        os.replace(tmp_report, report_path)
+
+        summary.update(status="done", rows=len(result_df), summary=status_counts(result_df))
+    except Exception as e:
+        logger.exception("Pair failed", extra={"recon_type": pair.recon_type, "pair": pair.name})
+        summary.update(status="failed", error=f"{type(e).__name__}: {e}")
+        if os.path.exists(tmp_report):
+            os.remove(tmp_report)
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    _write_json_atomic(summary_path, summary)
+    return summary
+
+
+def run_batch(pairs: list, output_dir: str, workers: int, engine: str | None = None, force: bool = False,
+              mode: str = "left") -> dict:
+    os.makedirs(output_dir, exist_ok=True)
+    names = [(p.recon_type, p.name) for p in pairs]
+    duplicates = {n for n in names if names.count(n) > 1}
+    if duplicates:
+        raise ValueError(f"Pairs must have unique names per recon type, repeated: {sorted(duplicates)}")
+
+    pending = [p for p in pairs if force or not is_done(p, output_dir, mode)]
+    skipped = len(pairs) - len(pending)
+    logger.info("Batch started", extra={"pairs": len(pairs), "skipped": skipped, "pending": len(pending),
+                                         "workers": workers})
+
+    results = []
+    started = time.perf_counter()
+    if pending:
+        # spawn: same behaviour on Linux and Windows, and no fork of a process holding threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker) as executor:
+            futures = {executor.submit(run_pair, pair, output_dir, engine, mode): pair for pair in pending}
+            for done, future in enumerate(as_completed(futures), start=1):
+                pair = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:  # the worker process itself died
+                    result = {"name": pair.name, "recon_type": pair.recon_type, "status": "failed",
+                              "error": f"{type(e).__name__}: {e}"}
+                results.append(result)
+                outcome = ({"summary": result.get("summary")} if result["status"] == "done"
+                           else {"error": result.get("error")})
+                logger.info("Pair %s", result["status"], extra={"recon_type": pair.recon_type, "pair": pair.name,
+                                                               "progress": f"{done}/{len(pending)}", **outcome})
+
+    failed = [r for r in results if r["status"] != "done"]
+    batch = {
+        "pairs": len(pairs),
+        "skipped": skipped,
+        "done": len(results) - len(failed),
+        "failed": len(failed),
+        "seconds": round(time.perf_counter() - started, 3),
+        "failures": [{"recon_type": r["recon_type"], "name": r["name"], "error": r.get("error")} for r in failed],
+    }
+    _write_json_atomic(os.path.join(output_dir, BATCH_SUMMARY_FILE), batch)
+    return batch
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.batch", description="Reconcile many file pairs in parallel.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help="CSV or JSON list of provider,bank,recon_type[,name] entries")
+    source.add_argument("--input-dir", help="directory of NAME.provider.EXT / NAME.bank.EXT files")
+    parser.add_argument("--output-dir", required=True, help="where reports and summaries are written")
+    parser.add_argument("--recon-type", default="atm", help="recon type when the manifest or folder gives none")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="worker processes")
+    parser.add_argument("--engine", default=None, help="workbook reader: auto, calamine or openpyxl")
+    parser.add_argument("--force", action="store_true", help="reprocess pairs that already have a summary")
+    parser.add_argument("--mode", default="left", choices=RECON_MODES,
+                        help="full: also report provider rows missing in the bank file")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    if args.manifest:
+        pairs = read_manifest(args.manifest, args.recon_type)
+    else:
+        pairs = scan_directory(args.input_dir, args.recon_type)
+    if not pairs:
+        logger.error("No file pairs found", extra={"source": args.manifest or args.input_dir})
+        return 1
+
+    batch = run_batch(pairs, args.output_dir, max(1, args.workers), args.engine, args.force, args.mode)
+    logger.info("Batch finished in %ss: %s reconciled, %s skipped, %s failed",
+                batch["seconds"], batch["done"], batch["skipped"], batch["failed"])
+    return 1 if batch["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
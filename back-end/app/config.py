@@ -0,0 +1,112 @@
+"""Runtime settings for the reconciliation service, read from the environment"""
+import os
+import tempfile
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Environment variable {name} must be an integer, got {value!r}")
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Environment variable {name} must be a number, got {value!r}")
+
+
+# Pool used to parse the provider and bank uploads side by side.
+# "thread" (default) hands the parsed DataFrames over without copies;
+# "process" runs the CPU-bound Excel readers in parallel, at the cost of
+# pickling every parsed frame back and spawning the children on first use.
+PARSE_POOL_KIND = os.getenv("RECON_PARSE_POOL", "thread").strip().lower()
+PARSE_POOL_SIZE = _env_int("RECON_PARSE_WORKERS", 2)
+
+# Pool the API endpoints hand CPU-bound reconcile work to, so the event loop stays free
+RECON_POOL_SIZE = _env_int("RECON_WORKERS", os.cpu_count() or 2)
+# Reconciles running at once in one server process; later requests wait up to
+# RECON_QUEUE_TIMEOUT seconds for a slot and are then turned away with 503
+MAX_CONCURRENT_RECONCILES = _env_int("RECON_MAX_CONCURRENT", RECON_POOL_SIZE)
+QUEUE_TIMEOUT_SECONDS = _env_float("RECON_QUEUE_TIMEOUT", 30.0)
+
+# Largest request body in megabytes (both uploads together, 0 = no limit); the
+# streaming endpoint spools to disk and has its own, higher limit
+MAX_UPLOAD_MB = _env_int("RECON_MAX_UPLOAD_MB", 256)
+MAX_STREAM_UPLOAD_MB = _env_int("RECON_MAX_STREAM_UPLOAD_MB", 4096)
+
+# Default reader for xlsx/xls uploads: "auto" (python-calamine when installed), "calamine" or "openpyxl"
+EXCEL_ENGINE = os.getenv("RECON_EXCEL_ENGINE", "auto").strip().lower()
+
+# Streaming mode (/api/v1/reconcile/stream): uploads are spooled to disk and read in chunks
+SPOOL_DIR = os.getenv("RECON_SPOOL_DIR") or None  # None -> system temp dir
+STREAM_CHUNK_ROWS = _env_int("RECON_STREAM_CHUNK_ROWS", 50_000)
+# Ceiling for the in-memory provider key index, in megabytes
+STREAM_MEMORY_LIMIT_MB = _env_int("RECON_STREAM_MEMORY_MB", 512)
+
+# Content-addressed cache of parsed + renamed uploads (Parquet files, LRU-evicted by total size)
+CACHE_ENABLED = os.getenv("RECON_CACHE_ENABLED", "1").strip().lower() not in ("0", "false", "no", "off")
+CACHE_DIR = os.getenv("RECON_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "recon-cache")
+CACHE_MAX_MB = _env_int("RECON_CACHE_MAX_MB", 1024)
+
+# Background reconciliation jobs (/api/v1/jobs)
+JOB_WORKERS = _env_int("RECON_JOB_WORKERS", 2)
+# Finished jobs (and their merge results) are dropped after this many seconds
+JOB_TTL_SECONDS = _env_int("RECON_JOB_TTL_SECONDS", 3600)
+# Job records and merge results (Arrow IPC files), shared by all server
+# processes. The directory must be owned by the service user with mode 0700
+JOB_DIR = os.getenv("RECON_JOB_DIR") or os.path.join(tempfile.gettempdir(), "recon-jobs")
+# Upper bound on jobs kept in JOB_DIR; the oldest finished jobs go first
+JOB_MAX_STORED = _env_int("RECON_JOB_MAX_STORED", 50)
+# Jobs queued or running in one server process, each holding its two uploads in
+# memory; further submissions are turned away with 503
+JOB_MAX_PENDING = _env_int("RECON_JOB_MAX_PENDING", 4)
+
+# Mismatch rows per page of /api/v1/jobs/{id}/mismatches (default) and of the
+# reconcile endpoints when a `limit` is sent (maximum)
+MISMATCH_PAGE_SIZE = _env_int("RECON_MISMATCH_PAGE_SIZE", 1000)
+MISMATCH_PAGE_MAX = _env_int("RECON_MISMATCH_PAGE_MAX", 10_000)
+
+# YAML file describing the recon types (required columns, rename rules, keys, labels)
+PROFILES_PATH = os.getenv("RECON_PROFILES_PATH") or os.path.join(os.path.dirname(__file__), "recon_profiles.yaml")
+
+# Keyed pairs whose amounts differ by more than the larger of these tolerances are
+# flagged AMOUNT_MISMATCH (percent is relative to the larger of the two amounts).
+# Profiles can override both with `amount_tolerance`.
+AMOUNT_TOLERANCE_ABS = _env_float("RECON_AMOUNT_TOLERANCE", 0.0)
+AMOUNT_TOLERANCE_PCT = _env_float("RECON_AMOUNT_TOLERANCE_PCT", 0.0)
+
+# Second matching pass (profile `probable_match` rules) over rows the exact key match left unmatched; opt-in
+PROBABLE_MATCH_ENABLED = os.getenv("RECON_PROBABLE_MATCH", "0").strip().lower() in ("1", "true", "yes", "on")
+# Blocks of the pass that would yield more bank x provider candidates than this are skipped
+PROBABLE_MAX_BLOCK_PAIRS = _env_int("RECON_PROBABLE_MAX_BLOCK_PAIRS", 10_000)
+
+# SQLite ledger of open (unmatched) items for incremental multi-day reconciliation (/api/v1/ledger)
+LEDGER_PATH = os.getenv("RECON_LEDGER_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "recon_ledger.sqlite"
+)
+# Seconds a ledger run waits for another run holding the ledger lock
+LEDGER_LOCK_TIMEOUT = _env_int("RECON_LEDGER_LOCK_TIMEOUT", 300)
+
+# Logging: level name and "text" (human readable) or "json" (one object per line, for log shippers)
+LOG_LEVEL = os.getenv("RECON_LOG_LEVEL", "INFO").strip().upper()
+LOG_FORMAT = os.getenv("RECON_LOG_FORMAT", "text").strip().lower()
+
+# Directory where each server process publishes its stage metrics, so /metrics
+# reports all gunicorn workers together (gunicorn.conf.py sets one up)
+METRICS_DIR = os.getenv("RECON_METRICS_DIR") or None
+
+# Production server (gunicorn.conf.py): preforked worker processes
+HTTP_BIND = os.getenv("RECON_HTTP_BIND", "0.0.0.0:8000")
+HTTP_WORKERS = _env_int("RECON_HTTP_WORKERS", 0)  # 0 -> one per CPU available to the container
+# Seconds a worker may stay unresponsive before it is restarted (a large reconcile can hold the GIL for a while)
+HTTP_TIMEOUT = _env_int("RECON_HTTP_TIMEOUT", 300)
+# Recycle a worker after this many requests to hand fragmented memory back (0 = never)
+HTTP_MAX_REQUESTS = _env_int("RECON_HTTP_MAX_REQUESTS", 0)
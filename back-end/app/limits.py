@@ -0,0 +1,110 @@
+"""Admission control for the API: request body size and concurrent reconciles.
+
+* UploadLimitMiddleware turns away request bodies over the configured size
+  with 413: at once when Content-Length says so, otherwise as soon as the
+  body read so far passes the limit, before it is spooled any further.
+* ReconcileLimiter caps the reconciles in flight in one server process.
+  A request waits for a slot for a bounded time and then gets 503 with a
+  Retry-After header, so one huge upload cannot queue up the others
+  behind it indefinitely.
+"""
+import asyncio
+import json
+import math
+from contextlib import asynccontextmanager
+
+from starlette.exceptions import HTTPException
+
+_BODY_METHODS = ("POST", "PUT", "PATCH")
+
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Upload too large, the limit is {limit // (1024 * 1024)} MB")
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware limiting request bodies to `default_mb`, or the `path_mb` entry of a path prefix."""
+
+    def __init__(self, app, default_mb: int, path_mb: dict | None = None):
+        self.app = app
+        self.default = default_mb * 1024 * 1024
+        # Longest prefix first
+        self.paths = sorted(((p, mb * 1024 * 1024) for p, mb in (path_mb or {}).items()), key=lambda x: -len(x[0]))
+
+    def limit_for(self, path: str) -> int:
+        for prefix, limit in self.paths:
+            if path.startswith(prefix):
+                return limit
+        return self.default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in _BODY_METHODS:
+            await self.app(scope, receive, send)
+            return
+        limit = self.limit_for(scope["path"])
+        if limit <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            error = _too_large(limit)
+            body = json.dumps({"detail": error.detail}).encode()
+            await send({"type": "http.response.start", "status": 413,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode()),
+                                    (b"connection", b"close")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside form parsing; FastAPI passes HTTPExceptions through as responses
+                    raise _too_large(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class ReconcileLimiter:
+    """Slots for reconciles running at once in this process."""
+
+    def __init__(self, limit: int, timeout: float):
+        self.limit = max(1, limit)
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+        # Created on first use, inside the serving event loop (after gunicorn forks)
+        self._semaphore: asyncio.Semaphore | None = None
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds a slot for the block; raises 503 when none frees up within the timeout."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=503,
+                detail=f"All {self.limit} reconcile slots of this worker are busy, retry later",
+                headers={"Retry-After": str(max(1, math.ceil(self.timeout)))},
+            )
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def to_dict(self) -> dict:
+        return {"in_flight": self.in_flight, "waiting": self.waiting, "max_concurrent": self.limit}
@@ -1,15 +1,71 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException,Form 
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import Depends, FastAPI, UploadFile, File, HTTPException,Form, Query, Request
+from fastapi.responses import StreamingResponse, FileResponse, Response
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from app.services.reconciliation import ReconciliationService
-import io
+from contextlib import asynccontextmanager
+from datetime import date
+from functools import lru_cache, partial
+from app.services.reconciliation import (
+    ReconciliationService, check_mode, mismatch_positions, status_counts, terminal_summary,
+)
+from app.services.pool import get_recon_executor, shutdown_executors
+from app.services.streaming import StreamingReconciler, spool_upload
+from app.services.profiles import get_registry
+from app.services.jobs import JobManager, JobQueueFullError, ReconciliationJob, DONE, FAILED
+from app.services.ledger import DuplicateRunError, IncrementalReconciler
+from app.services.metrics import PROMETHEUS_MEDIA_TYPE, collect_timings, registry, server_timing_header, stage
+from app.utils.normalize import normalize_result_frame
+from app.utils.readers import check_engine
+from app.utils.serialization import NDJSON_MEDIA_TYPE, dumps, iter_ndjson, records
+from app.utils.log import configure_logging
+from app.limits import ReconcileLimiter, UploadLimitMiddleware
+from app import config
+import asyncio
+import contextvars
+import importlib
+import logging
+import math
+import os
+import tempfile
+import time
 import pandas as pd
-import traceback 
 import json
-import datetime
 
-app = FastAPI(title="ZamZam Bank ARS Microservice")
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Imported lazily by the code that needs them; warm_up() loads them ahead of time
+PRELOAD_MODULES = ("xlsxwriter", "openpyxl", "python_calamine", "pyarrow.parquet")
+# Requests logged at DEBUG, so probes and scrapes do not flood the log
+QUIET_PATHS = ("/health/", "/metrics")
+
+readiness = {"ready": False}
+
+
+def warm_up():
+    """Loads the recon profiles and the optional readers / writers. gunicorn runs this in the
+    master before forking (see gunicorn.conf.py), so the workers share the loaded code."""
+    get_registry()
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and compile the recon profiles once, before the first request
+    get_registry()
+    readiness["ready"] = True
+    yield
+    readiness["ready"] = False
+    job_manager.shutdown()
+    shutdown_executors()
+
+
+app = FastAPI(title="ZamZam Bank ARS Microservice", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,83 +75,440 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    UploadLimitMiddleware,
+    default_mb=config.MAX_UPLOAD_MB,
+    path_mb={"/api/v1/reconcile/stream": config.MAX_STREAM_UPLOAD_MB},
+)
+
+
+
+@app.middleware("http")
+async def stage_timing(request: Request, call_next):
+    """Collects the stage timings of the request into a Server-Timing header and logs the request."""
+    started = time.perf_counter()
+    with collect_timings() as timings:
+        response = await call_next(request)
+    seconds = time.perf_counter() - started
+    response.headers["Server-Timing"] = server_timing_header(timings, seconds)
+    level = logging.DEBUG if request.url.path.startswith(QUIET_PATHS) else logging.INFO
+    logger.log(level, "%s %s", request.method, request.url.path, extra={
+        "status": response.status_code,
+        "duration_ms": round(seconds * 1000, 1),
+        "stages": {t.stage: round(t.seconds * 1000, 1) for t in timings},
+    })
+    return response
+
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 recon_service = ReconciliationService()
+job_manager = JobManager(recon_service)
+reconcile_limiter = ReconcileLimiter(config.MAX_CONCURRENT_RECONCILES, config.QUEUE_TIMEOUT_SECONDS)
+
+
+async def reconcile_slot():
+    """Dependency holding one of this worker's reconcile slots while the endpoint runs (503 when none frees up)."""
+    async with reconcile_limiter.slot():
+        yield
+
+
+ReconcileSlot = Depends(reconcile_slot, scope="function")
+
+
+@lru_cache(maxsize=None)
+def get_incremental_reconciler() -> IncrementalReconciler:
+    # Opened on first use so the ledger file is only created when the ledger API is used
+    return IncrementalReconciler(recon_service)
+
+
+async def run_in_recon_pool(func, *args, **kwargs):
+    """Run CPU-bound reconcile work on the shared pool instead of the event loop."""
+    loop = asyncio.get_running_loop()
+    # run_in_executor does not carry context variables over; the request's stage timings need them
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_recon_executor(), partial(context.run, func, *args, **kwargs))
+
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def write_report_file(result_df: pd.DataFrame, recon_type: str, mode: str = "left") -> str:
+    """Writes the Excel report to a temp file and returns its path."""
+    fd, path = tempfile.mkstemp(prefix="recon-report-", suffix=".xlsx", dir=config.SPOOL_DIR)
+    os.close(fd)
+    try:
+        recon_service.write_excel_report(result_df, path, recon_type, mode=mode)
+    except Exception:
+        remove_files([path])
+        raise
+    return path
+
+
+def report_file_response(path: str, recon_type: str) -> FileResponse:
+    """Streams the report from disk in chunks and deletes it once sent."""
+    return FileResponse(
+        path,
+        media_type=XLSX_MEDIA_TYPE,
+        filename=f"{recon_type}_reconciliation_report.xlsx",
+        background=BackgroundTask(remove_files, [path])
+    )
+
+
+def parse_mode(mode: str) -> str:
+    try:
+        return check_mode(mode)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def parse_engine(engine: str | None) -> str | None:
+    """The Excel engine sent with an upload; None (unset) leaves the choice to RECON_EXCEL_ENGINE."""
+    if engine is None or not engine.strip():
+        return None
+    try:
+        return check_engine(engine)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def json_response(content, status_code: int = 200) -> Response:
+    return Response(content=dumps(content), status_code=status_code, media_type="application/json")
+
+
+def mismatch_page(result_df: pd.DataFrame, positions, offset: int, limit: int | None) -> dict:
+    """One offset/limit page of mismatch rows (all of them from `offset` without a limit);
+    only the rows on the page are cleaned and encoded."""
+    page_positions = positions[offset:] if limit is None else positions[offset:offset + limit]
+    page = normalize_result_frame(result_df.iloc[page_positions])
+    total = int(len(positions))
+    next_offset = offset + len(page_positions)
+    return {
+        "offset": offset,
+        "limit": limit,
+        "total": total,
+        "next_offset": next_offset if next_offset < total else None,
+        "mismatches": records(page)
+    }
+
+
+def mismatch_ndjson_response(result_df: pd.DataFrame, positions, summary: dict) -> StreamingResponse:
+    """Streams every mismatch row as NDJSON, cleaning and encoding one chunk at a time."""
+    return StreamingResponse(
+        iter_ndjson(result_df.iloc[positions], prepare=normalize_result_frame),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"X-Recon-Summary": json.dumps(summary)}
+    )
+
+
+def build_reconcile_payload(result_df: pd.DataFrame, offset: int = 0, limit: int | None = None,
+                            recon_type: str | None = None, mode: str = "left") -> dict:
+    # Summary and preview stay cheap: counts come from the raw status column and
+    # only the preview rows and the requested mismatch page are cleaned. Without a
+    # `limit` every mismatch is returned, as the clients reading `mismatches` expect
+    with stage("json", recon_type, rows_in=len(result_df)) as timing:
+        page = mismatch_page(result_df, mismatch_positions(result_df), offset, limit)
+        preview = normalize_result_frame(result_df.head(10))
+        terminals = terminal_summary(result_df) if mode == "full" else None
+        timing.rows_out = len(page["mismatches"]) + len(preview)
+
+    payload = {
+        "status": "success",
+        "summary": status_counts(result_df),
+        "preview_data": records(preview),
+        "mismatch_total": page["total"],
+        "offset": page["offset"],
+        "limit": page["limit"],
+        "next_offset": page["next_offset"],
+        "mismatches": page["mismatches"]
+    }
+    if mode == "full":
+        payload["terminals"] = terminals
+    return payload
+
+
+@app.get("/api/v1/recon-types")
+async def recon_types():
+    registry = get_registry()
+    return {
+        "default": registry.default_profile,
+        "recon_types": [
+            {"recon_type": name, "provider_label": profile.provider_label}
+            for name, profile in registry.profiles.items()
+        ]
+    }
+
 
 @app.post("/api/v1/reconcile") 
 async def reconcile_process(
     eth_file: UploadFile = File(...),
     zzb_file: UploadFile = File(...),
-    recon_type: str = Form("atm")              
+    recon_type: str = Form("atm"),
+    engine: str | None = Form(None),
+    offset: int = Form(0, ge=0),
+    limit: int | None = Form(None, ge=1, le=config.MISMATCH_PAGE_MAX),
+    format: str = Form("json"),
+    mode: str = Form("left"),
+    _slot: None = ReconcileSlot
 ):
+    """Reconciles the two files. `format=json` (default) returns the summary, preview and
+    every mismatch, or one page of them when `limit` (and `offset`) is sent; `format=ndjson`
+    streams every mismatch row as newline-delimited JSON with the summary in the
+    X-Recon-Summary header.
+    `mode=full` also returns the provider rows missing in the bank file (MISSING_IN_BANK)
+    and the status counts per terminal id under `terminals`."""
+    mode = parse_mode(mode)
+    engine = parse_engine(engine)
     try:
         recon_type = recon_type.lower().strip()
         eth_content = await eth_file.read()
         zzb_content = await zzb_file.read()
 
-        result_df = recon_service.process_files(eth_content, zzb_content, recon_type)  
-
-        # --- UPDATED ROBUST CLEANUP START ---
-        
-        # 1. Convert specific date/category dtypes to string
-        date_cols = result_df.select_dtypes(include=['datetime', 'datetimetz', 'timedelta', 'category']).columns
-        for col in date_cols:
-            result_df[col] = result_df[col].astype(str)
-            
-        # 2. Fix 'Object' columns that might contain hidden datetime objects
-        # This is common in M-Pesa files where some cells are empty and others are dates
-        for col in result_df.select_dtypes(include=['object']).columns:
-            if result_df[col].apply(lambda x: isinstance(x, (pd.Timestamp, datetime.date))).any():
-                result_df[col] = result_df[col].astype(str)
-
-        # 3. Handle NaN and Infinite values
-        result_df_clean = result_df.fillna("").replace([float('inf'), float('-inf')], "")
-        
-        # 4. Filter for mismatches list (as we discussed before)
-        mismatches_df = result_df_clean[result_df_clean['Recon_Status'] != 'MATCHED']
-        mismatches_list = mismatches_df.to_dict(orient='records')
+        result_df = await run_in_recon_pool(
+            recon_service.process_files, eth_content, zzb_content, recon_type, engine, mode
+        )
 
-        summary = result_df_clean['Recon_Status'].value_counts().to_dict()
-        preview = result_df_clean.head(10).to_dict(orient='records')
-        # --- UPDATED ROBUST CLEANUP END ---
+        if format.lower().strip() == "ndjson":
+            return mismatch_ndjson_response(result_df, mismatch_positions(result_df), status_counts(result_df))
 
-        return JSONResponse(content={
-            "status": "success",
-            "summary": summary,
-            "preview_data": preview,
-            "mismatches": mismatches_list
-        })
+        payload = await run_in_recon_pool(build_reconcile_payload, result_df, offset, limit, recon_type, mode)
+        return json_response(payload)
 
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Reconcile failed", extra={"recon_type": recon_type})
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/v1/reconcile/download")
 async def reconcile_download(
     eth_file: UploadFile = File(...),
     zzb_file: UploadFile = File(...),
-    recon_type: str = Form("atm") 
+    recon_type: str = Form("atm"),
+    engine: str | None = Form(None),
+    mode: str = Form("left"),
+    _slot: None = ReconcileSlot
 ): 
+    mode = parse_mode(mode)
+    engine = parse_engine(engine)
     try:
         recon_type = recon_type.lower().strip()
         eth_content = await eth_file.read()
         zzb_content = await zzb_file.read()
 
         # Pass recon_type to process_files
-        result_df = recon_service.process_files(eth_content, zzb_content, recon_type)
+        result_df = await run_in_recon_pool(
+            recon_service.process_files, eth_content, zzb_content, recon_type, engine, mode
+        )
         
-        # Pass recon_type to generate_excel_report for dynamic labeling
-        excel_data = recon_service.generate_excel_report(result_df, recon_type)
+        # Pass recon_type to the report writer for dynamic labeling
+        report_path = await run_in_recon_pool(write_report_file, result_df, recon_type, mode)
+        return report_file_response(report_path, recon_type)
+
+    except Exception as e:
+        logger.exception("Report download failed", extra={"recon_type": recon_type})
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/reconcile/stream")
+async def reconcile_stream(
+    eth_file: UploadFile = File(...),
+    zzb_file: UploadFile = File(...),
+    recon_type: str = Form("atm"),
+    _slot: None = ReconcileSlot
+):
+    """Memory-bounded mode for very large files.
+
+    Uploads are spooled to disk and reconciled in chunks; the classified
+    bank rows come back as a CSV download and the status counts in the
+    X-Recon-Summary header.
+    """
+    temp_paths = []
+    try:
+        recon_type = recon_type.lower().strip()
+        eth_path = await run_in_recon_pool(spool_upload, eth_file.file)
+        temp_paths.append(eth_path)
+        zzb_path = await run_in_recon_pool(spool_upload, zzb_file.file)
+        temp_paths.append(zzb_path)
 
-        filename = f"{recon_type}_reconciliation_report.xlsx"
+        fd, output_path = tempfile.mkstemp(prefix="recon-result-", suffix=".csv", dir=config.SPOOL_DIR)
+        os.close(fd)
+        temp_paths.append(output_path)
 
-        return StreamingResponse(
-            io.BytesIO(excel_data),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"} 
+        reconciler = StreamingReconciler(recon_service)
+        result = await run_in_recon_pool(reconciler.reconcile, eth_path, zzb_path, output_path, recon_type)
+
+        return FileResponse(
+            output_path,
+            media_type="text/csv",
+            filename=f"{recon_type}_reconciliation.csv",
+            headers={"X-Recon-Summary": json.dumps(result["summary"])},
+            background=BackgroundTask(remove_files, temp_paths)
         )
 
     except Exception as e:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        remove_files(temp_paths)
+        logger.exception("Streaming reconcile failed", extra={"recon_type": recon_type})
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# --- Job API: reconcile once, read summary / mismatches / report from the stored result ---
+
+def get_job_or_404(job_id: str) -> ReconciliationJob:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found or expired")
+    return job
+
+
+async def get_finished_job(job_id: str) -> ReconciliationJob:
+    job = get_job_or_404(job_id)
+    if job.status == FAILED:
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != DONE:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job.status}")
+    # The result may have been written by another worker process
+    if not await run_in_recon_pool(job_manager.load_result, job):
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found or expired")
+    return job
+
+
+@app.post("/api/v1/jobs", status_code=202)
+async def create_job(
+    eth_file: UploadFile = File(...),
+    zzb_file: UploadFile = File(...),
+    recon_type: str = Form("atm"),
+    engine: str | None = Form(None),
+    mode: str = Form("left")
+):
+    mode = parse_mode(mode)
+    engine = parse_engine(engine)
+    recon_type = recon_type.lower().strip()
+    eth_content = await eth_file.read()
+    zzb_content = await zzb_file.read()
+
+    try:
+        job = job_manager.submit(eth_content, zzb_content, recon_type, engine, mode)
+    except JobQueueFullError as e:
+        retry_after = max(1, math.ceil(config.QUEUE_TIMEOUT_SECONDS))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(retry_after)})
+    return {"job_id": job.id, "status": job.status}
+
+
+@app.get("/api/v1/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = get_job_or_404(job_id)
+    return json_response(job.to_dict())
+
+
+def job_mismatch_page(job: ReconciliationJob, offset: int, limit: int) -> dict:
+    with stage("json", job.recon_type, rows_in=len(job.mismatch_positions)) as timing:
+        page = mismatch_page(job.result_df, job.mismatch_positions, offset, limit)
+        timing.rows_out = len(page["mismatches"])
+    return page
+
+
+@app.get("/api/v1/jobs/{job_id}/mismatches")
+async def job_mismatches(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(config.MISMATCH_PAGE_SIZE, ge=1, le=config.MISMATCH_PAGE_MAX),
+    format: str = Query("json")
+):
+    job = await get_finished_job(job_id)
+    if format.lower().strip() == "ndjson":
+        return mismatch_ndjson_response(job.result_df, job.mismatch_positions, job.summary)
+
+    page = await run_in_recon_pool(job_mismatch_page, job, offset, limit)
+    return json_response({"job_id": job.id, **page})
+
+
+@app.get("/api/v1/jobs/{job_id}/report")
+async def job_report(job_id: str, _slot: None = ReconcileSlot):
+    job = await get_finished_job(job_id)
+    try:
+        report_path = await run_in_recon_pool(write_report_file, job.result_df, job.recon_type, job.mode)
+    except Exception as e:
+        logger.exception("Job report failed", extra={"job_id": job.id, "recon_type": job.recon_type})
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return report_file_response(report_path, job.recon_type)
+
+
+# --- Ledger API: incremental multi-day reconciliation against the stored open items ---
+
+@app.post("/api/v1/ledger/reconcile")
+async def ledger_reconcile(
+    eth_file: UploadFile = File(...),
+    zzb_file: UploadFile = File(...),
+    recon_type: str = Form("atm"),
+    business_date: str | None = Form(None),
+    engine: str | None = Form(None),
+    offset: int = Form(0, ge=0),
+    limit: int | None = Form(None, ge=1, le=config.MISMATCH_PAGE_MAX),
+    _slot: None = ReconcileSlot
+):
+    """Matches the day's uploads against the open items of `recon_type` plus each other,
+    closes what matched and stores what is still unmatched. `business_date` (YYYY-MM-DD,
+    default today) is recorded as the date new open items were first seen."""
+    if business_date:
+        try:
+            date.fromisoformat(business_date)
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"business_date must be YYYY-MM-DD, got {business_date!r}")
+    engine = parse_engine(engine)
+    try:
+        recon_type = recon_type.lower().strip()
+        eth_content = await eth_file.read()
+        zzb_content = await zzb_file.read()
+
+        reconciler = get_incremental_reconciler()
+        result_df, run = await run_in_recon_pool(
+            reconciler.reconcile, eth_content, zzb_content, recon_type, business_date, engine
+        )
+        payload = await run_in_recon_pool(build_reconcile_payload, result_df, offset, limit, recon_type)
+        return json_response({**payload, "ledger": run})
+
+    except DuplicateRunError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.exception("Ledger reconcile failed", extra={"recon_type": recon_type})
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/v1/ledger/{recon_type}")
+async def ledger_open_items(recon_type: str):
+    recon_type = recon_type.lower().strip()
+    counts = await run_in_recon_pool(get_incremental_reconciler().store.open_counts, recon_type)
+    return {"recon_type": recon_type, "open": counts}
+
+
+@app.get("/api/v1/ledger/{recon_type}/history")
+async def ledger_history(recon_type: str, limit: int = Query(30, ge=1, le=1000)):
+    recon_type = recon_type.lower().strip()
+    runs = await run_in_recon_pool(get_incremental_reconciler().store.history, recon_type, limit)
+    return json_response({"recon_type": recon_type, "runs": runs})
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Per-stage timings, row counts and peak RSS in the Prometheus text format (of every worker with RECON_METRICS_DIR)."""
+    return Response(content=registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+
+@app.get("/health/live", include_in_schema=False)
+async def health_live():
+    """The worker process is up and serving its event loop."""
+    return {"status": "ok", "pid": os.getpid()}
+
+
+@app.get("/health/ready", include_in_schema=False)
+async def health_ready():
+    """The worker has started (profiles loaded) and is not shutting down; 503 otherwise."""
+    content = {"status": "ready" if readiness["ready"] else "starting",
+               "pid": os.getpid(), "reconciles": reconcile_limiter.to_dict()}
+    return json_response(content, status_code=200 if readiness["ready"] else 503)
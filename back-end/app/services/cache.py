@@ -0,0 +1,99 @@
+"""Content-addressed on-disk cache of parsed uploads.
+
+Entries are keyed by a SHA-256 of the uploaded bytes plus everything that
+changes how they are parsed (recon type, provider/bank side, reader
+engine) and hold the DataFrame produced by load_excel_dynamic +
+rename_for_logic as a Parquet file. Hits refresh the file's mtime, and
+the oldest entries are evicted once the directory grows past its size
+limit, which gives LRU-by-size behaviour without any index file.
+"""
+import hashlib
+import importlib.util
+import logging
+import os
+import threading
+import uuid
+
+import pandas as pd
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+# Bump when parsing/renaming changes so stale entries are never served
+CACHE_VERSION = "1"
+_SUFFIX = ".parquet"
+
+
+class ParsedFrameCache:
+
+    def __init__(self, directory: str | None = None, max_bytes: int | None = None, enabled: bool | None = None):
+        self.directory = directory or config.CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else config.CACHE_MAX_MB * 1024 * 1024
+        enabled = config.CACHE_ENABLED if enabled is None else enabled
+        # Parquet needs pyarrow; without it the cache quietly stays off
+        self.enabled = enabled and importlib.util.find_spec("pyarrow") is not None
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(file_content: bytes, recon_type: str, side: str, engine: str) -> str:
+        digest = hashlib.sha256(file_content).hexdigest()
+        return f"{digest}-{recon_type}-{side}-{engine}-v{CACHE_VERSION}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Cache: dropping unreadable entry %s: %s", key, e)
+            self._remove(path)
+            return None
+        return df
+
+    def put(self, key: str, df: pd.DataFrame):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            # e.g. object columns mixing numbers and text, which Parquet cannot store
+            logger.info("Cache: not caching %s: %s", key, e)
+            self._remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            entries = []
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(_SUFFIX) and entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,335 @@
+"""Background reconciliation jobs.
+
+A job runs ReconciliationService.process_files once on a worker pool and
+keeps the merged result, so the summary, mismatch pages and Excel report
+are all rendered from the same DataFrame instead of re-running the
+pipeline per endpoint.
+
+Jobs live in a directory shared by the server processes (RECON_JOB_DIR),
+so any gunicorn worker can answer for any job:
+
+* `<id>.json` holds the status, summary and preview; only the process
+  running the job writes it, replacing the file at every step;
+* `<id>.arrow` holds the merged result once the job is done, as an Arrow
+  IPC (Feather) file: plain data, never unpickled. Each process keeps the
+  last few results it used in memory.
+
+A job whose process exited before finishing is reported as failed. The
+directory must belong to the service user and be closed to everyone else
+(mode 0700); JobManager refuses to start on anything else.
+"""
+import glob
+import json
+import logging
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from app import config
+from app.services.metrics import collect_timings
+from app.services.reconciliation import ReconciliationService, mismatch_positions, status_counts, terminal_summary
+from app.utils.normalize import normalize_result_frame
+from app.utils.serialization import dumps, records
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+RESULT_SUFFIX = ".arrow"
+# Merged results each process keeps in memory, least recently used dropped first
+LOADED_RESULTS = 2
+PREVIEW_ROWS = 10
+
+
+class JobQueueFullError(RuntimeError):
+    """Too many jobs are queued or running to accept another one."""
+
+
+class ReconciliationJob:
+
+    def __init__(self, recon_type: str, mode: str = "left"):
+        self.id = uuid.uuid4().hex
+        self.recon_type = recon_type
+        self.mode = mode
+        self.status = QUEUED
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.rows: int | None = None
+        self.mismatch_count: int | None = None
+        self.summary: dict = {}
+        # Full mode: status counts per terminal id (None without a terminal column)
+        self.terminals: list | None = None
+        # First rows of the result, ready for JSON
+        self.preview: list = []
+        # Stage timings of the run (see app.services.metrics), as dicts
+        self.stages: list = []
+        # Filled in by JobManager.load_result for finished jobs
+        self.result_df: pd.DataFrame | None = None
+        # Row positions of non-MATCHED rows, computed once for pagination
+        self.mismatch_positions: np.ndarray | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "recon_type": self.recon_type,
+            "mode": self.mode,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "rows": self.rows,
+            "mismatch_count": self.mismatch_count,
+            "summary": self.summary,
+            **({"terminals": self.terminals} if self.mode == "full" else {}),
+            "stages": self.stages,
+            **({"preview_data": self.preview} if self.status == DONE else {}),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ReconciliationJob":
+        job = cls(data["recon_type"], data.get("mode", "left"))
+        job.id = data["job_id"]
+        for attr in ("status", "error", "created_at", "started_at", "finished_at", "rows", "mismatch_count",
+                     "summary", "terminals", "stages"):
+            setattr(job, attr, data.get(attr, getattr(job, attr)))
+        job.preview = data.get("preview_data") or []
+        return job
+
+
+def private_directory(path: str) -> str:
+    """Creates `path` if needed; raises unless it is owned by this user and closed to others."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if os.name == "posix":
+        st = os.lstat(path)
+        if not os.path.isdir(path) or os.path.islink(path) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+            raise RuntimeError(f"Job directory {path} must be a directory owned by uid {os.getuid()} "
+                               f"with mode 0700 (owner uid {st.st_uid}, mode {oct(st.st_mode & 0o777)})")
+    return path
+
+
+def write_result(df: pd.DataFrame, path: str):
+    """Writes a result frame as an Arrow IPC file, replacing `path` atomically.
+
+    Object columns Arrow cannot type (Excel columns mixing numbers and text)
+    are stored as text, the form the JSON and Excel outputs give them anyway.
+    """
+    # A new frame: the caller's columns are left as they are
+    df = df.reset_index(drop=True)
+    for i in range(df.shape[1]):
+        series = df.iloc[:, i]
+        if series.dtype == object:
+            try:
+                pa.array(series, from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                df.isetitem(i, series.astype(str).where(series.notna()))
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        df.to_feather(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _owner_alive(owner) -> bool:
+    """False when the process that wrote a job record has exited; True when it runs or cannot be checked."""
+    try:
+        host, pid = owner
+    except (TypeError, ValueError):
+        return True
+    # Only processes of this machine can be checked (os.kill would terminate the process on Windows)
+    if host != socket.gethostname() or os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobManager:
+
+    def __init__(self, service: ReconciliationService, max_workers: int | None = None,
+                 ttl_seconds: int | None = None, max_jobs: int | None = None, max_pending: int | None = None,
+                 directory: str | None = None):
+        self.service = service
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else config.JOB_TTL_SECONDS
+        self.max_jobs = max_jobs if max_jobs is not None else config.JOB_MAX_STORED
+        self.max_pending = max(1, max_pending if max_pending is not None else config.JOB_MAX_PENDING)
+        self.directory = private_directory(directory or config.JOB_DIR)
+        self._max_workers = max(1, max_workers or config.JOB_WORKERS)
+        self._executor: ThreadPoolExecutor | None = None
+        # Jobs queued or running in this process
+        self._active: dict[str, ReconciliationJob] = {}
+        self._results: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="recon-job")
+        return self._executor
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, job_id + suffix)
+
+    def submit(self, eth_content: bytes, zzb_content: bytes, recon_type: str = "atm",
+               engine: str | None = None, mode: str = "left") -> ReconciliationJob:
+        job = ReconciliationJob(recon_type, mode)
+        with self._lock:
+            pending = len(self._active)
+            if pending >= self.max_pending:
+                raise JobQueueFullError(f"{pending} jobs are already queued or running, retry later")
+            self._prune()
+            self._save(job)
+            self._active[job.id] = job
+            self._get_executor().submit(self._run, job, eth_content, zzb_content, engine)
+        return job
+
+    def get(self, job_id: str) -> ReconciliationJob | None:
+        """The job's status and summary, from whichever process runs it; None when unknown or expired."""
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        with self._lock:
+            job = self._active.get(job_id)
+        return job if job is not None else self._read(job_id)
+
+    def load_result(self, job: ReconciliationJob) -> bool:
+        """Attaches the merged result of a finished job to `job`; False when it has expired meanwhile."""
+        with self._lock:
+            loaded = self._results.get(job.id)
+            if loaded is not None:
+                self._results.move_to_end(job.id)
+        if loaded is None:
+            try:
+                result_df = pd.read_feather(self._path(job.id, RESULT_SUFFIX))
+            except FileNotFoundError:
+                return False
+            loaded = (result_df, mismatch_positions(result_df))
+            self._remember(job.id, loaded)
+        job.result_df, job.mismatch_positions = loaded
+        return True
+
+    def _remember(self, job_id: str, loaded: tuple):
+        with self._lock:
+            self._results[job_id] = loaded
+            self._results.move_to_end(job_id)
+            while len(self._results) > LOADED_RESULTS:
+                self._results.popitem(last=False)
+
+    def _save(self, job: ReconciliationJob):
+        """Writes the job record; the file is replaced whole, so readers never see a partial one."""
+        path = self._path(job.id, ".json")
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(dumps({**job.to_dict(), "owner": [socket.gethostname(), os.getpid()]}))
+        os.replace(tmp_path, path)
+
+    def _read(self, job_id: str) -> ReconciliationJob | None:
+        try:
+            with open(self._path(job_id, ".json"), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.warning("Dropping unreadable job record %s: %s", job_id, e)
+            return None
+        job = ReconciliationJob.from_dict(data)
+        if not job.finished and not _owner_alive(data.get("owner")):
+            job.status = FAILED
+            job.error = "The server process running the job exited"
+            job.finished_at = job.started_at or job.created_at
+        return job
+
+    def _run(self, job: ReconciliationJob, eth_content: bytes, zzb_content: bytes, engine: str | None):
+        job.status = RUNNING
+        job.started_at = time.time()
+        timings = []
+        try:
+            self._save(job)
+            with collect_timings() as timings:
+                result_df = self.service.process_files(eth_content, zzb_content, job.recon_type, engine, job.mode)
+            del eth_content, zzb_content
+            positions = mismatch_positions(result_df)
+            # The result is in place before the record says DONE
+            write_result(result_df, self._path(job.id, RESULT_SUFFIX))
+            self._remember(job.id, (result_df, positions))
+
+            job.summary = status_counts(result_df)
+            if job.mode == "full":
+                job.terminals = terminal_summary(result_df)
+            job.rows = len(result_df)
+            job.mismatch_count = int(len(positions))
+            job.preview = records(normalize_result_frame(result_df.head(PREVIEW_ROWS)))
+            job.status = DONE
+        except Exception as e:
+            logger.exception("Job failed", extra={"job_id": job.id, "recon_type": job.recon_type})
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            job.stages = [timing.to_dict() for timing in timings]
+            try:
+                self._save(job)
+            except OSError:
+                logger.exception("Could not record job result", extra={"job_id": job.id})
+            with self._lock:
+                self._active.pop(job.id, None)
+
+    def _stored_jobs(self) -> list:
+        jobs = []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            job = self._read(os.path.basename(path)[:-len(".json")])
+            if job is not None:
+                jobs.append(job)
+        return jobs
+
+    def _delete(self, job_id: str):
+        self._results.pop(job_id, None)
+        for suffix in (".json", RESULT_SUFFIX):
+            try:
+                os.remove(self._path(job_id, suffix))
+            except FileNotFoundError:
+                pass
+
+    def _prune(self):
+        """Drops expired jobs, then the oldest finished ones while over max_jobs. Caller holds the lock."""
+        now = time.time()
+        stored = self._stored_jobs()
+        for job in stored:
+            if job.finished and now - job.finished_at > self.ttl_seconds:
+                self._delete(job.id)
+        stored = [job for job in stored if not (job.finished and now - job.finished_at > self.ttl_seconds)]
+        if len(stored) >= self.max_jobs:
+            finished = sorted((j for j in stored if j.finished), key=lambda j: j.finished_at)
+            for job in finished[:len(stored) - self.max_jobs + 1]:
+                self._delete(job.id)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,257 @@
+"""Persistent ledger of open items for incremental multi-day reconciliation.
+
+A SQLite file keeps, per recon type, the bank rows still missing in the
+provider file and the provider rows no bank row has claimed yet. An
+incremental run matches the new uploads plus those open items only, and
+never re-reads earlier uploads:
+
+* bank rows = open bank items + the new bank file;
+* provider rows = open provider items + the new provider file;
+* afterwards items that found a partner are closed, new unmatched rows
+  are opened and the open counts are recorded for the run.
+
+The whole run holds the SQLite write lock (BEGIN IMMEDIATE), so runs
+from several workers or processes are applied one after the other.
+"""
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from app import config
+from app.services.match_engine import canonical_keys
+from app.services.profiles import get_profile
+from app.services.reconciliation import ReconciliationService, status_counts
+from app.utils.normalize import normalize_result_frame
+from app.utils.serialization import dumps, iter_records
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    import json
+    _loads = json.loads
+
+BANK = "bank"
+PROVIDER = "provider"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS open_items (
+    id INTEGER PRIMARY KEY,
+    recon_type TEXT NOT NULL,
+    side TEXT NOT NULL,
+    match_key TEXT,
+    opened_on TEXT NOT NULL,
+    run_id INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS open_items_by_side ON open_items (recon_type, side);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    recon_type TEXT NOT NULL,
+    business_date TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    uploads_sha TEXT NOT NULL,
+    bank_rows INTEGER NOT NULL,
+    provider_rows INTEGER NOT NULL,
+    summary BLOB NOT NULL,
+    closed_bank INTEGER NOT NULL,
+    closed_provider INTEGER NOT NULL,
+    opened_bank INTEGER NOT NULL,
+    opened_provider INTEGER NOT NULL,
+    open_bank INTEGER NOT NULL,
+    open_provider INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS runs_by_uploads ON runs (recon_type, uploads_sha);
+"""
+
+RUN_COLUMNS = (
+    "id", "recon_type", "business_date", "created_at", "bank_rows", "provider_rows", "summary",
+    "closed_bank", "closed_provider", "opened_bank", "opened_provider", "open_bank", "open_provider",
+)
+
+
+class DuplicateRunError(ValueError):
+    """The same pair of uploads was already applied to the ledger."""
+
+
+class LedgerStore:
+
+    def __init__(self, path: str | None = None, timeout: int | None = None):
+        self.path = path or config.LEDGER_PATH
+        self.timeout = timeout if timeout is not None else config.LEDGER_LOCK_TIMEOUT
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: transactions are opened explicitly below
+        return sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+
+    @contextmanager
+    def transaction(self):
+        """Connection holding the ledger write lock until the block ends; rolled back on error."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def load_open(self, conn, recon_type: str, side: str):
+        """Open items of one side as (frame, ids, opened_on); the frame has the uploaded row's columns."""
+        rows = conn.execute(
+            "SELECT id, opened_on, payload FROM open_items WHERE recon_type = ? AND side = ? ORDER BY id",
+            (recon_type, side)
+        ).fetchall()
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        opened_on = np.array([r[1] for r in rows], dtype=object)
+        frame = pd.DataFrame.from_records([_loads(r[2]) for r in rows]) if rows else pd.DataFrame()
+        return frame, ids, opened_on
+
+    def close_items(self, conn, ids) -> int:
+        ids = [int(i) for i in ids]
+        conn.executemany("DELETE FROM open_items WHERE id = ?", ((i,) for i in ids))
+        return len(ids)
+
+    def open_items(self, conn, recon_type: str, side: str, df: pd.DataFrame, keys: pd.Series,
+                   opened_on: str, run_id: int) -> int:
+        """Stores the rows of `df` as open items; `keys` are their canonical match keys."""
+        if df.empty:
+            return 0
+        payloads = (dumps(row) for row in iter_records(normalize_result_frame(df)))
+        key_values = keys.astype(object).where(keys.notna(), None).tolist()
+        conn.executemany(
+            "INSERT INTO open_items (recon_type, side, match_key, opened_on, run_id, payload) VALUES (?, ?, ?, ?, ?, ?)",
+            ((recon_type, side, key, opened_on, run_id, payload) for key, payload in zip(key_values, payloads))
+        )
+        return len(df)
+
+    def open_counts(self, recon_type: str) -> dict:
+        """Current open items per side, in total and by the business date they were opened on."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT side, opened_on, COUNT(*) FROM open_items WHERE recon_type = ? "
+                "GROUP BY side, opened_on ORDER BY opened_on",
+                (recon_type,)
+            ).fetchall()
+        counts = {BANK: {"total": 0, "by_opened_on": {}}, PROVIDER: {"total": 0, "by_opened_on": {}}}
+        for side, opened_on, count in rows:
+            counts[side]["total"] += count
+            counts[side]["by_opened_on"][opened_on] = count
+        return counts
+
+    def history(self, recon_type: str, limit: int = 30) -> list:
+        """The most recent runs (newest first) with the open counts left after each."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(RUN_COLUMNS)} FROM runs WHERE recon_type = ? ORDER BY id DESC LIMIT ?",
+                (recon_type, limit)
+            ).fetchall()
+        runs = []
+        for row in rows:
+            run = dict(zip(RUN_COLUMNS, row))
+            run["summary"] = _loads(run["summary"])
+            runs.append(run)
+        return runs
+
+
+class IncrementalReconciler:
+
+    def __init__(self, service: ReconciliationService | None = None, store: LedgerStore | None = None):
+        self.service = service or ReconciliationService()
+        self.store = store or LedgerStore()
+
+    def reconcile(self, eth_content: bytes, zzb_content: bytes, recon_type: str = "atm",
+                  business_date: str | None = None, engine: str | None = None):
+        """Matches new uploads against the open items and updates the ledger.
+
+        Returns (merged_df, run): the result covers the new bank rows and every
+        bank item that was still open, with the date each was first seen in
+        `Opened_On`; `run` describes what the run closed and opened.
+        """
+        recon_type = str(recon_type).lower().strip()
+        business_date = date.fromisoformat(business_date).isoformat() if business_date else date.today().isoformat()
+        engine = engine or config.EXCEL_ENGINE
+        profile = get_profile(recon_type)
+        uploads_sha = hashlib.sha256(
+            hashlib.sha256(eth_content).digest() + hashlib.sha256(zzb_content).digest()
+        ).hexdigest()
+
+        df_eth, df_zzb = self.service.load_frames(eth_content, zzb_content, recon_type, engine)
+
+        with self.store.transaction() as conn:
+            applied = conn.execute(
+                "SELECT id, business_date FROM runs WHERE recon_type = ? AND uploads_sha = ?", (recon_type, uploads_sha)
+            ).fetchone()
+            if applied:
+                raise DuplicateRunError(f"These uploads were already applied to the {recon_type} ledger "
+                                        f"in run {applied[0]} ({applied[1]})")
+
+            open_bank, bank_ids, bank_opened_on = self.store.load_open(conn, recon_type, BANK)
+            open_provider, provider_ids, _ = self.store.load_open(conn, recon_type, PROVIDER)
+
+            # Open items first, so an open provider item wins over a new row with the same key
+            bank_all = pd.concat([open_bank, df_zzb], ignore_index=True)
+            provider_all = pd.concat([open_provider, df_eth], ignore_index=True)
+            bank_all['Opened_On'] = np.concatenate([bank_opened_on, np.full(len(df_zzb), business_date, dtype=object)])
+
+            merged_df, positions = self.service.reconcile_frames(provider_all, bank_all, recon_type)
+
+            # Bank rows stay open while the provider has no row for them
+            bank_open = (merged_df['Recon_Status'] == 'MISSING_IN_PROVIDER').to_numpy()
+            # Provider rows stay open unless a bank row took them (or a row with the same key)
+            provider_keys = canonical_keys(provider_all[profile.provider.key])
+            taken = np.zeros(len(provider_all), dtype=bool)
+            taken[positions[positions >= 0]] = True
+            provider_open = (
+                ~taken & provider_keys.notna().to_numpy()
+                & ~provider_keys.isin(provider_keys[taken].dropna()).to_numpy()
+                & ~provider_keys.duplicated(keep='first').to_numpy()
+            )
+
+            n_bank, n_provider = len(open_bank), len(open_provider)
+            bank_keys = canonical_keys(bank_all[profile.bank.key])
+            summary = status_counts(merged_df)
+            cursor = conn.execute(
+                "INSERT INTO runs (recon_type, business_date, created_at, uploads_sha, bank_rows, provider_rows, summary, "
+                "closed_bank, closed_provider, opened_bank, opened_provider, open_bank, open_provider) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0, 0, 0, 0, 0)",
+                (recon_type, business_date, time.time(), uploads_sha, len(df_zzb), len(df_eth), dumps(summary))
+            )
+            run_id = cursor.lastrowid
+
+            new_bank = bank_open[n_bank:]
+            new_provider = provider_open[n_provider:]
+            run = {
+                "run_id": run_id,
+                "recon_type": recon_type,
+                "business_date": business_date,
+                "closed_bank": self.store.close_items(conn, bank_ids[~bank_open[:n_bank]]),
+                "closed_provider": self.store.close_items(conn, provider_ids[~provider_open[:n_provider]]),
+                "opened_bank": self.store.open_items(conn, recon_type, BANK, df_zzb[new_bank],
+                                                     bank_keys[n_bank:][new_bank], business_date, run_id),
+                "opened_provider": self.store.open_items(conn, recon_type, PROVIDER, df_eth[new_provider],
+                                                         provider_keys[n_provider:][new_provider], business_date, run_id),
+                "open_bank": int(bank_open.sum()),
+                "open_provider": int(provider_open.sum()),
+            }
+            conn.execute(
+                "UPDATE runs SET closed_bank = ?, closed_provider = ?, opened_bank = ?, opened_provider = ?, "
+                "open_bank = ?, open_provider = ? WHERE id = ?",
+                (run["closed_bank"], run["closed_provider"], run["opened_bank"], run["opened_provider"],
+                 run["open_bank"], run["open_provider"], run_id)
+            )
+
+        return merged_df, run
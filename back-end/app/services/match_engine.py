@@ -0,0 +1,297 @@
+"""Hash-index match engine for the reconcile step.
+
+Replaces the general-purpose `pd.merge(..., indicator=True)` with a
+dedicated left (or, in full mode, outer) join on a single key:
+
+* keys are normalized row by row to one canonical form: trimmed text,
+  and for plain numbers (RRN/REFNUM style) no trailing ".0" from Excel
+  and no leading zeros, so "000123", "123.0" and 123 are the same key
+  whatever else the file holds;
+* when every key on both sides is such a number they are compared as
+  int64, built straight from integer / integral float columns without a
+  text round-trip; otherwise as Arrow strings (object strings when
+  pyarrow is not installed);
+* the provider keys are put in a hash index once (first occurrence of a
+  duplicated key wins) and every bank key is looked up with a single
+  `get_indexer` call;
+* in full mode the provider rows whose key no bank row has are found
+  from the same normalized keys with one hash `isin` and appended as
+  `right_only` rows, as pd.merge(how='outer') would;
+* the joined frame is assembled column by column with `take`, keeping
+  the column layout, suffixes and `_merge` indicator of the old merge,
+  and `Recon_Status` is emitted as a categorical;
+* matched pairs whose amounts differ beyond the tolerance are flagged
+  AMOUNT_MISMATCH, compared as whole float arrays.
+
+Empty keys never match.
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Keys of up to 18 digits fit in int64
+INT_KEY_PATTERN = r"\d{1,18}"
+# Numbers that are not in canonical form: leading zeros, or a trailing ".0" from Excel
+NONCANONICAL_NUMBER_PATTERN = r"0\d+(?:\.0+)?|\d+\.0+"
+NULL_KEY_TOKENS = ("", "nan", "NaN", "None", "NaT", "<NA>")
+# Integral floats above this are not exact
+_MAX_EXACT_FLOAT = 2 ** 53
+
+MERGE_CATEGORIES = ['left_only', 'right_only', 'both']
+STATUS_CATEGORIES = ['MATCHED', 'MISSING_IN_PROVIDER', 'MISSING_IN_BANK', 'AMOUNT_MISMATCH', 'PROBABLE_MATCH']
+
+# Amounts are compared after rounding the difference, so float noise is not a break
+AMOUNT_DECIMALS = 6
+
+_STRING_DTYPE = "string[pyarrow]" if pa is not None else object
+
+
+def _key_text(series: pd.Series) -> pd.Series:
+    """Keys as trimmed text with empty / placeholder values set to missing."""
+    text = series.astype(_STRING_DTYPE)
+    if _STRING_DTYPE is object:
+        text = text.where(series.isna(), series.astype(str))
+    text = text.str.strip()
+    return text.mask(text.isin(NULL_KEY_TOKENS))
+
+
+def canonical_keys(series: pd.Series) -> pd.Series:
+    """Keys as text the way they are matched: trimmed, empty as missing, numbers without leading zeros or ".0"."""
+    return _canonical_text(_key_text(series))
+
+
+def _canonical_text(text: pd.Series) -> pd.Series:
+    # Only the rows that need it are rewritten; a group backreference would leave Arrow's fast path
+    odd = text.str.fullmatch(NONCANONICAL_NUMBER_PATTERN).fillna(False).to_numpy(dtype=bool)
+    if odd.any():
+        digits = text[odd].str.replace(r"\.0+$", "", regex=True).str.replace(r"^0+", "", regex=True)
+        text = text.copy()
+        text[odd] = digits.mask(digits == "", "0")
+    return text
+
+
+def _numeric_keys(series: pd.Series):
+    """(int64 keys, valid mask) straight from an integer or integral float column, else None."""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) or not pd.api.types.is_numeric_dtype(dtype):
+        return None
+    if pd.api.types.is_integer_dtype(dtype):
+        valid = series.notna().to_numpy()
+        values = series.to_numpy(dtype=np.int64, na_value=0)
+    else:
+        floats = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~np.isnan(floats)
+        present = floats[valid]
+        if ((present >= _MAX_EXACT_FLOAT) | (present != np.floor(present))).any():
+            return None
+        values = np.where(valid, floats, 0).astype(np.int64)
+    if (values < 0).any():
+        # Signed keys are text keys, as they are when read from text
+        return None
+    return values, valid
+
+
+def _text_as_int(text: pd.Series, valid: np.ndarray):
+    """int64 keys from key text, or None when a non-empty key is not a run of up to 18 digits."""
+    present = text[valid]
+    if not bool(present.str.fullmatch(INT_KEY_PATTERN).all()):
+        return None
+    # Leading zeros are dropped by the cast, as canonical_keys drops them
+    values = np.zeros(len(text), dtype=np.int64)
+    if pa is not None:
+        values[valid] = pa.array(present.array).cast(pa.int64()).to_numpy()
+    else:
+        values[valid] = present.astype("int64").to_numpy()
+    return values
+
+
+def _int_as_text(values: np.ndarray, valid: np.ndarray, index=None) -> pd.Series:
+    if pa is not None:
+        text = pd.array(pa.array(values, mask=~valid).cast(pa.string()), dtype=_STRING_DTYPE)
+        return pd.Series(text, index=index)
+    return pd.Series(values, index=index).astype(str).where(valid)
+
+
+def as_text(series: pd.Series) -> pd.Series:
+    """A column as trimmed text with missing values kept missing (the profiles' "string" dtype).
+
+    Integer and integral float columns (numbers Excel stored as floats)
+    are written without a ".0" and converted without going through
+    Python objects. Arrow strings when pyarrow is installed.
+    """
+    numeric = _numeric_keys(series)
+    if numeric is not None:
+        return _int_as_text(*numeric, index=series.index)
+    if _STRING_DTYPE is object:
+        return series.astype(str).str.strip().where(series.notna())
+    return series.astype(_STRING_DTYPE).str.strip()
+
+
+def normalize_key_pair(left: pd.Series, right: pd.Series):
+    """Normalizes both key columns to one comparable representation.
+
+    Returns (left_keys, left_valid, right_keys, right_valid, kind) where the
+    keys are int64 numpy arrays ("int") or string arrays ("string") and the
+    masks flag non-empty keys. Either way every key is compared in its
+    canonical form (see canonical_keys), so the result for one row does not
+    depend on the other rows.
+    """
+    sides = []
+    for series in (left, right):
+        numeric = _numeric_keys(series)
+        if numeric is not None:
+            sides.append([numeric[0], numeric[1], None])
+        else:
+            text = _key_text(series)
+            valid = text.notna().to_numpy()
+            # Plain digit runs (the usual case) are cast as they are; the rest are made canonical first
+            values = _text_as_int(text, valid)
+            if values is None:
+                text = _canonical_text(text)
+                values = _text_as_int(text, valid)
+            sides.append([values, valid, text])
+
+    if all(side[0] is not None for side in sides):
+        (left_keys, left_valid, _), (right_keys, right_valid, _) = sides
+        return left_keys, left_valid, right_keys, right_valid, "int"
+
+    for side in sides:
+        if side[2] is None:
+            side[2] = _int_as_text(side[0], side[1])
+        elif side[0] is not None:
+            # Digit runs that were cast directly still need their canonical text
+            side[2] = _canonical_text(side[2])
+    (_, left_valid, left_text), (_, right_valid, right_text) = sides
+    return left_text.array, left_valid, right_text.array, right_valid, "string"
+
+
+def match_keys(left: pd.Series, right: pd.Series) -> np.ndarray:
+    """For every left (bank) row, the position of its matching right (provider) row, or -1."""
+    return lookup_positions(normalize_key_pair(left, right))
+
+
+def match_keys_both(left: pd.Series, right: pd.Series):
+    """Bidirectional match on one key normalization.
+
+    Returns (positions, right_only): `positions` as in match_keys, and a mask
+    of the right rows whose key no left row has (rows with an empty key
+    included). Right rows sharing a key with a matched row are not right-only.
+    """
+    keys = normalize_key_pair(left, right)
+    return lookup_positions(keys), right_only_mask(keys)
+
+
+def lookup_positions(keys) -> np.ndarray:
+    """match_keys on the output of normalize_key_pair."""
+    left_keys, left_valid, right_keys, right_valid, _ = keys
+    right_positions = np.flatnonzero(right_valid)
+    candidate_keys = right_keys[right_positions]
+    first = ~pd.Index(candidate_keys).duplicated(keep='first')
+    index = pd.Index(candidate_keys[first])
+    target_positions = right_positions[first]
+
+    if not len(index):
+        return np.full(len(left_keys), -1, dtype=np.intp)
+    hits = index.get_indexer(left_keys)
+    matched = (hits >= 0) & left_valid
+    return np.where(matched, target_positions[np.where(matched, hits, 0)], -1)
+
+
+def right_only_mask(keys) -> np.ndarray:
+    """Right rows whose key no left row has, from the output of normalize_key_pair."""
+    left_keys, left_valid, right_keys, right_valid, _ = keys
+    right_only = np.ones(len(right_valid), dtype=bool)
+    if left_valid.any() and right_valid.any():
+        right_only[right_valid] = ~pd.Index(right_keys[right_valid]).isin(left_keys[left_valid])
+    return right_only
+
+
+def _column_values(series: pd.Series):
+    """numpy array for numpy-backed columns, the ExtensionArray otherwise."""
+    return series.to_numpy() if isinstance(series.dtype, np.dtype) else series.array
+
+
+def join_frames(left_df: pd.DataFrame, right_df: pd.DataFrame, left_key: str, right_key: str,
+                positions: np.ndarray, suffixes=('_x', '_y'), right_only: np.ndarray | None = None) -> pd.DataFrame:
+    """Left join using precomputed `positions`; same columns and `_merge` indicator as pd.merge(how='left').
+
+    `right_only` (right row positions) appends those rows after the left rows
+    with empty left columns and `_merge` 'right_only', as pd.merge(how='outer').
+    """
+    shared_key = left_key == right_key
+    right_columns = [i for i, c in enumerate(right_df.columns) if not (c == right_key and shared_key)]
+    overlap = set(left_df.columns) & {right_df.columns[i] for i in right_columns}
+
+    left_positions = None
+    merge_codes = np.where(positions >= 0, MERGE_CATEGORIES.index('both'), MERGE_CATEGORIES.index('left_only'))
+    if right_only is not None and len(right_only):
+        left_positions = np.concatenate([np.arange(len(left_df)), np.full(len(right_only), -1)])
+        positions = np.concatenate([positions, right_only])
+        merge_codes = np.concatenate([merge_codes, np.full(len(right_only), MERGE_CATEGORIES.index('right_only'))])
+
+    names, arrays = [], []
+    for i, col in enumerate(left_df.columns):
+        names.append(f"{col}{suffixes[0]}" if col in overlap else col)
+        values = _column_values(left_df.iloc[:, i])
+        if left_positions is not None:
+            if shared_key and col == left_key:
+                # One key column, as in an outer merge: appended rows carry the right key
+                values = _column_values(pd.concat([left_df.iloc[:, i], right_df[right_key].iloc[right_only]],
+                                                  ignore_index=True))
+            else:
+                values = pd.api.extensions.take(values, left_positions, allow_fill=True)
+        arrays.append(values)
+    for i in right_columns:
+        col = right_df.columns[i]
+        names.append(f"{col}{suffixes[1]}" if col in overlap else col)
+        # -1 positions become missing values; ints are upcast exactly as pd.merge would
+        arrays.append(pd.api.extensions.take(_column_values(right_df.iloc[:, i]), positions, allow_fill=True))
+
+    merged = pd.DataFrame(dict(enumerate(arrays)), index=pd.RangeIndex(len(positions)))
+    merged.columns = names
+    merged['_merge'] = pd.Categorical.from_codes(merge_codes, categories=MERGE_CATEGORIES)
+    return merged
+
+
+def take_positions(values, positions: np.ndarray) -> np.ndarray:
+    """Float values of the right rows at `positions`, NaN where there is no match."""
+    return pd.api.extensions.take(np.asarray(values, dtype=np.float64), positions, allow_fill=True)
+
+
+def amount_breaks(left_amounts, right_amounts, absolute: float = 0.0, percent: float = 0.0) -> np.ndarray:
+    """Mask of row pairs whose amounts disagree.
+
+    A pair agrees when |left - right| is within the larger of `absolute` and
+    `percent` % of the larger amount. A pair where only one side has an
+    amount is a break; pairs with no amount on either side are not.
+    """
+    left = np.asarray(left_amounts, dtype=np.float64)
+    right = np.asarray(right_amounts, dtype=np.float64)
+    left_missing, right_missing = np.isnan(left), np.isnan(right)
+
+    tolerance = np.maximum(absolute, np.fmax(np.abs(left), np.abs(right)) * (percent / 100.0))
+    with np.errstate(invalid='ignore'):
+        differs = np.round(np.abs(left - right), AMOUNT_DECIMALS) > tolerance
+    return np.where(left_missing | right_missing, left_missing != right_missing, differs)
+
+
+def status_from_positions(positions: np.ndarray, amount_mismatch: np.ndarray | None = None,
+                          probable: np.ndarray | None = None, right_only: int = 0) -> pd.Categorical:
+    """Categorical Recon_Status for a left join: MATCHED where a provider row was found.
+
+    Matched rows flagged in `amount_mismatch` become AMOUNT_MISMATCH, and rows
+    flagged in `probable` (paired by the probable-match pass) PROBABLE_MATCH.
+    `right_only` provider-only rows appended after the bank rows are MISSING_IN_BANK.
+    """
+    codes = np.where(positions >= 0, STATUS_CATEGORIES.index('MATCHED'), STATUS_CATEGORIES.index('MISSING_IN_PROVIDER'))
+    if amount_mismatch is not None:
+        codes = np.where((positions >= 0) & amount_mismatch, STATUS_CATEGORIES.index('AMOUNT_MISMATCH'), codes)
+    if probable is not None:
+        codes = np.where(probable, STATUS_CATEGORIES.index('PROBABLE_MATCH'), codes)
+    if right_only:
+        codes = np.concatenate([codes, np.full(right_only, STATUS_CATEGORIES.index('MISSING_IN_BANK'))])
+    return pd.Categorical.from_codes(codes.astype(np.int8), categories=STATUS_CATEGORIES)
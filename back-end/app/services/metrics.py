@@ -0,0 +1,284 @@
+"""Per-stage timing and memory instrumentation.
+
+Pipeline stages (parse, rename, clean, merge, status, json, excel, ...)
+run inside `stage()`, which records for each run:
+
+* wall time,
+* rows in and rows out (when the stage sets them),
+* peak RSS: the process high-water mark when it rose during the stage,
+  else the larger of the RSS before and after. Concurrent requests share
+  the process, so under load this is the process peak while the stage ran.
+
+Every record goes to the process-wide registry, rendered in the
+Prometheus text format by GET /metrics, and to the current request's
+timing list when one is being collected (see collect_timings), which the
+API returns as a `Server-Timing` header. Uploads parsed on the process
+pool are timed from the caller; their memory is the worker's, not ours.
+
+With RECON_METRICS_DIR set (several server processes behind one port),
+each process also publishes its registry to `<pid>.json` in that
+directory after every stage, and /metrics adds up all the files, so any
+worker answers for the whole server.
+"""
+import glob
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app import config
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Timings of the request (or job) being served, when someone collects them
+_current_timings: ContextVar[list | None] = ContextVar("recon_stage_timings", default=None)
+
+
+def _proc_memory(pid: int | str = "self") -> tuple[int, int]:
+    """(current RSS, peak RSS) of a process (this one by default) in bytes; 0 when unknown."""
+    try:
+        rss = hwm = 0
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith("VmHWM:"):
+                    hwm = int(line.split()[1]) * 1024
+        return rss, hwm
+    except OSError:
+        if pid != "self":
+            return 0, 0
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return 0, peak if sys.platform == "darwin" else peak * 1024
+    return 0, 0
+
+
+class StageTiming:
+    """One run of one stage; `rows_out` (and `rows_in`) can be set inside the block."""
+
+    def __init__(self, stage: str, recon_type: str, rows_in: int | None = None):
+        self.stage = stage
+        self.recon_type = recon_type
+        self.rows_in = rows_in
+        self.rows_out: int | None = None
+        self.seconds = 0.0
+        self.peak_rss_bytes = 0
+        self.failed = False
+
+    def to_dict(self) -> dict:
+        return {
+            "stage": self.stage,
+            "recon_type": self.recon_type,
+            "seconds": round(self.seconds, 4),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "peak_rss_mb": round(self.peak_rss_bytes / (1024 * 1024), 1),
+            "failed": self.failed,
+        }
+
+
+class _StageStats:
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(SECONDS_BUCKETS)
+        self.errors = 0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.last_peak_rss = 0
+        self.max_peak_rss = 0
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _merge_stats(total: dict, stats: dict):
+    for key in ("count", "seconds", "errors", "rows_in", "rows_out"):
+        total[key] += stats[key]
+    total["buckets"] = [a + b for a, b in zip(total["buckets"], stats["buckets"])]
+    total["last_peak_rss"] = max(total["last_peak_rss"], stats["last_peak_rss"])
+    total["max_peak_rss"] = max(total["max_peak_rss"], stats["max_peak_rss"])
+
+
+class MetricsRegistry:
+    """Aggregated stage timings of this process, by (stage, recon_type)."""
+
+    def __init__(self, directory: str | None = None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._stages: dict[tuple[str, str], _StageStats] = {}
+
+    def observe(self, timing: StageTiming):
+        with self._lock:
+            stats = self._stages.get((timing.stage, timing.recon_type))
+            if stats is None:
+                stats = self._stages[(timing.stage, timing.recon_type)] = _StageStats()
+            stats.count += 1
+            stats.seconds += timing.seconds
+            for i, bound in enumerate(SECONDS_BUCKETS):
+                if timing.seconds <= bound:
+                    stats.buckets[i] += 1
+            stats.errors += timing.failed
+            stats.rows_in += timing.rows_in or 0
+            stats.rows_out += timing.rows_out or 0
+            stats.last_peak_rss = timing.peak_rss_bytes
+            stats.max_peak_rss = max(stats.max_peak_rss, timing.peak_rss_bytes)
+        if self.directory:
+            self.publish()
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def snapshot(self) -> dict:
+        """{(stage, recon_type): stats dict} of this process."""
+        with self._lock:
+            return {key: vars(stats).copy() for key, stats in self._stages.items()}
+
+    def publish(self):
+        """Writes this process's snapshot to `<pid>.json` in the shared directory."""
+        pid = os.getpid()
+        path = os.path.join(self.directory, f"{pid}.json")
+        # Serialized so an older snapshot never overwrites a newer one
+        with self._publish_lock:
+            entries = [{"stage": stage, "recon_type": recon_type, **stats}
+                       for (stage, recon_type), stats in self.snapshot().items()]
+            tmp_path = f"{path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning("Could not publish metrics to %s: %s", path, e)
+
+    def collect(self) -> tuple[dict, list]:
+        """Stats summed over every process publishing to the directory (just this one without it), and their pids."""
+        if not self.directory:
+            return self.snapshot(), [os.getpid()]
+        totals, pids = {}, []
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                continue
+            pids.append(int(os.path.basename(path).split(".")[0]))
+            for entry in entries:
+                key = (entry.pop("stage"), entry.pop("recon_type"))
+                if key in totals:
+                    _merge_stats(totals[key], entry)
+                else:
+                    totals[key] = entry
+        return totals, sorted(pids)
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        totals, pids = self.collect()
+        stages = sorted(totals.items())
+
+        lines = [
+            "# HELP recon_stage_seconds Wall time of a reconcile pipeline stage.",
+            "# TYPE recon_stage_seconds histogram",
+        ]
+        for (stage, recon_type), stats in stages:
+            labels = f'stage="{_label(stage)}",recon_type="{_label(recon_type)}"'
+            for bound, count in zip(SECONDS_BUCKETS, stats["buckets"]):
+                lines.append(f'recon_stage_seconds_bucket{{{labels},le="{bound:g}"}} {count}')
+            lines.append(f'recon_stage_seconds_bucket{{{labels},le="+Inf"}} {stats["count"]}')
+            lines.append(f"recon_stage_seconds_sum{{{labels}}} {stats['seconds']:.6f}")
+            lines.append(f"recon_stage_seconds_count{{{labels}}} {stats['count']}")
+
+        for name, key, kind, help_text in (
+            ("recon_stage_errors_total", "errors", "counter", "Stage runs that raised."),
+            ("recon_stage_rows_in_total", "rows_in", "counter", "Rows handed to a stage."),
+            ("recon_stage_rows_out_total", "rows_out", "counter", "Rows produced by a stage."),
+            ("recon_stage_peak_rss_bytes", "last_peak_rss", "gauge", "Peak RSS during the last run of a stage."),
+            ("recon_stage_peak_rss_bytes_max", "max_peak_rss", "gauge", "Largest peak RSS seen during a stage."),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (stage, recon_type), stats in stages:
+                lines.append(f'{name}{{stage="{_label(stage)}",recon_type="{_label(recon_type)}"}} {stats[key]}')
+
+        rss, peak = _proc_memory()
+        lines += [
+            "# HELP process_resident_memory_bytes Resident memory of this process.",
+            "# TYPE process_resident_memory_bytes gauge",
+            f"process_resident_memory_bytes {rss}",
+            "# HELP recon_process_peak_rss_bytes Peak resident memory of this process since it started.",
+            "# TYPE recon_process_peak_rss_bytes gauge",
+            f"recon_process_peak_rss_bytes {peak}",
+        ]
+        if self.directory:
+            lines += [
+                "# HELP recon_worker_resident_memory_bytes Resident memory of each live server process.",
+                "# TYPE recon_worker_resident_memory_bytes gauge",
+            ]
+            for pid in pids:
+                worker_rss = rss if pid == os.getpid() else _proc_memory(pid)[0]
+                if worker_rss:
+                    lines.append(f'recon_worker_resident_memory_bytes{{pid="{pid}"}} {worker_rss}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(config.METRICS_DIR)
+
+
+@contextmanager
+def stage(name: str, recon_type: str | None = None, rows_in: int | None = None):
+    """Times the block as pipeline stage `name`; yields the StageTiming to set rows_out on."""
+    timing = StageTiming(name, recon_type or "unknown", rows_in)
+    rss_before, peak_before = _proc_memory()
+    started = time.perf_counter()
+    try:
+        yield timing
+    except BaseException:
+        timing.failed = True
+        raise
+    finally:
+        timing.seconds = time.perf_counter() - started
+        rss_after, peak_after = _proc_memory()
+        timing.peak_rss_bytes = peak_after if peak_after > peak_before else max(rss_before, rss_after)
+        registry.observe(timing)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.append(timing)
+        logger.debug("stage finished", extra=timing.to_dict())
+
+
+@contextmanager
+def collect_timings():
+    """Collects the StageTimings recorded in this context (and contexts copied from it) into a list."""
+    timings = []
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def server_timing_header(timings: list, total_seconds: float | None = None) -> str:
+    """`Server-Timing` header value; repeated stages are summed in order of first appearance."""
+    durations = {}
+    for timing in timings:
+        durations[timing.stage] = durations.get(timing.stage, 0.0) + timing.seconds
+    if total_seconds is not None:
+        durations["total"] = total_seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items())
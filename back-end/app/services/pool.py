@@ -0,0 +1,61 @@
+"""Shared executors for CPU-bound parsing and reconciliation work"""
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from app import config
+from app.utils.log import configure_logging
+
+_lock = threading.Lock()
+_parse_executor: Executor | None = None
+_recon_executor: ThreadPoolExecutor | None = None
+
+
+def get_parse_executor() -> Executor:
+    """Pool that parses uploaded files; created lazily on first use."""
+    global _parse_executor
+    with _lock:
+        if _parse_executor is None:
+            workers = max(1, config.PARSE_POOL_SIZE)
+            if config.PARSE_POOL_KIND == "thread":
+                _parse_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="recon-parse")
+            elif config.PARSE_POOL_KIND == "process":
+                # spawn keeps workers safe to start from a threaded server (and works on Windows)
+                _parse_executor = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=configure_logging
+                )
+            else:
+                raise ValueError(f"Unknown RECON_PARSE_POOL '{config.PARSE_POOL_KIND}', expected 'process' or 'thread'")
+        return _parse_executor
+
+
+def discard_parse_executor(executor: Executor):
+    """Drops `executor` (a broken process pool) so the next get_parse_executor call builds a new one."""
+    global _parse_executor
+    with _lock:
+        if _parse_executor is executor:
+            _parse_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_recon_executor() -> ThreadPoolExecutor:
+    """Pool the API endpoints use to run reconcile work off the event loop."""
+    global _recon_executor
+    with _lock:
+        if _recon_executor is None:
+            _recon_executor = ThreadPoolExecutor(
+                max_workers=max(1, config.RECON_POOL_SIZE), thread_name_prefix="recon"
+            )
+        return _recon_executor
+
+
+def shutdown_executors():
+    global _parse_executor, _recon_executor
+    with _lock:
+        if _parse_executor is not None:
+            _parse_executor.shutdown(wait=False, cancel_futures=True)
+            _parse_executor = None
+        if _recon_executor is not None:
+            _recon_executor.shutdown(wait=False, cancel_futures=True)
+            _recon_executor = None
@@ -0,0 +1,198 @@
+"""Second matching pass over the rows the exact key match left unmatched.
+
+Only the residue is considered: bank rows without a provider match and
+provider rows no bank row matched. Each rule of the recon profile's
+`probable_match` list runs in turn on what is still unpaired:
+
+* `reference`: references reduced to their digits (a trailing Excel ".0"
+  and leading zeros dropped) agree, or one is the truncated tail of the
+  other;
+* `window`: the listed fields are equal and the timestamps are at most
+  the rule's window apart.
+
+Candidates are found with a hash join on a blocking key (the last
+`min_digits` reference digits, or the fields plus a time bucket, and the
+amount in cents when the profile compares amounts), so residues are never
+compared all-pairs. A block that would yield more than
+RECON_PROBABLE_MAX_BLOCK_PAIRS candidates (many rows sharing one tail and
+amount, or one time bucket) cannot be told apart anyway and is skipped
+with a warning. Every row is paired at most once: the closest candidates
+win, assigned in one greedy pass.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from app import config
+from app.utils.excel_parser import TEXT_DTYPE, parse_currency
+
+logger = logging.getLogger(__name__)
+
+
+def _text(series: pd.Series) -> pd.Series:
+    if TEXT_DTYPE is object:
+        return series.astype(str).where(series.notna()).str.strip()
+    return series.astype(TEXT_DTYPE).str.strip()
+
+
+def _digits(series: pd.Series) -> pd.Series:
+    """References as bare digits without leading zeros; empty references become missing."""
+    digits = (
+        _text(series)
+            .str.replace(r"\.0+$", "", regex=True)
+            .str.replace(r"\D", "", regex=True)
+            .str.lstrip("0")
+    )
+    return digits.mask(digits.str.len() == 0)
+
+
+def _cents(amounts) -> np.ndarray:
+    """Amounts rounded to the cent as float (NaN stays NaN), usable as a join key."""
+    return np.round(np.asarray(amounts, dtype=np.float64) * 100)
+
+
+def _residue(df: pd.DataFrame, rows: np.ndarray, columns: dict, amounts) -> pd.DataFrame:
+    """Frame of the unpaired `rows` with their original positions and the blocking columns."""
+    residue = pd.DataFrame({'row': rows})
+    for name, values in columns.items():
+        residue[name] = values
+    if amounts is not None:
+        residue['amount'] = _cents(amounts[rows])
+    return residue.dropna()
+
+
+def _without_dense_blocks(rule, bank: pd.DataFrame, provider: pd.DataFrame, on: list):
+    """Drops the blocks whose bank x provider candidate count exceeds the configured limit."""
+    limit = config.PROBABLE_MAX_BLOCK_PAIRS
+    sizes = bank.groupby(on, sort=False).size().to_frame('bank').join(
+        provider.groupby(on, sort=False).size().rename('provider'), how='inner')
+    dense = sizes[sizes['bank'] * sizes['provider'] > limit]
+    if dense.empty:
+        return bank, provider
+    logger.warning("Probable match skipped dense blocks", extra={
+        "rule": rule.name, "blocks": len(dense), "bank_rows": int(dense['bank'].sum()), "limit": limit})
+    dense_keys = dense.reset_index()[on]
+
+    def outside(df):
+        flags = df.merge(dense_keys, on=on, how='left', indicator=True)['_merge'].to_numpy()
+        return df[flags == 'left_only']
+
+    return outside(bank), outside(provider)
+
+
+def _reference_candidates(rule, bank_df, provider_df, bank_rows, provider_rows, amounts, bank_key, provider_key):
+    bank_col = rule.bank_column or bank_key
+    provider_col = rule.provider_column or provider_key
+    if bank_col not in bank_df.columns or provider_col not in provider_df.columns:
+        return None
+
+    n = rule.min_digits
+    bank = _residue(bank_df, bank_rows, {'ref': _digits(bank_df[bank_col].iloc[bank_rows]).to_numpy()}, amounts[0])
+    provider = _residue(provider_df, provider_rows,
+                        {'ref': _digits(provider_df[provider_col].iloc[provider_rows]).to_numpy()}, amounts[1])
+    bank = bank[bank['ref'].str.len() >= n].assign(block=lambda d: d['ref'].str[-n:])
+    provider = provider[provider['ref'].str.len() >= n].assign(block=lambda d: d['ref'].str[-n:])
+
+    on = ['block'] + (['amount'] if amounts[0] is not None else [])
+    bank, provider = _without_dense_blocks(rule, bank, provider, on)
+    pairs = bank.merge(provider, on=on, suffixes=('_bank', '_provider'))
+    if pairs.empty:
+        return pairs
+
+    # Same tail: keep pairs where the shorter reference is the end of the longer one
+    keep = [a.endswith(b) or b.endswith(a) for a, b in zip(pairs['ref_bank'], pairs['ref_provider'])]
+    pairs = pairs[np.asarray(keep, dtype=bool)]
+    score = (pairs['ref_bank'].str.len() - pairs['ref_provider'].str.len()).abs()
+    return pd.DataFrame({'bank': pairs['row_bank'].to_numpy(), 'provider': pairs['row_provider'].to_numpy(),
+                         'score': score.to_numpy(dtype=np.float64)})
+
+
+def _window_candidates(rule, bank_df, provider_df, bank_rows, provider_rows, amounts):
+    needed_bank = list(rule.fields) + [rule.bank_time]
+    needed_provider = list(rule.fields.values()) + [rule.provider_time]
+    if any(c not in bank_df.columns for c in needed_bank) or any(c not in provider_df.columns for c in needed_provider):
+        return None
+
+    def side(df, rows, field_columns, time_column, side_amounts):
+        columns = {f'f{i}': _text(df[col].iloc[rows]).to_numpy() for i, col in enumerate(field_columns)}
+        times = pd.to_datetime(df[time_column].iloc[rows], errors='coerce')
+        columns['time'] = times.to_numpy(dtype='datetime64[ns]')
+        residue = _residue(df, rows, columns, side_amounts)
+        residue['bucket'] = residue['time'].to_numpy().astype(np.int64) // rule.window.value
+        return residue
+
+    bank = side(bank_df, bank_rows, list(rule.fields), rule.bank_time, amounts[0])
+    provider = side(provider_df, provider_rows, list(rule.fields.values()), rule.provider_time, amounts[1])
+
+    # Pairs within the window fall in the same or a neighbouring bucket
+    provider = pd.concat([provider.assign(bucket=provider['bucket'] + shift) for shift in (-1, 0, 1)],
+                         ignore_index=True)
+    on = [f'f{i}' for i in range(len(rule.fields))] + ['bucket'] + (['amount'] if amounts[0] is not None else [])
+    bank, provider = _without_dense_blocks(rule, bank, provider, on)
+    pairs = bank.merge(provider, on=on, suffixes=('_bank', '_provider'))
+    gap = (pairs['time_bank'] - pairs['time_provider']).abs()
+    pairs, gap = pairs[gap <= rule.window], gap[gap <= rule.window]
+    return pd.DataFrame({'bank': pairs['row_bank'].to_numpy(), 'provider': pairs['row_provider'].to_numpy(),
+                         'score': gap.dt.total_seconds().to_numpy(dtype=np.float64)})
+
+
+def assign_pairs(candidates: pd.DataFrame):
+    """One-to-one pairs from scored candidates, lowest score first; returns (bank_rows, provider_rows).
+
+    A single greedy pass over the sorted candidates: a pair is taken when
+    neither of its rows was taken by a better (or equal, earlier) one.
+    """
+    candidates = candidates.sort_values(['score', 'bank', 'provider'], kind='stable')
+    bank = candidates['bank'].to_numpy(dtype=np.int64)
+    provider = candidates['provider'].to_numpy(dtype=np.int64)
+    if not len(bank):
+        return bank, provider
+    bank_taken = bytearray(int(bank.max()) + 1)
+    provider_taken = bytearray(int(provider.max()) + 1)
+    keep = np.zeros(len(bank), dtype=bool)
+    for i, (b, p) in enumerate(zip(bank.tolist(), provider.tolist())):
+        if not bank_taken[b] and not provider_taken[p]:
+            bank_taken[b] = provider_taken[p] = 1
+            keep[i] = True
+    return bank[keep], provider[keep]
+
+
+def find_probable_matches(bank_df: pd.DataFrame, provider_df: pd.DataFrame, positions: np.ndarray, profile):
+    """Runs the profile's probable-match rules over the unmatched residue.
+
+    Returns (bank_rows, provider_rows, rule_names) for the new pairs, where
+    `positions` is the exact match result (-1 for unmatched bank rows).
+    """
+    bank_rows = np.flatnonzero(positions < 0)
+    taken = np.zeros(len(provider_df), dtype=bool)
+    taken[positions[positions >= 0]] = True
+    provider_rows = np.flatnonzero(~taken)
+
+    amounts = (None, None)
+    if profile.checks_amounts and profile.bank.amount in bank_df.columns and profile.provider.amount in provider_df.columns:
+        amounts = (parse_currency(bank_df[profile.bank.amount]).to_numpy(),
+                   parse_currency(provider_df[profile.provider.amount]).to_numpy())
+
+    found_bank, found_provider, found_rules = [], [], []
+    for rule in profile.probable_rules:
+        if not len(bank_rows) or not len(provider_rows):
+            break
+        if rule.type == "reference":
+            candidates = _reference_candidates(rule, bank_df, provider_df, bank_rows, provider_rows, amounts,
+                                               profile.bank.key, profile.provider.key)
+        else:
+            candidates = _window_candidates(rule, bank_df, provider_df, bank_rows, provider_rows, amounts)
+        if candidates is None or candidates.empty:
+            continue
+
+        paired_bank, paired_provider = assign_pairs(candidates)
+        found_bank.append(paired_bank)
+        found_provider.append(paired_provider)
+        found_rules.append(np.full(len(paired_bank), rule.name, dtype=object))
+        bank_rows = np.setdiff1d(bank_rows, paired_bank, assume_unique=True)
+        provider_rows = np.setdiff1d(provider_rows, paired_provider, assume_unique=True)
+
+    if not found_bank:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=object)
+    return np.concatenate(found_bank), np.concatenate(found_provider), np.concatenate(found_rules)
@@ -0,0 +1,189 @@
+"""Registry of reconciliation profiles loaded from YAML.
+
+Each recon type ("atm", "mpesa", "tele", "tele-incoming", ...) is
+described declaratively in recon_profiles.yaml: the columns used to find
+the header, ordered column-rename rules, the match key, dtypes and the
+provider label used in reports, and the amount columns and tolerance
+used to flag amount breaks. The file is read and compiled once;
+renaming an uploaded column is then a cache lookup, with the rule scan
+only happening the first time a given header is seen (the most recent
+RESOLVED_COLUMNS headers per side are remembered).
+"""
+import hashlib
+import json
+from functools import lru_cache
+
+import pandas as pd
+import yaml
+
+from app import config
+from app.services.match_engine import as_text
+
+SUPPORTED_DTYPES = ("string", "float")
+PROBABLE_RULE_TYPES = ("reference", "window")
+# Uploaded column names remembered per ColumnMatcher; uploads are free to send any header
+RESOLVED_COLUMNS = 1024
+
+
+class ColumnMatcher:
+    """Compiled, memoized rename rules for one side of a profile."""
+
+    def __init__(self, rules: list):
+        self._rules = []
+        for rule in rules:
+            if "rename" not in rule or ("contains" in rule) == ("equals" in rule):
+                raise ValueError(f"Column rule needs 'rename' and exactly one of 'contains'/'equals': {rule}")
+            if "contains" in rule:
+                self._rules.append((str(rule["contains"]).upper(), False, rule["rename"]))
+            else:
+                self._rules.append((str(rule["equals"]).upper(), True, rule["rename"]))
+        # Bounded: an upload's headers are client input
+        self.resolve = lru_cache(maxsize=RESOLVED_COLUMNS)(self._resolve)
+
+    def _resolve(self, column) -> str | None:
+        """Canonical name for an uploaded column, or None when no rule applies."""
+        upper_col = str(column).strip().upper()
+        for text, exact, rename in self._rules:
+            if (upper_col == text) if exact else (text in upper_col):
+                return rename
+        return None
+
+    def rename_map(self, columns) -> dict:
+        rename_map = {}
+        for col in columns:
+            target = self.resolve(col)
+            if target is not None:
+                rename_map[col] = target
+        return rename_map
+
+
+class SideProfile:
+    """Settings for one uploaded file (provider or bank)."""
+
+    def __init__(self, name: str, spec: dict):
+        try:
+            self.required_columns = list(spec["required_columns"])
+            self.key = spec["key"]
+        except KeyError as e:
+            raise ValueError(f"Profile side '{name}' is missing {e}")
+        self.matcher = ColumnMatcher(spec.get("columns", []))
+        # Column holding the transaction amount (after renaming), if any
+        self.amount = spec.get("amount")
+        self.dtypes = dict(spec.get("dtypes", {}))
+        for column, dtype in self.dtypes.items():
+            if dtype not in SUPPORTED_DTYPES:
+                raise ValueError(f"Profile side '{name}': unsupported dtype '{dtype}' for {column}")
+
+    def apply_dtypes(self, df: pd.DataFrame):
+        """Cleans the renamed columns in place according to `dtypes`."""
+        for column, dtype in self.dtypes.items():
+            if column not in df.columns:
+                continue
+            if dtype == "string":
+                # Missing keys stay missing instead of becoming the text "nan"
+                df[column] = as_text(df[column])
+            elif dtype == "float":
+                df[column] = pd.to_numeric(df[column], errors="coerce")
+
+
+class ProbableMatchRule:
+    """One rule of the second (probable) matching pass, see app/services/probable_match.py.
+
+    `reference` pairs rows whose references agree after reformatting, or where
+    one is a truncated tail of the other (at least `min_digits` digits).
+    `window` pairs rows with equal `fields` (bank column: provider column)
+    and timestamps at most `window_minutes` apart.
+    """
+
+    def __init__(self, profile: str, spec: dict):
+        self.type = spec.get("type")
+        if self.type not in PROBABLE_RULE_TYPES:
+            raise ValueError(f"Profile '{profile}': probable match rule type must be one of {PROBABLE_RULE_TYPES}, got {self.type!r}")
+        self.name = str(spec.get("name") or self.type)
+        try:
+            if self.type == "reference":
+                self.bank_column = spec.get("bank")
+                self.provider_column = spec.get("provider")
+                self.min_digits = int(spec.get("min_digits", 6))
+                if self.min_digits < 1:
+                    raise ValueError("min_digits must be positive")
+            else:
+                self.fields = dict(spec.get("fields") or {})
+                time = spec["time"]
+                self.bank_time, self.provider_time = time["bank"], time["provider"]
+                self.window = pd.Timedelta(minutes=float(spec.get("window_minutes", 5)))
+                if self.window <= pd.Timedelta(0):
+                    raise ValueError("window_minutes must be positive")
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Profile '{profile}': invalid probable match rule {self.name!r}: {e}")
+
+
+class ReconProfile:
+
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.provider_label = spec.get("provider_label", "Provider")
+        self.split_by_issuer_acquirer = bool(spec.get("split_by_issuer_acquirer", False))
+        try:
+            self.provider = SideProfile(f"{name}.provider", spec["provider"])
+            self.bank = SideProfile(f"{name}.bank", spec["bank"])
+        except KeyError as e:
+            raise ValueError(f"Profile '{name}' is missing {e}")
+        tolerance = spec.get("amount_tolerance") or {}
+        try:
+            self.amount_tolerance = (
+                float(tolerance.get("absolute", config.AMOUNT_TOLERANCE_ABS)),
+                float(tolerance.get("percent", config.AMOUNT_TOLERANCE_PCT)),
+            )
+        except (TypeError, ValueError):
+            raise ValueError(f"Profile '{name}': amount_tolerance values must be numbers, got {tolerance}")
+        self.probable_rules = [ProbableMatchRule(name, rule) for rule in spec.get("probable_match") or []]
+        names = [rule.name for rule in self.probable_rules]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Profile '{name}': probable match rule names must be unique")
+        # Changes to a profile must invalidate cached parses made with it
+        self.fingerprint = hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+    def side(self, is_eth: bool) -> SideProfile:
+        return self.provider if is_eth else self.bank
+
+    @property
+    def checks_amounts(self) -> bool:
+        """True when both sides name an amount column, so matched pairs are compared on amount."""
+        return bool(self.bank.amount and self.provider.amount)
+
+
+class ProfileRegistry:
+
+    def __init__(self, profiles: dict, default_profile: str):
+        if default_profile not in profiles:
+            raise ValueError(f"default_profile '{default_profile}' is not defined")
+        self.profiles = profiles
+        self.default_profile = default_profile
+
+    @classmethod
+    def from_yaml(cls, path: str) -> "ProfileRegistry":
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+        specs = data.get("profiles") or {}
+        if not specs:
+            raise ValueError(f"No profiles defined in {path}")
+        profiles = {str(name).lower(): ReconProfile(str(name).lower(), spec) for name, spec in specs.items()}
+        return cls(profiles, str(data.get("default_profile", next(iter(profiles)))).lower())
+
+    def get(self, recon_type: str) -> ReconProfile:
+        """Profile for a recon type; unknown types fall back to the default profile."""
+        recon_type = str(recon_type).lower().strip()
+        return self.profiles.get(recon_type) or self.profiles[self.default_profile]
+
+    def names(self) -> list:
+        return list(self.profiles)
+
+
+@lru_cache(maxsize=None)
+def get_registry(path: str | None = None) -> ProfileRegistry:
+    return ProfileRegistry.from_yaml(path or config.PROFILES_PATH)
+
+
+def get_profile(recon_type: str) -> ReconProfile:
+    return get_registry().get(recon_type)
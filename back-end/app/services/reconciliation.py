@@ -1,122 +1,272 @@
 import pandas as pd
-import io
+import logging
+import os
 import re
-from app.utils.excel_parser import load_excel_dynamic, clean_currency
-import datetime
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from app.utils.excel_parser import load_excel_dynamic, parse_currency
+from app.services.pool import discard_parse_executor, get_parse_executor
+from app.services.cache import ParsedFrameCache
+from app.services.profiles import get_profile
+from app.services.probable_match import find_probable_matches
+from app.services.match_engine import (
+    amount_breaks, canonical_keys, join_frames, lookup_positions, normalize_key_pair, right_only_mask,
+    status_from_positions,
+)
+from app.utils.readers import resolve_excel_engine
+from app.utils.normalize import normalize_result_frame
+from app.services.report_writer import write_workbook
+from app.services.metrics import stage
+from app import config
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# "left": every bank row, classified against the provider file.
+# "full": also the provider rows no bank row has, as MISSING_IN_BANK.
+RECON_MODES = ("left", "full")
+
+TERMINAL_COLUMN_NAMES = ('terminalid', 'termid')
+
+
+def check_mode(mode: str | None) -> str:
+    mode = str(mode or "left").lower().strip()
+    if mode not in RECON_MODES:
+        raise ValueError(f"Unknown reconcile mode '{mode}', expected one of {RECON_MODES}")
+    return mode
+
+
+def find_terminal_columns(columns) -> list:
+    """Terminal id columns (TERMINAL_ID, Term Id, ..., merge suffixes ignored), exact names first."""
+    exact, loose = [], []
+    for col in columns:
+        if not isinstance(col, str):
+            continue
+        base = col[:-2] if col.endswith(('_x', '_y')) else col
+        if base.replace('_', '').replace(' ', '').lower() in TERMINAL_COLUMN_NAMES:
+            exact.append(col)
+        elif 'terminal' in base.lower() and 'id' in base.lower():
+            loose.append(col)
+    return exact or loose
+
+
+def terminal_summary(result_df: pd.DataFrame, column: str | None = None) -> list | None:
+    """Recon_Status counts per terminal id, terminals with the most unmatched rows first.
+
+    The terminal column is `column` or auto-detected; when both sides carry
+    one, bank values come first and provider-only rows fall back to the
+    provider's. Ids are compared like match keys. None when there is no
+    terminal column.
+    """
+    columns = [column] if column else find_terminal_columns(result_df.columns)
+    columns = [c for c in columns if c in result_df.columns]
+    if not columns:
+        return None
+    terminal = canonical_keys(result_df[columns[0]])
+    for col in columns[1:]:
+        terminal = terminal.fillna(canonical_keys(result_df[col]))
+
+    counts = (
+        result_df.groupby([terminal.rename('terminal'), result_df['Recon_Status']], observed=True, dropna=False)
+        .size()
+        .unstack(fill_value=0)
+    )
+    counts['total'] = counts.sum(axis=1)
+    unmatched = counts['total'] - (counts['MATCHED'] if 'MATCHED' in counts.columns else 0)
+    counts = counts.assign(_unmatched=unmatched).sort_values(['_unmatched', 'total'], ascending=False, kind='stable')
+    summary = []
+    for terminal_id, row in counts.drop(columns='_unmatched').iterrows():
+        entry = {'terminal': None if pd.isna(terminal_id) else str(terminal_id)}
+        entry.update({str(status): int(n) for status, n in row.items()})
+        summary.append(entry)
+    return summary
+
+
+def status_counts(result_df: pd.DataFrame) -> dict:
+    """Recon_Status counts, leaving out statuses that do not occur."""
+    counts = result_df['Recon_Status'].value_counts()
+    return {str(k): int(v) for k, v in counts.items() if v > 0}
+
+
+def mismatch_positions(result_df: pd.DataFrame) -> np.ndarray:
+    """Row positions of every non-MATCHED row, in result order."""
+    return np.flatnonzero((result_df['Recon_Status'] != 'MATCHED').to_numpy())
+
+
+def combine_sheets(sheets) -> list:
+    """Merges (sheet_name, row_positions) pairs whose names Excel would treat as the same sheet.
+
+    Descriptions that abbreviate to one sheet name (e.g. 'Purchase' and
+    'POS PUR THEM-ON-THEM' both become POS) would otherwise produce duplicate
+    worksheets, which xlsxwriter refuses. Names compare case-insensitively;
+    a merged sheet keeps the first name and position, rows in frame order.
+    """
+    combined = {}
+    for sheet_name, positions in sheets:
+        combined.setdefault(sheet_name.lower(), (sheet_name, []))[1].append(positions)
+    return [
+        (sheet_name, parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts)))
+        for sheet_name, parts in combined.values()
+    ]
+
 
 class ReconciliationService:
+
+    def __init__(self, cache: ParsedFrameCache | None = None):
+        self.cache = cache if cache is not None else ParsedFrameCache()
     
-    def process_files(self, eth_content: bytes, zzb_content: bytes, recon_type: str = "atm"):
+    def recon_settings(self, recon_type: str = "atm"):
+        """Returns (eth_required, zzb_required, left_key, right_key) for a recon type."""
+        profile = get_profile(recon_type)
+        return profile.provider.required_columns, profile.bank.required_columns, profile.bank.key, profile.provider.key
+
+    def load_frames(self, eth_content: bytes, zzb_content: bytes, recon_type: str, engine: str):
+        """Returns the parsed and renamed (provider, bank) frames, reusing cached parses of identical uploads."""
+        profile = get_profile(recon_type)
+        eth_required, zzb_required, _, _ = self.recon_settings(recon_type)
+        engine_key = resolve_excel_engine(engine)
+        sides = {
+            'eth': (eth_content, eth_required, True),
+            'zzb': (zzb_content, zzb_required, False),
+        }
+
+        frames, keys = {}, {}
+        for side, (content, _, _) in sides.items():
+            keys[side] = self.cache.make_key(content, f"{profile.name}.{profile.fingerprint}", side, engine_key)
+            frames[side] = self.cache.get(keys[side])
+
+        misses = {side: sides[side] for side in sides if frames[side] is None}
+        if not misses:
+            return frames['eth'], frames['zzb']
+
+        with stage("parse", recon_type) as timing:
+            parsed = self._parse_uploads(misses, engine)
+            timing.rows_out = sum(len(df) for df in parsed.values())
+        with stage("rename", recon_type, rows_in=timing.rows_out) as timing:
+            for side, df in parsed.items():
+                self.rename_for_logic(df, is_eth=sides[side][2], recon_type=recon_type)
+            timing.rows_out = timing.rows_in
+        for side, df in parsed.items():
+            self.cache.put(keys[side], df)
+            frames[side] = df
+
+        return frames['eth'], frames['zzb']
+
+    def _parse_uploads(self, uploads: dict, engine: str) -> dict:
+        """Parses {side: (content, required, is_eth)} side by side; wall time is the slower of the two.
+
+        A process pool whose child died (crash, OOM kill, failed import) is
+        broken for good: it is replaced and the parse retried once.
+        """
+        for attempt in (1, 2):
+            executor = get_parse_executor()
+            try:
+                futures = {
+                    side: executor.submit(load_excel_dynamic, content, required, 0, engine)
+                    for side, (content, required, _) in uploads.items()
+                }
+                return {side: future.result() for side, future in futures.items()}
+            except BrokenProcessPool:
+                discard_parse_executor(executor)
+                if attempt == 2:
+                    raise
+                logger.warning("Parse pool broke, retrying on a new pool")
+
+    def process_files(self, eth_content: bytes, zzb_content: bytes, recon_type: str = "atm", engine: str | None = None,
+                      mode: str = "left"):
         recon_type = str(recon_type).lower().strip()
+        engine = engine or config.EXCEL_ENGINE
+        mode = check_mode(mode)
 
-        if recon_type == "mpesa":
-            eth_required = ['RECEIPT NO.', 'LINKED TRANSACTION ID', 'REASON TYPE'] 
-            zzb_required = ['ZAMZAM_REF_NO', 'AMOUNT', 'CONVERSION_ID']
-            left_key = 'Match_Key'
-            right_key = 'Match_Key'
-        elif recon_type == "tele":
-            eth_required = ['ORDER_ID', 'AMOUNT', 'REF_NO'] 
-            zzb_required = ['TRN_REF_NO', 'AMOUNT', 'TXNREF']
-            left_key = 'Match_Key'
-            right_key = 'Match_Key'
-        # --- NEW SECTION FOR TELE-INCOMING ---
-        elif recon_type == "tele-incoming":
-            # Provider (Eth) has ORDER_ID, Bank (ZZB) has TELLEBIRR REF
-            eth_required = ['ORDER_ID', 'AMOUNT', 'REF_NO']
-            zzb_required = ['TELLEBIRR REF', 'AMOUNT', 'TRN_REF_NO']
-            left_key = 'Match_Key'
-            right_key = 'Match_Key'
-        # --------------------------------------
-        else:
-            eth_required = ['REFNUM', 'AMOUNT', 'PAN']
-            zzb_required = ['TRN_REF_NO', 'AMOUNT', 'RRN']
-            left_key = 'RRN'
-            right_key = 'Refnum_F37'
-
-        
-        df_eth = load_excel_dynamic(eth_content, eth_required, default_row=0)
-        df_zzb = load_excel_dynamic(zzb_content, zzb_required, default_row=0)
-
-        # 3. Standardize Columns
-        self.rename_for_logic(df_eth, is_eth=True, recon_type=recon_type)
-        self.rename_for_logic(df_zzb, is_eth=False, recon_type=recon_type)
- 
-        # 4. Data Cleaning
-        if right_key in df_eth.columns:
-            df_eth[right_key] = df_eth[right_key].astype(str).str.strip()
-            df_eth = df_eth.drop_duplicates(subset=[right_key])
-        
-        if left_key in df_zzb.columns:
-            df_zzb[left_key] = df_zzb[left_key].astype(str).str.strip()
+        # 1-3. Parse (or fetch from cache) and standardize columns
+        df_eth, df_zzb = self.load_frames(eth_content, zzb_content, recon_type, engine)
+        merged_df, _ = self.reconcile_frames(df_eth, df_zzb, recon_type, mode)
+        return merged_df
 
-        desc_col = 'Transaction_Description'
-        if desc_col not in df_eth.columns:
-            df_eth[desc_col] = recon_type.upper() + " Transaction"
+    def reconcile_frames(self, df_eth, df_zzb, recon_type: str = "atm", mode: str = "left"):
+        """Matches parsed (provider, bank) frames; returns (merged_df, positions).
 
-        # 5. Perform the Merge
-        try:
-            merged_df = pd.merge(
-                df_zzb, 
-                df_eth, 
-                left_on=left_key, 
-                right_on=right_key, 
-                how='left', 
-                indicator=True
-            )
-        except KeyError as e:
+        `positions` holds, per bank row, the provider row it was paired with
+        (-1 when unmatched). In "full" mode the provider rows no bank row has
+        follow the bank rows as MISSING_IN_BANK. The frames' key and dtype
+        columns are cleaned in place.
+        """
+        mode = check_mode(mode)
+        profile = get_profile(recon_type)
+        left_key, right_key = profile.bank.key, profile.provider.key
+
+        rows_in = len(df_eth) + len(df_zzb)
+        if left_key not in df_zzb.columns or right_key not in df_eth.columns:
             raise KeyError(f"Merge failed. Missing keys. ZZB: {df_zzb.columns.tolist()}, Provider: {df_eth.columns.tolist()}")
 
-        # 6. Map Statuses
-        merged_df['Recon_Status'] = merged_df['_merge'].map({
-            'both': 'MATCHED',
-            'left_only': 'MISSING_IN_PROVIDER', 
-            'right_only': 'MISSING_IN_BANK'   
-        }).astype(str)
+        # 4. Data Cleaning: match keys normalized from the columns as read (numeric
+        # columns become int64 keys directly), then the profile dtypes (keys as trimmed text)
+        with stage("clean", recon_type, rows_in=rows_in) as timing:
+            keys = normalize_key_pair(df_zzb[left_key], df_eth[right_key])
+            profile.provider.apply_dtypes(df_eth)
+            profile.bank.apply_dtypes(df_zzb)
 
-        return merged_df
+            desc_col = 'Transaction_Description'
+            if desc_col not in df_eth.columns:
+                df_eth[desc_col] = recon_type.upper() + " Transaction"
+            timing.rows_out = rows_in
+
+        # 5. Match: hash-index join on normalized keys (first provider row per key wins)
+        with stage("merge", recon_type, rows_in=rows_in) as timing:
+            positions = lookup_positions(keys)
+            provider_only = right_only_mask(keys) if mode == "full" else None
+            del keys
+
+            # 5b. Optional probable-match pass over the unmatched residue
+            match_rules = None
+            probable = None
+            if config.PROBABLE_MATCH_ENABLED and profile.probable_rules:
+                bank_rows, provider_rows, rule_names = find_probable_matches(df_zzb, df_eth, positions, profile)
+                match_rules = np.where(positions >= 0, 'key', '').astype(object)
+                match_rules[bank_rows] = rule_names
+                probable = np.zeros(len(positions), dtype=bool)
+                probable[bank_rows] = True
+                positions = positions.copy()
+                positions[bank_rows] = provider_rows
+                if provider_only is not None:
+                    provider_only[provider_rows] = False
+
+            right_only = np.flatnonzero(provider_only) if provider_only is not None else None
+            merged_df = join_frames(df_zzb, df_eth, left_key, right_key, positions, right_only=right_only)
+            timing.rows_out = len(merged_df)
+
+        # 6. Map Statuses (matched pairs are also compared on amount)
+        with stage("status", recon_type, rows_in=len(merged_df)) as timing:
+            n_right_only = len(merged_df) - len(positions)
+            breaks = self.amount_mismatch(merged_df, profile, df_zzb.columns, df_eth.columns)
+            if breaks is not None:
+                breaks = breaks[:len(positions)]
+            merged_df['Recon_Status'] = status_from_positions(positions, breaks, probable, n_right_only)
+            if match_rules is not None:
+                merged_df['Match_Rule'] = np.concatenate([match_rules, np.full(n_right_only, '', dtype=object)])
+            timing.rows_out = len(merged_df)
+
+        return merged_df, positions
+
+    def amount_mismatch(self, merged_df, profile, bank_columns, provider_columns):
+        """Per-row amount-break mask for a joined frame, or None when the profile compares no amounts."""
+        if not profile.checks_amounts:
+            return None
+        bank_col, provider_col = profile.bank.amount, profile.provider.amount
+        # A column present on both sides carries the merge suffixes
+        if bank_col in provider_columns:
+            bank_col += '_x'
+        if provider_col in bank_columns:
+            provider_col += '_y'
+        if bank_col not in merged_df.columns or provider_col not in merged_df.columns:
+            return None
+        absolute, percent = profile.amount_tolerance
+        return amount_breaks(parse_currency(merged_df[bank_col]), parse_currency(merged_df[provider_col]), absolute, percent)
 
     def rename_for_logic(self, df, is_eth=False, recon_type="atm"):
-        rename_map = {}
-        for col in df.columns:
-            upper_col = col.strip().upper()
-            
-            if recon_type == "mpesa":
-                if is_eth:
-                    if 'LINKED TRANSACTION ID' in upper_col: rename_map[col] = 'Match_Key'
-                    elif 'REASON TYPE' in upper_col: rename_map[col] = 'Transaction_Description'
-                    elif 'RECEIPT NO' in upper_col: rename_map[col] = 'Provider_Ref'
-                else:
-                    if 'CONVERSION_ID' in upper_col: rename_map[col] = 'Match_Key'
-                    elif 'TRANSACTION_DESC' in upper_col: rename_map[col] = 'Transaction_Description'
-            
-            elif recon_type == "tele":
-                if is_eth:
-                    if 'ORDER_ID' in upper_col: rename_map[col] = 'Match_Key'
-                    elif 'TRANSACTION_TYP' in upper_col: rename_map[col] = 'Transaction_Description'
-                else:
-                    if 'TXNREF' in upper_col: rename_map[col] = 'Match_Key'
-                    elif 'TRANSACTION_DESC' in upper_col: rename_map[col] = 'Transaction_Description'
-
-            # --- NEW MAPPING FOR TELE-INCOMING ---
-            elif recon_type == "tele-incoming":
-                if is_eth: # Telebirr File (Img 3)
-                    if 'ORDER_ID' in upper_col: rename_map[col] = 'Match_Key'
-                    elif 'TRANSACTION_TYPE' in upper_col: rename_map[col] = 'Transaction_Description'
-                else: # Bank File (Img 2)
-                    if 'TELLEBIRR REF' in upper_col: rename_map[col] = 'Match_Key'
-                    elif 'TRANSACTION DESCRIPTION' in upper_col: rename_map[col] = 'Transaction_Description'
-            # --------------------------------------
-            
-            else:
-                if is_eth:
-                    if 'REFNUM' in upper_col: rename_map[col] = 'Refnum_F37'
-                    elif 'TRANSACTION_DESCRIPTION' in upper_col: rename_map[col] = 'Transaction_Description'
-                    elif 'ISSUER' in upper_col: rename_map[col] = 'Issuer'
-                    elif 'ACQUIRER' in upper_col: rename_map[col] = 'Acquirer'
-                else:
-                    if 'RRN' in upper_col: rename_map[col] = 'RRN'
-                
-        df.rename(columns=rename_map, inplace=True)
+        """Renames uploaded columns to the canonical names of the recon type's profile."""
+        matcher = get_profile(recon_type).side(is_eth).matcher
+        df.rename(columns=matcher.rename_map(df.columns), inplace=True)
 
     def abbreviate_description(self, description):
         """Your specific abbreviation logic"""
@@ -132,86 +282,118 @@ class ReconciliationService:
                 description = description.replace(long_text, short_text)
         return description
 
-    def generate_excel_report(self, merged_df, recon_type="atm"):
-        output = io.BytesIO()
-        
+    def partition_report_sheets(self, df, recon_type="atm"):
+        """Splits the report rows into per-description sheets in one groupby pass.
+
+        Returns (sheet_name, row_positions) in sheet order: descriptions in order
+        of first appearance and, for ATM, the Issue / Acquire / Both split where
+        ZamZam is the issuer only, the acquirer only, or both. Descriptions that
+        abbreviate to the same sheet name share that sheet (see combine_sheets).
+        """
+        desc_col = 'Transaction_Description'
+        descriptions = df[desc_col]
+
+        if get_profile(recon_type).split_by_issuer_acquirer and 'Issuer' in df.columns and 'Acquirer' in df.columns:
+            # ZamZam flags computed once for the whole frame
+            is_issuer = df['Issuer'].astype(str).str.contains('ZamZam', case=False).to_numpy()
+            is_acquirer = df['Acquirer'].astype(str).str.contains('ZamZam', case=False).to_numpy()
+            side = np.select(
+                [is_issuer & is_acquirer, is_issuer, is_acquirer],
+                ['Both', 'Issue', 'Acquire'],
+                default=''
+            )
+            groups = df.groupby([descriptions, side], sort=False).indices
+            sides = ('Issue', 'Acquire', 'Both')
+        else:
+            groups = {(key, ''): positions for key, positions in df.groupby(descriptions, sort=False).indices.items()}
+            sides = ('',)
+
+        sheets = []
+        for description in descriptions.unique():
+            desc_str = str(description) if description else "General"
+            short_description = self.abbreviate_description(desc_str)
+            short_description = re.sub(r'[\\/*?:\[\]]', '', short_description)[:24]
+
+            for side_name in sides:
+                positions = groups.get((description, side_name))
+                if positions is None or len(positions) == 0:
+                    continue
+                # Simple sheet for Tele/Mpesa, one per side for ATM
+                sheet_name = f'{short_description}-{side_name}' if side_name else short_description[:31]
+                sheets.append((sheet_name, positions))
+        return combine_sheets(sheets)
+
+    def report_sheets(self, merged_df, recon_type="atm", mode="left"):
+        """Yields the report's (sheet_name, DataFrame) pairs in workbook order."""
         # --- 1. DATA CLEANUP FOR EXCEL ---
         # Remove "UNNAMED" columns
         cols_to_keep = [c for c in merged_df.columns if "UNNAMED" not in str(c).upper()]
-        df_to_export = merged_df[cols_to_keep].copy()
-
-        # FIX: Convert 'category' columns to string first
-        # This prevents the "Cannot setitem on a Categorical" error
-        for col in df_to_export.select_dtypes(include=['category']).columns:
-            df_to_export[col] = df_to_export[col].astype(str)
-
-        # FIX: Convert 'datetime' columns to string
-        for col in df_to_export.select_dtypes(include=['datetime', 'datetimetz']).columns:
-            df_to_export[col] = df_to_export[col].astype(str)
-            
-        # Now it is safe to handle NaNs and objects
-        df_to_export = df_to_export.fillna("")
-        
-        # Double check remaining objects (like hidden timestamps in object columns)
-        for col in df_to_export.select_dtypes(include=['object']).columns:
-            if df_to_export[col].apply(lambda x: isinstance(x, (pd.Timestamp, datetime.date))).any():
-                df_to_export[col] = df_to_export[col].astype(str)
+        # Dates, categories, hidden timestamps in object columns, NaN and inf
+        # are handled by the same normalization the JSON endpoints use
+        df_to_export = normalize_result_frame(merged_df[cols_to_keep])
 
         # Identify Provider Name for Labels
-        provider_name = "EthSwitch"
-        if "tele" in recon_type: provider_name = "Telebirr"
-        elif "mpesa" in recon_type: provider_name = "M-Pesa"
-
-        # --- 2. GENERATE WORKBOOK ---
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            
-            # Dashboard Sheet
-            summary_data = {
-                'Metric': [
-                    'Total ZamZam Transactions', 
-                    f'Matched with {provider_name}', 
-                    f'Missing in {provider_name} (Action Required)',
-                    'Missing in Bank'
-                ],
-                'Count': [
-                    len(df_to_export),
-                    len(df_to_export[df_to_export['_merge'] == 'both']),
-                    len(df_to_export[df_to_export['_merge'] == 'left_only']),
-                    len(df_to_export[df_to_export['_merge'] == 'right_only'])
-                ]
-            }
-            pd.DataFrame(summary_data).to_excel(writer, sheet_name='Dashboard', index=False)
-
-            # Dynamic Sheet Splitting
-            if 'Transaction_Description' not in df_to_export.columns:
-                df_to_export['Transaction_Description'] = recon_type.upper()
-
-            transaction_descriptions = df_to_export['Transaction_Description'].unique()
-
-            for description in transaction_descriptions:
-                desc_str = str(description) if description else "General"
-                short_description = self.abbreviate_description(desc_str)
-                short_description = re.sub(r'[\\/*?:\[\]]', '', short_description)[:24]
-
-                desc_df = df_to_export[df_to_export['Transaction_Description'] == description]
-
-                if recon_type == "atm" and 'Issuer' in desc_df.columns and 'Acquirer' in desc_df.columns:
-                    # ATM logic (keep existing split)
-                    zzb_both = desc_df[(desc_df['Issuer'].astype(str).str.contains('ZamZam', case=False)) & (desc_df['Acquirer'].astype(str).str.contains('ZamZam', case=False))]
-                    zzb_issue = desc_df[(desc_df['Issuer'].astype(str).str.contains('ZamZam', case=False)) & (~desc_df['Acquirer'].astype(str).str.contains('ZamZam', case=False))]
-                    zzb_acquire = desc_df[(desc_df['Acquirer'].astype(str).str.contains('ZamZam', case=False)) & (~desc_df['Issuer'].astype(str).str.contains('ZamZam', case=False))]
-
-                    if not zzb_issue.empty: zzb_issue.to_excel(writer, sheet_name=f'{short_description}-Issue', index=False)
-                    if not zzb_acquire.empty: zzb_acquire.to_excel(writer, sheet_name=f'{short_description}-Acquire', index=False)
-                    if not zzb_both.empty: zzb_both.to_excel(writer, sheet_name=f'{short_description}-Both', index=False)
-                else:
-                    # Simple sheet for Tele/Mpesa
-                    sheet_name = f'{short_description}'[:31]
-                    desc_df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-            # Mismatches Sheet
-            mismatches_df = df_to_export[df_to_export['_merge'] == 'left_only']
-            if not mismatches_df.empty:
-                mismatches_df.to_excel(writer, sheet_name='Action_Required', index=False)
-
-        return output.getvalue()
\ No newline at end of file
+        provider_name = get_profile(recon_type).provider_label
+
+        # --- 2. SHEETS ---
+        # Dashboard Sheet (all counts from a single value_counts)
+        status_counts = df_to_export['Recon_Status'].value_counts()
+        summary_data = {
+            'Metric': [
+                'Total ZamZam Transactions', 
+                f'Matched with {provider_name}', 
+                f'Missing in {provider_name} (Action Required)',
+                'Missing in Bank',
+                'Amount Mismatch (Action Required)',
+                'Probable Match (Review)'
+            ],
+            'Count': [
+                # Provider-only rows (full mode) are not bank transactions
+                len(df_to_export) - int(status_counts.get('MISSING_IN_BANK', 0)),
+                int(status_counts.get('MATCHED', 0)),
+                int(status_counts.get('MISSING_IN_PROVIDER', 0)),
+                int(status_counts.get('MISSING_IN_BANK', 0)),
+                int(status_counts.get('AMOUNT_MISMATCH', 0)),
+                int(status_counts.get('PROBABLE_MATCH', 0))
+            ]
+        }
+        yield 'Dashboard', pd.DataFrame(summary_data)
+
+        # Dynamic Sheet Splitting
+        if 'Transaction_Description' not in df_to_export.columns:
+            df_to_export['Transaction_Description'] = recon_type.upper()
+
+        for sheet_name, positions in self.partition_report_sheets(df_to_export, recon_type):
+            yield sheet_name, df_to_export.iloc[positions]
+
+        # Mismatches Sheets
+        if status_counts.get('MISSING_IN_PROVIDER', 0):
+            yield 'Action_Required', df_to_export[df_to_export['Recon_Status'] == 'MISSING_IN_PROVIDER']
+        if status_counts.get('AMOUNT_MISMATCH', 0):
+            yield 'Amount_Mismatch', df_to_export[df_to_export['Recon_Status'] == 'AMOUNT_MISMATCH']
+        if status_counts.get('PROBABLE_MATCH', 0):
+            yield 'Probable_Match', df_to_export[df_to_export['Recon_Status'] == 'PROBABLE_MATCH']
+        if status_counts.get('MISSING_IN_BANK', 0):
+            yield 'Missing_In_Bank', df_to_export[df_to_export['Recon_Status'] == 'MISSING_IN_BANK']
+
+        # Full mode: per-terminal status counts when the files carry a terminal id
+        if check_mode(mode) == "full":
+            terminals = terminal_summary(merged_df)
+            if terminals:
+                yield 'Terminals', pd.DataFrame(terminals)
+
+    def write_excel_report(self, merged_df, path, recon_type="atm", mode="left"):
+        """Writes the report to `path` with the constant-memory writer."""
+        with stage("excel", recon_type, rows_in=len(merged_df)) as timing:
+            timing.rows_out = write_workbook(path, self.report_sheets(merged_df, recon_type, mode))
+
+    def generate_excel_report(self, merged_df, recon_type="atm", mode="left"):
+        """Returns the report as bytes. Endpoints should prefer write_excel_report and stream the file."""
+        fd, path = tempfile.mkstemp(prefix="recon-report-", suffix=".xlsx", dir=config.SPOOL_DIR)
+        os.close(fd)
+        try:
+            self.write_excel_report(merged_df, path, recon_type, mode=mode)
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
@@ -0,0 +1,91 @@
+"""Constant-memory xlsx writer for the reconciliation report.
+
+Sheets are written row by row with xlsxwriter's `constant_memory` mode
+straight to a file on disk, so a worksheet never has to be held in
+memory as cells and the finished workbook is not buffered in a BytesIO.
+pandas' `to_excel` cannot be used in this mode because it emits cells
+column by column.
+
+Rows are converted to plain Python values in chunks of CHUNK_ROWS, so
+only a chunk of a sheet is held as Python objects at a time.
+"""
+import pandas as pd
+
+
+EXCEL_MAX_ROWS = 1_048_576
+# Matches the header style pandas uses for to_excel
+HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+
+_PLAIN_INFERRED = {"string", "integer", "floating", "boolean", "empty"}
+_PLAIN_TYPES = (str, int, float, bool)
+# Rows converted to Python values at a time, so a sheet is never held whole as cells
+CHUNK_ROWS = 10_000
+
+
+def _column_values(series: pd.Series) -> list:
+    values = series.tolist()
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) not in _PLAIN_INFERRED:
+        # xlsxwriter only knows plain scalars; anything else is written as its text form
+        values = [v if v is None or isinstance(v, _PLAIN_TYPES) else str(v) for v in values]
+    return values
+
+
+def prepare_rows(df: pd.DataFrame) -> list:
+    """Returns the rows of `df` as tuples of plain Python values."""
+    columns = [_column_values(df.iloc[:, i]) for i in range(df.shape[1])]
+    return list(zip(*columns))
+
+
+def sheet_chunks(sheets, chunk_rows: int = CHUNK_ROWS):
+    """Splits (sheet_name, DataFrame) pairs into (sheet_name, header, chunk) triples.
+
+    `header` is set on the first chunk of each sheet (which may be empty) and
+    None on the following ones.
+    """
+    for name, df in sheets:
+        if len(df) + 1 > EXCEL_MAX_ROWS:
+            raise ValueError(f"This sheet is too large! Your sheet size is: {len(df)}, {df.shape[1]} "
+                             f"Max sheet size is: {EXCEL_MAX_ROWS}, 16384")
+        yield name, [str(c) for c in df.columns], df.iloc[:chunk_rows]
+        for start in range(chunk_rows, len(df), chunk_rows):
+            yield name, None, df.iloc[start:start + chunk_rows]
+
+
+def write_workbook(path: str, sheets, chunk_rows: int = CHUNK_ROWS):
+    """Writes `sheets`, an iterable of (sheet_name, DataFrame), to an xlsx file at `path`.
+
+    Returns the number of data rows written over all sheets.
+    """
+    # Imported on first use: only report requests need it (gunicorn preloads it, see main.warm_up)
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        writer = _ChunkWriter(workbook)
+        for name, header, chunk in sheet_chunks(sheets, chunk_rows):
+            writer.write(name, header, prepare_rows(chunk))
+    finally:
+        workbook.close()
+    return writer.rows_written
+
+
+class _ChunkWriter:
+    """Appends row chunks to the workbook, starting a worksheet at each header."""
+
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self.header_format = workbook.add_format(HEADER_FORMAT)
+        self.worksheet = None
+        self.next_row = 0
+        self.rows_written = 0
+
+    def write(self, name: str, header: list | None, rows: list):
+        if header is not None:
+            self.worksheet = self.workbook.add_worksheet(name)
+            self.worksheet.write_row(0, 0, header, self.header_format)
+            self.next_row = 1
+        # constant_memory requires strictly row-ordered writes
+        for row in rows:
+            self.worksheet.write_row(self.next_row, 0, row)
+            self.next_row += 1
+        self.rows_written += len(rows)
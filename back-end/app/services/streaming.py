@@ -0,0 +1,135 @@
+"""Memory-bounded reconciliation for uploads too large to hold in RAM.
+
+The provider (ETH) file is read chunk by chunk into a compact key index
+holding only the match key and the columns the report needs, looked up
+by the canonical form of the key (see match_engine.canonical_keys), so
+"000123", "123.0" and 123 match here exactly as in the in-memory
+reconcile. The bank (ZZB) file is then streamed through that index in
+batches and every classified batch is appended to a CSV on disk, so peak
+memory is the index plus one batch regardless of file size.
+"""
+import logging
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from app import config
+from app.services.match_engine import canonical_keys, join_frames, status_from_positions
+from app.services.metrics import stage
+from app.services.profiles import get_profile
+from app.services.reconciliation import ReconciliationService
+from app.utils.excel_parser import iter_file_dynamic
+
+logger = logging.getLogger(__name__)
+
+# Provider columns carried into the output besides the match key
+INDEX_COLUMNS = ('Transaction_Description', 'Issuer', 'Acquirer', 'Provider_Ref', 'AMOUNT')
+
+# Canonical provider key the index is looked up by; dropped before the join
+INDEX_KEY = '_Index_Key'
+
+
+def spool_upload(fileobj, suffix: str = "") -> str:
+    """Copies an uploaded file object to a temp file on disk in fixed-size blocks; returns its path."""
+    fd, path = tempfile.mkstemp(prefix="recon-", suffix=suffix, dir=config.SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(fileobj, out, 1024 * 1024)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+class StreamingReconciler:
+
+    def __init__(self, service: ReconciliationService | None = None, chunk_rows: int | None = None,
+                 memory_limit_mb: int | None = None):
+        self.service = service or ReconciliationService()
+        self.chunk_rows = max(1, chunk_rows or config.STREAM_CHUNK_ROWS)
+        self.memory_limit = (memory_limit_mb or config.STREAM_MEMORY_LIMIT_MB) * 1024 * 1024
+
+    def build_provider_index(self, eth_path: str, eth_required: list, right_key: str, recon_type: str) -> pd.DataFrame:
+        """Reads the provider file in chunks and keeps one compact row per canonical key (first occurrence wins).
+
+        The canonical keys are kept in the INDEX_KEY column.
+        """
+        parts = []
+        used_bytes = 0
+        amount_col = get_profile(recon_type).provider.amount
+        for chunk in iter_file_dynamic(eth_path, eth_required, self.chunk_rows):
+            self.service.rename_for_logic(chunk, is_eth=True, recon_type=recon_type)
+            if right_key not in chunk.columns:
+                raise KeyError(f"Provider file is missing key column '{right_key}'. Columns: {chunk.columns.tolist()}")
+
+            carried = INDEX_COLUMNS + ((amount_col,) if amount_col and amount_col not in INDEX_COLUMNS else ())
+            keep = [right_key] + [c for c in carried if c in chunk.columns and c != right_key]
+            part = chunk[keep].copy()
+            get_profile(recon_type).provider.apply_dtypes(part)
+            part[INDEX_KEY] = canonical_keys(part[right_key])
+            part = part[part[INDEX_KEY].notna()]  # empty keys never match
+            part = part.drop_duplicates(subset=[INDEX_KEY])
+
+            used_bytes += int(part.memory_usage(deep=True).sum())
+            if used_bytes > self.memory_limit:
+                raise MemoryError(
+                    f"Provider key index exceeds the streaming memory limit of "
+                    f"{self.memory_limit // (1024 * 1024)} MB; raise RECON_STREAM_MEMORY_MB"
+                )
+            parts.append(part)
+
+        if parts:
+            index_df = pd.concat(parts, ignore_index=True).drop_duplicates(subset=[INDEX_KEY], ignore_index=True)
+        else:
+            index_df = pd.DataFrame({right_key: pd.Series(dtype=object), INDEX_KEY: canonical_keys(pd.Series(dtype=object))})
+
+        if 'Transaction_Description' not in index_df.columns:
+            index_df['Transaction_Description'] = recon_type.upper() + " Transaction"
+        return index_df
+
+    def reconcile(self, eth_path: str, zzb_path: str, output_path: str, recon_type: str = "atm") -> dict:
+        """Streams the bank file through the provider index, appending classified rows to `output_path` as CSV.
+
+        Returns the Recon_Status counts and the number of rows written.
+        """
+        recon_type = str(recon_type).lower().strip()
+        eth_required, zzb_required, left_key, right_key = self.service.recon_settings(recon_type)
+        profile = get_profile(recon_type)
+
+        with stage("index", recon_type) as timing:
+            provider_index = self.build_provider_index(eth_path, eth_required, right_key, recon_type)
+            timing.rows_out = len(provider_index)
+        logger.info("Streaming provider index built", extra={"recon_type": recon_type, "keys": len(provider_index)})
+        # Canonical keys are unique in the index, so one hash lookup per batch row
+        key_index = pd.Index(provider_index.pop(INDEX_KEY).array)
+
+        summary = {}
+        rows_written = 0
+        header_written = False
+        with stage("stream", recon_type) as timing, open(output_path, "w", newline="", encoding="utf-8") as out:
+            for chunk in iter_file_dynamic(zzb_path, zzb_required, self.chunk_rows):
+                self.service.rename_for_logic(chunk, is_eth=False, recon_type=recon_type)
+                if left_key not in chunk.columns:
+                    raise KeyError(f"Bank file is missing key column '{left_key}'. Columns: {chunk.columns.tolist()}")
+                profile.bank.apply_dtypes(chunk)
+
+                # Provider keys are unique, so a per-batch left join equals the full in-memory one
+                bank_keys = canonical_keys(chunk[left_key])
+                positions = key_index.get_indexer(bank_keys.array)
+                positions[bank_keys.isna().to_numpy()] = -1
+                merged = join_frames(chunk, provider_index, left_key, right_key, positions)
+                breaks = self.service.amount_mismatch(merged, profile, chunk.columns, provider_index.columns)
+                merged['Recon_Status'] = status_from_positions(positions, breaks)
+
+                counts = merged['Recon_Status'].value_counts()
+                for status, count in counts[counts > 0].items():
+                    summary[status] = summary.get(status, 0) + int(count)
+
+                merged.to_csv(out, index=False, header=not header_written)
+                header_written = True
+                rows_written += len(merged)
+            timing.rows_in = timing.rows_out = rows_written
+
+        return {"summary": summary, "rows": rows_written}
@@ -1,5 +1,19 @@
+import importlib.util
+import logging
 import pandas as pd
-import io
+from app.utils.readers import (
+    COLUMNAR_FORMATS, detect_file_format, detect_format, iter_file_chunks, open_reader, read_columnar, scan_file_head,
+)
+
+logger = logging.getLogger(__name__)
+
+# Number of leading rows scanned when looking for the header row
+HEADER_SCAN_ROWS = 30
+
+# parse_currency: string dtype for column-wide text cleaning, and object
+# columns that already hold only numbers
+TEXT_DTYPE = "string[pyarrow]" if importlib.util.find_spec("pyarrow") else object
+NUMERIC_INFERRED_TYPES = ("floating", "integer", "mixed-integer-float", "decimal", "empty")
 
 def clean_currency(x):
     """Converts string currency (e.g. '1,000.00') to float."""
@@ -12,12 +26,44 @@ def clean_currency(x):
             return 0.0
     return x
 
+def parse_currency(values: pd.Series) -> pd.Series:
+    """Vectorized clean_currency for a whole column, returned as float64.
+
+    Numeric cells pass through; text such as '1,000.00', 'ETB 1 000.50' or
+    '(250.00)' (negative) is cleaned with column-wide string ops (Arrow
+    strings when pyarrow is installed). Unparseable values become NaN rather
+    than 0.0 so they are not mistaken for a zero amount.
+    """
+    if pd.api.types.is_bool_dtype(values.dtype):
+        values = values.astype(object)
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return values.astype('float64')
+    if pd.api.types.infer_dtype(values, skipna=True) in NUMERIC_INFERRED_TYPES:
+        return pd.to_numeric(values, errors='coerce').astype('float64')
+
+    if TEXT_DTYPE is object:
+        text = values.astype(str).where(values.notna()).str.strip()
+    else:
+        text = values.astype(TEXT_DTYPE).str.strip()
+    negative = (text.str.startswith('(') & text.str.endswith(')')).fillna(False).to_numpy(dtype=bool)
+    cleaned = (
+        text.str.replace(r"[,\s()]", "", regex=True)
+            .str.replace(r"^[A-Za-z$€£¥]+|[A-Za-z$€£¥]+$", "", regex=True)
+    )
+    try:
+        numbers = cleaned.astype('float64')
+    except (TypeError, ValueError):
+        numbers = pd.to_numeric(cleaned, errors='coerce').astype('float64')
+    numbers = numbers.to_numpy(copy=True)
+    numbers[negative] = -numbers[negative]
+    return pd.Series(numbers, index=values.index, name=values.name)
+
 def find_header_row(df_raw: pd.DataFrame, target_columns: list) -> int:
     """
     Scans the first 30 rows to find where the actual header matches 
     expected columns.
     """
-    for i in range(30):  # Scan first 30 rows
+    for i in range(min(HEADER_SCAN_ROWS, len(df_raw))):  # Scan first 30 rows
         # Convert row to string, lowercase, and strip spaces
         row_values = [str(val).strip().lower() for val in df_raw.iloc[i].tolist()]
         
@@ -29,33 +75,73 @@ def find_header_row(df_raw: pd.DataFrame, target_columns: list) -> int:
             return i
     return -1 # Not found
 
-def load_excel_dynamic(file_content: bytes, required_cols: list, default_row: int = 0) -> pd.DataFrame:
+def load_excel_dynamic(file_content: bytes, required_cols: list, default_row: int = 0, engine: str = "auto") -> pd.DataFrame:
     """
     Reads Excel, finds header dynamically, and standardizes column names.
     If dynamic detection fails, falls back to `default_row`.
+
+    The upload format (xlsx, xls, csv, parquet, arrow) is detected from the
+    file's magic bytes. For workbooks `engine` picks the reader ("auto"
+    prefers python-calamine). Row-oriented files are opened once: only the
+    first HEADER_SCAN_ROWS rows are parsed to locate the header, then the
+    sheet is parsed a single time with that row promoted to column names.
+    Parquet/Arrow files carry their own column names and skip the scan.
     """
     try:
-        # Read without header first to scan structure
-        df_raw = pd.read_excel(io.BytesIO(file_content), header=None)
-        
-        header_idx = find_header_row(df_raw, required_cols)
-        
-        if header_idx == -1:
-            print(f"Warning: Could not auto-detect header for columns {required_cols}. Using default row {default_row}.")
-            header_idx = default_row
+        fmt = detect_format(file_content)
+
+        if fmt in COLUMNAR_FORMATS:
+            df = read_columnar(file_content, fmt)
+            source = fmt
         else:
-            print(f"Header found at row index: {header_idx}")
+            reader = open_reader(file_content, fmt, engine)
+            source = f"{fmt}/{reader.engine}"
+            try:
+                # Read just the leading rows without header to scan structure
+                df_raw = reader.head(HEADER_SCAN_ROWS)
+
+                header_idx = find_header_row(df_raw, required_cols)
+                del df_raw
 
-        # Reload with correct header
-        df = pd.read_excel(io.BytesIO(file_content), header=header_idx)
+                if header_idx == -1:
+                    logger.warning("Could not auto-detect header, using the default row",
+                                   extra={"required_cols": required_cols, "header_row": default_row})
+                    header_idx = default_row
+                else:
+                    logger.debug("Header found", extra={"header_row": header_idx})
+
+                # Single full parse with the detected header
+                df = reader.read(header_idx)
+            finally:
+                reader.close()
         
         # Normalize headers: strip whitespace, uppercase
         df.columns = df.columns.astype(str).str.strip().str.upper()
         
-        # Debugging: Print columns found
-        print(f"Loaded Columns: {df.columns.tolist()}")
+        logger.debug("Loaded upload", extra={"source": source, "rows": len(df), "columns": df.columns.tolist()})
         
         return df
     except Exception as e:
-        print(f"Error loading Excel: {str(e)}")
-        raise e
\ No newline at end of file
+        logger.error("Error loading upload: %s", e)
+        raise e
+
+def iter_file_dynamic(path: str, required_cols: list, chunk_rows: int, default_row: int = 0):
+    """
+    Chunked counterpart of load_excel_dynamic for files spooled to disk.
+    Yields DataFrames of at most `chunk_rows` rows with the same header
+    detection and column normalization, so memory stays bounded by the chunk.
+    """
+    fmt = detect_file_format(path)
+    header_idx = 0
+    if fmt not in COLUMNAR_FORMATS:
+        header_idx = find_header_row(scan_file_head(path, fmt, HEADER_SCAN_ROWS), required_cols)
+        if header_idx == -1:
+            logger.warning("Could not auto-detect header, using the default row",
+                           extra={"required_cols": required_cols, "header_row": default_row})
+            header_idx = default_row
+        else:
+            logger.debug("Header found", extra={"header_row": header_idx})
+
+    for chunk in iter_file_chunks(path, fmt, header_idx, chunk_rows):
+        chunk.columns = chunk.columns.astype(str).str.strip().str.upper()
+        yield chunk
@@ -0,0 +1,75 @@
+"""Leveled, structured logging for the service and its worker processes.
+
+Modules log through `logging.getLogger(__name__)` and pass structured
+fields with `extra={...}`. configure_logging() installs one stderr
+handler on the `app` logger that renders records either as text
+(`message key=value ...`) or, with RECON_LOG_FORMAT=json, as one JSON
+object per line. Records still propagate to the root logger: when the
+process has already configured root handlers, those print them and no
+handler of ours is added.
+"""
+import json
+import logging
+import sys
+import time
+
+from app import config
+
+LOGGER_NAME = "app"
+_FORMATS = ("text", "json")
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+def record_fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+
+
+class TextFormatter(logging.Formatter):
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            extras = " ".join(f"{k}={v}" for k, v in fields.items())
+            # Keep the fields on the message line, ahead of any traceback
+            head, sep, tail = line.partition("\n")
+            line = f"{head} {extras}{sep}{tail}"
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str | None = None, fmt: str | None = None):
+    """Sets up the `app` logger once per process; later calls only change the level."""
+    level = (level or config.LOG_LEVEL).upper()
+    fmt = (fmt or config.LOG_FORMAT).lower()
+    if fmt not in _FORMATS:
+        raise ValueError(f"Unknown RECON_LOG_FORMAT '{fmt}', expected one of {_FORMATS}")
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level)
+    # With root handlers in place a handler here would print every record twice
+    if not logging.getLogger().handlers and not any(getattr(h, "_recon_handler", False) for h in logger.handlers):
+        handler = logging.StreamHandler(sys.stderr)
+        handler._recon_handler = True
+        handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+        logger.addHandler(handler)
+    return logger
@@ -0,0 +1,71 @@
+"""Output normalization shared by the JSON responses and the Excel report.
+
+Turns a reconciliation result into plain text/number columns: datetime,
+timedelta and category columns become strings, object columns that hide
+date values (typical of M-Pesa exports where some cells are empty and
+others are dates) become strings, and NaN/NaT/inf become `fill`.
+
+Column types are decided with `pd.api.types.infer_dtype`, which runs in
+C; only columns it reports as mixed get a type check, and that check
+looks at the set of Python types present rather than calling a lambda
+per cell.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+_DATE_INFERRED = {"datetime64", "datetime", "date"}
+_MIXED_INFERRED = {"mixed", "mixed-integer"}
+_FLOAT_INFERRED = {"floating", "mixed-integer-float", "mixed"}
+
+
+def _holds_dates(values: np.ndarray, inferred: str) -> bool:
+    if inferred in _DATE_INFERRED:
+        return True
+    if inferred in _MIXED_INFERRED:
+        # pd.Timestamp and datetime.datetime are both datetime.date subclasses
+        return any(issubclass(t, datetime.date) for t in set(map(type, values)))
+    return False
+
+
+def _normalize_column(series: pd.Series, fill):
+    dtype = series.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_datetime64_any_dtype(dtype) \
+            or pd.api.types.is_timedelta64_dtype(dtype):
+        missing = series.isna()
+        text = series.astype(str)
+        return text.where(~missing, fill) if missing.any() else text
+
+    if pd.api.types.is_float_dtype(dtype):
+        values = series.to_numpy()
+        finite = np.isfinite(values)
+        if finite.all():
+            return series
+        return series.astype(object).where(finite, fill)
+
+    if dtype == object:
+        values = series.to_numpy()
+        inferred = pd.api.types.infer_dtype(values, skipna=True)
+        missing = pd.isna(values)
+        if _holds_dates(values, inferred):
+            return series.astype(str).where(~missing, fill)
+        if inferred in _FLOAT_INFERRED:
+            missing |= np.isin(values, [np.inf, -np.inf])
+        return series.where(~missing, fill) if missing.any() else series
+
+    if series.hasnans:
+        return series.astype(object).where(series.notna(), fill)
+    return series
+
+
+def normalize_result_frame(df: pd.DataFrame, fill="") -> pd.DataFrame:
+    """Returns a copy of `df` that is safe for JSON and Excel output; `df` itself is not modified."""
+    out = df.copy(deep=False)
+    for i in range(out.shape[1]):
+        column = out.iloc[:, i]
+        normalized = _normalize_column(column, fill)
+        if normalized is not column:
+            out.isetitem(i, normalized)
+    return out
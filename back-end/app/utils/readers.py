@@ -0,0 +1,273 @@
+"""Pluggable readers for uploaded reconciliation files.
+
+Uploads are identified from their leading (magic) bytes rather than the
+file name, so a CSV or Parquet extract can be sent through the same
+endpoints as an Excel workbook.
+"""
+import csv
+import importlib.util
+import io
+from typing import Iterator
+
+import pandas as pd
+
+XLSX = "xlsx"
+XLS = "xls"
+CSV = "csv"
+PARQUET = "parquet"
+ARROW = "arrow"
+
+EXCEL_FORMATS = (XLSX, XLS)
+COLUMNAR_FORMATS = (PARQUET, ARROW)
+
+EXCEL_ENGINES = ("auto", "calamine", "openpyxl")
+
+_MAGIC = (
+    (b"PK\x03\x04", XLSX),                          # zip container (xlsx / xlsm)
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", XLS),     # OLE2 compound file (legacy xls)
+    (b"PAR1", PARQUET),
+    (b"ARROW1", ARROW),                             # Arrow IPC file format
+    (b"\xff\xff\xff\xff", ARROW),                   # Arrow IPC stream format
+)
+
+
+def detect_format(file_content: bytes) -> str:
+    """Returns the upload format from its magic bytes; anything unrecognised is treated as CSV."""
+    for magic, fmt in _MAGIC:
+        if file_content.startswith(magic):
+            return fmt
+    return CSV
+
+
+def check_engine(engine: str | None) -> str:
+    engine = str(engine or "auto").lower().strip()
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f"Unknown Excel engine '{engine}'. Expected one of {list(EXCEL_ENGINES)}")
+    return engine
+
+
+def resolve_excel_engine(engine: str = "auto") -> str:
+    """Maps the requested engine to a pandas engine name, preferring python-calamine when installed."""
+    engine = check_engine(engine)
+    if engine == "auto":
+        return "calamine" if importlib.util.find_spec("python_calamine") else "openpyxl"
+    if engine == "calamine" and importlib.util.find_spec("python_calamine") is None:
+        raise ValueError("Excel engine 'calamine' requested but python-calamine is not installed")
+    return engine
+
+
+class ExcelReader:
+    """Reads the first sheet of an xlsx/xls workbook, opening the file only once."""
+
+    def __init__(self, file_content: bytes, fmt: str, engine: str = "auto"):
+        engine = resolve_excel_engine(engine)
+        if fmt == XLS and engine == "openpyxl":
+            engine = "xlrd"  # openpyxl cannot read the legacy format
+        self.engine = engine
+        self._workbook = pd.ExcelFile(io.BytesIO(file_content), engine=engine)
+
+    def head(self, nrows: int) -> pd.DataFrame:
+        return self._workbook.parse(header=None, nrows=nrows)
+
+    def read(self, header: int) -> pd.DataFrame:
+        return self._workbook.parse(header=header)
+
+    def close(self):
+        self._workbook.close()
+
+
+class CsvReader:
+    """Reads delimited text; the header scan tolerates ragged junk rows above the header."""
+
+    engine = "csv"
+
+    def __init__(self, file_content: bytes):
+        self._content = file_content
+        sample = file_content[:64 * 1024].decode("utf-8-sig", errors="replace")
+        try:
+            self._dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+            self._sep = self._dialect.delimiter
+        except csv.Error:
+            self._dialect = csv.excel
+            self._sep = ","
+
+    @property
+    def sep(self) -> str:
+        return self._sep
+
+    def head(self, nrows: int) -> pd.DataFrame:
+        text = io.StringIO(self._content[:1024 * 1024].decode("utf-8-sig", errors="replace"))
+        rows = []
+        for row in csv.reader(text, self._dialect):
+            rows.append(row)
+            if len(rows) >= nrows:
+                break
+        return pd.DataFrame(rows)
+
+    def read(self, header: int) -> pd.DataFrame:
+        # Everything is read as text so reference numbers keep their leading zeros
+        df = pd.read_csv(
+            io.BytesIO(self._content), sep=self._sep, skiprows=header, header=0,
+            dtype=str, encoding="utf-8-sig", skip_blank_lines=False,
+        )
+        return df.dropna(how="all").reset_index(drop=True)
+
+    def close(self):
+        pass
+
+
+def read_columnar(file_content: bytes, fmt: str) -> pd.DataFrame:
+    """Reads Parquet or Arrow IPC uploads, whose column names are already known."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError(f"Reading {fmt} uploads requires pyarrow to be installed")
+
+    buffer = pa.BufferReader(file_content)
+    if fmt == PARQUET:
+        table = pq.read_table(buffer)
+    elif file_content.startswith(b"ARROW1"):
+        table = pa.ipc.open_file(buffer).read_all()
+    else:
+        table = pa.ipc.open_stream(buffer).read_all()
+    return table.to_pandas()
+
+
+def open_reader(file_content: bytes, fmt: str, engine: str = "auto"):
+    """Returns a reader exposing head(nrows) / read(header) / close() for row-oriented formats."""
+    if fmt in EXCEL_FORMATS:
+        return ExcelReader(file_content, fmt, engine)
+    if fmt == CSV:
+        return CsvReader(file_content)
+    raise ValueError(f"No row reader for format '{fmt}'")
+
+
+# --- Chunked readers over spooled files (streaming mode) ---
+
+CSV_SNIFF_BYTES = 1024 * 1024
+
+
+def detect_file_format(path: str) -> str:
+    with open(path, "rb") as f:
+        return detect_format(f.read(8))
+
+
+def _column_names(values) -> list:
+    """Builds column names from a raw header row the way pandas does (Unnamed: i, A.1 for repeats)."""
+    names, seen = [], {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None or str(value).strip() == "" else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _excel_value(value):
+    # pandas turns integral floats from workbooks into ints; keep keys comparable with the in-memory path
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _iter_xlsx_rows(path: str) -> Iterator[tuple]:
+    import openpyxl
+
+    # Opened through a file handle: spooled uploads have no .xlsx extension for openpyxl to check
+    with open(path, "rb") as handle:
+        workbook = openpyxl.load_workbook(handle, read_only=True, data_only=True)
+        try:
+            for row in workbook.worksheets[0].iter_rows(values_only=True):
+                yield row
+        finally:
+            workbook.close()
+
+
+def scan_file_head(path: str, fmt: str, nrows: int) -> pd.DataFrame:
+    """Reads the first `nrows` raw rows of a spooled file without a header."""
+    if fmt == XLSX:
+        rows = []
+        rows_iter = _iter_xlsx_rows(path)
+        try:
+            for row in rows_iter:
+                rows.append([_excel_value(v) for v in row])
+                if len(rows) >= nrows:
+                    break
+        finally:
+            rows_iter.close()
+        return pd.DataFrame(rows)
+    if fmt == CSV:
+        with open(path, "rb") as f:
+            return CsvReader(f.read(CSV_SNIFF_BYTES)).head(nrows)
+    raise ValueError(f"Streaming mode does not support '{fmt}' uploads")
+
+
+def iter_file_chunks(path: str, fmt: str, header: int, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Yields the rows below `header` as DataFrames of at most `chunk_rows` rows.
+
+    `header` is ignored for Parquet/Arrow, which carry their own schema.
+    """
+    if fmt == XLSX:
+        rows_iter = _iter_xlsx_rows(path)
+        for _ in range(header):
+            next(rows_iter, None)
+        names = _column_names(next(rows_iter, ()))
+        width = len(names)
+        batch = []
+        for row in rows_iter:
+            if not any(v is not None for v in row):
+                continue
+            values = [_excel_value(v) for v in row[:width]]
+            values.extend([None] * (width - len(values)))
+            batch.append(values)
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch, columns=names)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=names)
+
+    elif fmt == CSV:
+        with open(path, "rb") as f:
+            sep = CsvReader(f.read(CSV_SNIFF_BYTES)).sep
+        chunks = pd.read_csv(
+            path, sep=sep, skiprows=header, header=0, dtype=str, encoding="utf-8-sig",
+            skip_blank_lines=False, chunksize=chunk_rows,
+        )
+        with chunks:
+            for chunk in chunks:
+                chunk = chunk.dropna(how="all")
+                if not chunk.empty:
+                    yield chunk
+
+    elif fmt in COLUMNAR_FORMATS:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError(f"Reading {fmt} uploads requires pyarrow to be installed")
+
+        if fmt == PARQUET:
+            parquet_file = pq.ParquetFile(path)
+            try:
+                for batch in parquet_file.iter_batches(batch_size=chunk_rows):
+                    yield batch.to_pandas()
+            finally:
+                parquet_file.close()
+        else:
+            with pa.memory_map(path, "r") as source:
+                if source.read(6) == b"ARROW1":
+                    source.seek(0)
+                    file_reader = pa.ipc.open_file(source)
+                    batches = (file_reader.get_batch(i) for i in range(file_reader.num_record_batches))
+                else:
+                    source.seek(0)
+                    batches = pa.ipc.open_stream(source)
+                for batch in batches:
+                    for offset in range(0, batch.num_rows, chunk_rows):
+                        yield batch.slice(offset, chunk_rows).to_pandas()
+    else:
+        raise ValueError(f"Streaming mode does not support '{fmt}' uploads")
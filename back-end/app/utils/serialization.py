@@ -0,0 +1,62 @@
+"""Fast JSON / NDJSON encoding of result frames.
+
+Rows are built straight from column value lists (one `tolist()` per
+column per chunk) and encoded with orjson when it is installed, which
+avoids `DataFrame.to_dict(orient='records')` and the stdlib encoder on
+large mismatch lists.
+"""
+import json
+from typing import Callable, Iterator
+
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _default(value):
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return str(value)
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default).encode("utf-8")
+
+
+def iter_records(df: pd.DataFrame, chunk_rows: int = 10_000) -> Iterator[dict]:
+    """Yields each row as a dict, converting whole columns at a time instead of cell by cell."""
+    columns = [str(c) for c in df.columns]
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        values = [chunk.iloc[:, i].tolist() for i in range(chunk.shape[1])]
+        for row in zip(*values):
+            yield dict(zip(columns, row))
+
+
+def records(df: pd.DataFrame) -> list:
+    return list(iter_records(df))
+
+
+def iter_ndjson(df: pd.DataFrame, chunk_rows: int = 10_000,
+                prepare: Callable[[pd.DataFrame], pd.DataFrame] | None = None) -> Iterator[bytes]:
+    """Yields newline-delimited JSON, one encoded block per chunk of `chunk_rows` rows.
+
+    `prepare` is applied to each chunk before encoding, so per-row cleanup
+    only ever touches one chunk at a time. It must not modify the chunk in place.
+    """
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        if prepare is not None:
+            chunk = prepare(chunk)
+        yield b"".join(dumps(row) + b"\n" for row in iter_records(chunk, chunk_rows))
@@ -0,0 +1,243 @@
+"""Synthetic provider / bank files for every recon type.
+
+Each generator builds a bank statement and a provider statement whose
+columns follow the layout the recon profile expects (ATM / EthSwitch,
+M-Pesa, Telebirr outgoing and incoming), with:
+
+* `rows` bank rows, of which `match_rate` have a provider row;
+* provider-only rows (`extra_rate` of `rows`) and amount breaks
+  (`amount_break_rate` of the matched rows);
+* `junk_rows` title / date / blank rows above the header, as in the
+  real exports, so `find_header_row` has something to do.
+
+Files are written as xlsx (xlsxwriter, constant memory), CSV or Parquet:
+
+    python -m benchmarks.generators atm 100000 --out bench-data --format xlsx
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+EXCEL_MAX_ROWS = 1_048_576
+FORMATS = ("xlsx", "csv", "parquet")
+
+ATM_DESCRIPTIONS = ["ATM CW Transaction Amount", "POS PUR THEM-ON-THEM", "Account2Account", "Purchase", "Cash Withdrawal"]
+BANKS = ["ZamZam Bank", "Awash Bank", "Dashen Bank", "Commercial Bank of Ethiopia"]
+MPESA_REASONS = ["Pay Bill", "Business Payment", "Customer Transfer", "Reversal"]
+TELE_TYPES = ["Transfer to Bank", "Buy Goods", "Cash In", "Cash Out"]
+
+
+class SyntheticPair:
+    """Shared transaction data behind one provider / bank file pair."""
+
+    def __init__(self, rows: int, match_rate: float, extra_rate: float, amount_break_rate: float, seed: int):
+        rng = np.random.default_rng(seed)
+        self.rng = rng
+        self.rows = rows
+        extra = int(rows * extra_rate)
+        total = rows + extra
+        # Unique 12-digit references; the first `rows` belong to bank rows
+        self.refs = rng.choice(9 * 10 ** 11, size=total, replace=False) + 10 ** 11
+        self.amounts = np.round(rng.gamma(2.0, 1500.0, total), 2)
+        self.times = pd.Timestamp("2025-01-01") + pd.to_timedelta(np.sort(rng.integers(0, 86400 * 30, total)), unit="s")
+
+        matched = rng.random(rows) < match_rate
+        # Provider rows: the matched bank transactions plus provider-only ones, shuffled
+        provider_rows = np.concatenate([np.flatnonzero(matched), np.arange(rows, total)])
+        self.provider_rows = rng.permutation(provider_rows)
+        self.provider_amounts = self.amounts[self.provider_rows].copy()
+        breaks = (self.provider_rows < rows) & (rng.random(len(self.provider_rows)) < amount_break_rate)
+        self.provider_amounts[breaks] += np.round(rng.uniform(1, 50, breaks.sum()), 2)
+
+    def pick(self, choices, size):
+        return self.rng.choice(choices, size)
+
+    @staticmethod
+    def money_text(amounts):
+        return [f"{a:,.2f}" for a in amounts]
+
+    @staticmethod
+    def alnum(refs, prefix: str = ""):
+        # Stable alphanumeric ids (M-Pesa style) derived from the numeric references
+        digits = "0123456789ABCDEFGHJKLMNPQRSTUVWXYZ"
+        out = []
+        for ref in refs:
+            text = []
+            ref = int(ref)
+            while ref:
+                ref, r = divmod(ref, len(digits))
+                text.append(digits[r])
+            out.append(prefix + "".join(reversed(text)))
+        return out
+
+
+def atm(pair: SyntheticPair):
+    n, p = pair.rows, pair.provider_rows
+    provider = pd.DataFrame({
+        "REFNUM": pair.refs[p],
+        "AMOUNT": pair.provider_amounts,
+        "PAN": [f"4111****{r % 10000:04d}" for r in pair.refs[p]],
+        "TRANSACTION_DESCRIPTION": pair.pick(ATM_DESCRIPTIONS, len(p)),
+        "ISSUER": pair.pick(BANKS, len(p)),
+        "ACQUIRER": pair.pick(BANKS, len(p)),
+        "TXN_DATE": pair.times[p],
+    })
+    bank = pd.DataFrame({
+        "TRN_REF_NO": [f"FT{i:010d}" for i in range(n)],
+        "AMOUNT": pair.money_text(pair.amounts[:n]),
+        "RRN": pair.refs[:n].astype(str),
+        "BOOKING_DATE": pair.times[:n],
+    })
+    return provider, bank
+
+
+def mpesa(pair: SyntheticPair):
+    n, p = pair.rows, pair.provider_rows
+    linked = np.array(pair.alnum(pair.refs, "S"), dtype=object)
+    amounts = pair.provider_amounts
+    paid_in = pair.rng.random(len(p)) < 0.5
+    provider = pd.DataFrame({
+        "RECEIPT NO.": pair.alnum(pair.refs[p] + 7, "Q"),
+        "COMPLETION TIME": pair.times[p].strftime("%d-%m-%Y %H:%M:%S"),
+        "DETAILS": "Business Payment from 254700000000",
+        "TRANSACTION STATUS": "Completed",
+        "PAID IN": np.where(paid_in, amounts, np.nan),
+        "WITHDRAWN": np.where(paid_in, np.nan, -amounts),
+        "REASON TYPE": pair.pick(MPESA_REASONS, len(p)),
+        "LINKED TRANSACTION ID": linked[p],
+    })
+    bank = pd.DataFrame({
+        "ZAMZAM_REF_NO": [f"ZZB{i:09d}" for i in range(n)],
+        "AMOUNT": pair.money_text(pair.amounts[:n]),
+        "CONVERSION_ID": linked[:n],
+        "TRANSACTION_DESC": pair.pick(MPESA_REASONS, n),
+    })
+    return provider, bank
+
+
+def _tele_provider(pair: SyntheticPair):
+    p = pair.provider_rows
+    return pd.DataFrame({
+        "ORDER_ID": pair.refs[p] * 1000 + 17,
+        "AMOUNT": pair.provider_amounts,
+        "REF_NO": pair.alnum(pair.refs[p], "BT"),
+        "TRANSACTION_TYPE": pair.pick(TELE_TYPES, len(p)),
+        "TRANS_TIME": pair.times[p],
+    })
+
+
+def tele(pair: SyntheticPair):
+    n = pair.rows
+    bank = pd.DataFrame({
+        "TRN_REF_NO": [f"FT{i:010d}" for i in range(n)],
+        "AMOUNT": pair.money_text(pair.amounts[:n]),
+        "TXNREF": (pair.refs[:n] * 1000 + 17).astype(str),
+        "TRANSACTION_DESC": pair.pick(TELE_TYPES, n),
+    })
+    return _tele_provider(pair), bank
+
+
+def tele_incoming(pair: SyntheticPair):
+    n = pair.rows
+    bank = pd.DataFrame({
+        "TELLEBIRR REF": (pair.refs[:n] * 1000 + 17).astype(str),
+        "AMOUNT": pair.money_text(pair.amounts[:n]),
+        "TRN_REF_NO": [f"FT{i:010d}" for i in range(n)],
+        "TRANSACTION DESCRIPTION": pair.pick(TELE_TYPES, n),
+    })
+    return _tele_provider(pair), bank
+
+
+GENERATORS = {
+    "atm": atm,
+    "mpesa": mpesa,
+    "tele": tele,
+    "tele-incoming": tele_incoming,
+}
+
+
+def generate(recon_type: str, rows: int, match_rate: float = 0.9, extra_rate: float = 0.02,
+             amount_break_rate: float = 0.01, seed: int = 0):
+    """Returns (provider_df, bank_df) for `recon_type`."""
+    try:
+        generator = GENERATORS[recon_type]
+    except KeyError:
+        raise ValueError(f"No generator for recon type '{recon_type}', expected one of {sorted(GENERATORS)}")
+    return generator(SyntheticPair(rows, match_rate, extra_rate, amount_break_rate, seed))
+
+
+def junk_lines(junk_rows: int) -> list:
+    lines = [["ZamZam Bank S.C."], ["Transaction Report"], [f"Generated: {pd.Timestamp('2025-02-01 08:00')}"]]
+    return (lines + [[]] * junk_rows)[:junk_rows]
+
+
+def write_frame(df: pd.DataFrame, path: str, fmt: str, junk_rows: int = 3):
+    """Writes `df` below `junk_rows` report lines (xlsx / CSV; Parquet has no junk rows)."""
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+        return
+    if fmt == "csv":
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            for line in junk_lines(junk_rows):
+                f.write(",".join(line) + "\n")
+            df.to_csv(f, index=False)
+        return
+    if fmt != "xlsx":
+        raise ValueError(f"Unknown format '{fmt}', expected one of {FORMATS}")
+    if len(df) + junk_rows + 1 > EXCEL_MAX_ROWS:
+        raise ValueError(f"{len(df)} rows do not fit in one xlsx sheet; use csv or parquet")
+
+    import xlsxwriter
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    try:
+        sheet = workbook.add_worksheet("Sheet1")
+        date_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+        for r, line in enumerate(junk_lines(junk_rows)):
+            sheet.write_row(r, 0, line)
+        sheet.write_row(junk_rows, 0, [str(c) for c in df.columns])
+        formats = [date_format if pd.api.types.is_datetime64_any_dtype(df[c]) else None for c in df.columns]
+        # Timestamps are datetime subclasses, which xlsxwriter writes as Excel dates
+        columns = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in df.columns]
+        for r, row in enumerate(zip(*columns), start=junk_rows + 1):
+            for c, value in enumerate(row):
+                if value is not None:
+                    sheet.write(r, c, value, formats[c])
+    finally:
+        workbook.close()
+
+
+def write_pair(recon_type: str, rows: int, out_dir: str, fmt: str = "xlsx", match_rate: float = 0.9,
+               junk_rows: int = 3, seed: int = 0, **options):
+    """Generates and writes a file pair; returns (provider_path, bank_path). Existing files are reused."""
+    os.makedirs(out_dir, exist_ok=True)
+    stem = f"{recon_type}-{rows}-m{match_rate:g}-j{junk_rows}-s{seed}"
+    paths = tuple(os.path.join(out_dir, f"{stem}.{side}.{fmt}") for side in ("provider", "bank"))
+    if all(os.path.exists(p) for p in paths):
+        return paths
+
+    provider, bank = generate(recon_type, rows, match_rate=match_rate, seed=seed, **options)
+    for df, path, junk in zip((provider, bank), paths, (junk_rows, junk_rows + 1)):
+        tmp_path = f"{path}.tmp"
+        write_frame(df, tmp_path, fmt, junk)
+        os.replace(tmp_path, path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.generators", description="Write a synthetic file pair.")
+    parser.add_argument("recon_type", choices=sorted(GENERATORS))
+    parser.add_argument("rows", type=int)
+    parser.add_argument("--out", default="bench-data")
+    parser.add_argument("--format", choices=FORMATS, default="xlsx")
+    parser.add_argument("--match-rate", type=float, default=0.9)
+    parser.add_argument("--junk-rows", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    for path in write_pair(args.recon_type, args.rows, args.out, args.format, args.match_rate, args.junk_rows, args.seed):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Stage-by-stage timings and peak memory of the reconcile pipeline.
+
+For every recon type and row count a synthetic file pair is generated
+(see generators.py; reused from --data-dir when present) and these
+stages are measured one after the other:
+
+* parse     - load_excel_dynamic on both files
+* process   - ReconciliationService.process_files (parse + match, no cache)
+* response  - the JSON payload of /api/v1/reconcile (build_reconcile_payload + encoding)
+* normalize - normalize_result_frame over the whole result (NDJSON / report cleanup)
+* report    - the Excel report written to a temp file
+
+Every (recon type, rows) case runs in a fresh process. Peak memory is the
+rise of the process's peak RSS over the stage (Linux, reset through
+/proc/self/clear_refs); elsewhere tracemalloc is used, which only sees
+Python / numpy allocations and slows the stage down. Files above one xlsx
+sheet are written as CSV.
+
+Run from back-end/:
+
+    python -m benchmarks.harness --rows 10000,100000 --save benchmarks/baselines/local.json
+    python -m benchmarks.harness --rows 10000,100000 --compare benchmarks/baselines/local.json
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from benchmarks.generators import EXCEL_MAX_ROWS, GENERATORS, write_pair
+
+DEFAULT_ROWS = "10000,100000,500000,1000000,2000000"
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS_DELTA = 0.05
+MIN_MB_DELTA = 5.0
+
+
+def _proc_status(field: str) -> float:
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024.0  # kB -> MB
+    raise KeyError(field)
+
+
+def _can_reset_peak_rss() -> bool:
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        _proc_status("VmHWM")
+        return True
+    except OSError:
+        return False
+
+
+class StageMeter:
+
+    def __init__(self):
+        self.use_rss = _can_reset_peak_rss()
+        self.memory_method = "peak RSS" if self.use_rss else "tracemalloc"
+
+    @contextmanager
+    def measure(self, results: dict, stage: str):
+        gc.collect()
+        if self.use_rss:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")  # reset VmHWM to the current RSS
+            start_rss = _proc_status("VmRSS")
+        else:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            if self.use_rss:
+                peak_mb = _proc_status("VmHWM") - start_rss
+            else:
+                peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                tracemalloc.stop()
+            results[stage] = {"seconds": round(seconds, 3), "peak_mb": round(peak_mb, 1)}
+
+
+def file_format(rows: int, requested: str) -> str:
+    if requested != "auto":
+        return requested
+    # The bank file has one more junk row than the provider file
+    return "xlsx" if rows + 8 < EXCEL_MAX_ROWS else "csv"
+
+
+def run_case(recon_type: str, rows: int, fmt: str, data_dir: str, match_rate: float) -> dict:
+    """Measures every stage for one file pair; runs in its own process."""
+    from app import config
+    from app.main import build_reconcile_payload
+    from app.services.cache import ParsedFrameCache
+    from app.services.reconciliation import ReconciliationService
+    from app.utils.excel_parser import load_excel_dynamic
+    from app.utils.normalize import normalize_result_frame
+    from app.utils.serialization import dumps
+
+    # Keep parsing in this process so its memory is measured
+    config.PARSE_POOL_KIND = "thread"
+    service = ReconciliationService(cache=ParsedFrameCache(enabled=False))
+    eth_required, zzb_required, _, _ = service.recon_settings(recon_type)
+
+    provider_path, bank_path = write_pair(recon_type, rows, data_dir, fmt, match_rate)
+    with open(provider_path, "rb") as f:
+        eth_content = f.read()
+    with open(bank_path, "rb") as f:
+        zzb_content = f.read()
+
+    meter = StageMeter()
+    results = {}
+    with meter.measure(results, "parse"):
+        load_excel_dynamic(eth_content, eth_required)
+        load_excel_dynamic(zzb_content, zzb_required)
+
+    with meter.measure(results, "process"):
+        result_df = service.process_files(eth_content, zzb_content, recon_type)
+    del eth_content, zzb_content
+
+    with meter.measure(results, "response"):
+        dumps(build_reconcile_payload(result_df))
+
+    with meter.measure(results, "normalize"):
+        normalize_result_frame(result_df)
+
+    fd, report_path = tempfile.mkstemp(prefix="bench-report-", suffix=".xlsx")
+    os.close(fd)
+    skipped = None
+    try:
+        with meter.measure(results, "report"):
+            try:
+                service.write_excel_report(result_df, report_path, recon_type)
+            except ValueError as e:  # a sheet over the xlsx row limit
+                skipped = e
+    finally:
+        os.remove(report_path)
+    if skipped is not None:
+        # The time until the writer gave up is not a report time
+        del results["report"]
+        print(f"  report skipped: {skipped}")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Stage measurements more than `tolerance` (a fraction) worse than the baseline."""
+    regressions = []
+    for recon_type, by_rows in results.items():
+        for rows, stages in by_rows.items():
+            base_stages = baseline.get("results", {}).get(recon_type, {}).get(rows, {})
+            for stage, current in stages.items():
+                base = base_stages.get(stage)
+                if not base:
+                    continue
+                for metric, min_delta in (("seconds", MIN_SECONDS_DELTA), ("peak_mb", MIN_MB_DELTA)):
+                    old, new = base[metric], current[metric]
+                    if new - old > min_delta and new > old * (1 + tolerance):
+                        regressions.append(f"{recon_type} {rows} rows {stage} {metric}: {old} -> {new}")
+    return regressions
+
+
+def print_table(recon_type: str, rows: int, stages: dict):
+    cells = "  ".join(f"{stage} {m['seconds']:>7.3f}s {m['peak_mb']:>7.1f}MB" for stage, m in stages.items())
+    print(f"{recon_type:<14}{rows:>9}  {cells}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.harness", description=__doc__.splitlines()[0])
+    parser.add_argument("--types", default=",".join(GENERATORS), help="comma-separated recon types")
+    parser.add_argument("--rows", default=DEFAULT_ROWS, help="comma-separated bank row counts")
+    parser.add_argument("--format", default="auto", choices=("auto", "xlsx", "csv", "parquet"))
+    parser.add_argument("--match-rate", type=float, default=0.9)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "recon-bench-data"),
+                        help="where generated files are kept between runs")
+    parser.add_argument("--save", help="write the results as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check the results against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown / memory growth (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    recon_types = [t.strip() for t in args.types.split(",") if t.strip()]
+    row_counts = [int(r) for r in args.rows.split(",") if r.strip()]
+    memory_method = StageMeter().memory_method
+    print(f"Memory: {memory_method}")
+
+    results = {}
+    for recon_type in recon_types:
+        for rows in row_counts:
+            fmt = file_format(rows, args.format)
+            # A fresh process per case, so earlier cases do not skew memory or warm caches
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                stages = executor.submit(run_case, recon_type, rows, fmt, args.data_dir, args.match_rate).result()
+            results.setdefault(recon_type, {})[str(rows)] = stages
+            print_table(recon_type, rows, stages)
+
+    report = {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "memory_method": memory_method,
+        },
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against " + args.compare + ":")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print(f"No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""gunicorn settings for production: preforked uvicorn workers behind one port.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The app is imported once in the master (`preload_app`), together with the
+optional readers / writers (app.main.warm_up), and the workers are forked
+from it, so they start in milliseconds and share those pages copy-on-write.
+Settings come from the RECON_HTTP_* variables (see app/config.py).
+
+Each worker is a separate process with its own reconcile slots and in-memory
+caches; stage metrics and Job API state are shared through RECON_METRICS_DIR
+and RECON_JOB_DIR.
+"""
+import os
+import shutil
+import tempfile
+
+# Each worker serves its own share of the requests: keep the per-worker thread
+# pool small instead of one thread per CPU in every worker
+os.environ.setdefault("RECON_WORKERS", "2")
+_OWN_METRICS_DIR = "RECON_METRICS_DIR" not in os.environ
+if _OWN_METRICS_DIR:
+    os.environ["RECON_METRICS_DIR"] = tempfile.mkdtemp(prefix="recon-metrics-")
+
+# Not `config`: gunicorn reads every module-level name of this file as a setting
+from app import config as app_config  # noqa: E402  (reads the variables set above)
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: the cgroup quota in a container, else the affinity mask."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max", "r") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not on Linux
+        return os.cpu_count() or 1
+
+
+bind = app_config.HTTP_BIND
+workers = app_config.HTTP_WORKERS or available_cpus()
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+timeout = app_config.HTTP_TIMEOUT
+graceful_timeout = 60
+keepalive = 5
+max_requests = app_config.HTTP_MAX_REQUESTS
+max_requests_jitter = max_requests // 10
+# The app logs each request itself (see app.main.stage_timing)
+accesslog = None
+
+
+def on_starting(server):
+    # Runs in the master after the app is preloaded and before any worker is forked
+    from app.main import warm_up
+
+    warm_up()
+    # Snapshots left by an earlier run under a fixed RECON_METRICS_DIR. Those of
+    # workers that exit while we run are kept, so counters never go backwards.
+    os.makedirs(app_config.METRICS_DIR, exist_ok=True)
+    for name in os.listdir(app_config.METRICS_DIR):
+        if name.endswith(".json"):
+            os.remove(os.path.join(app_config.METRICS_DIR, name))
+
+
+def on_exit(server):
+    if _OWN_METRICS_DIR:
+        shutil.rmtree(app_config.METRICS_DIR, ignore_errors=True)
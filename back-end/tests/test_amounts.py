@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import config
+from app.services.cache import ParsedFrameCache
+from app.services.match_engine import amount_breaks
+from app.services.profiles import get_profile
+from app.services.reconciliation import ReconciliationService
+
+
+@pytest.fixture
+def service():
+    return ReconciliationService(cache=ParsedFrameCache(enabled=False))
+
+
+@pytest.fixture(autouse=True)
+def no_probable_match(monkeypatch):
+    monkeypatch.setattr(config, "PROBABLE_MATCH_ENABLED", False)
+
+
+def bank_frame(rrns, amounts):
+    return pd.DataFrame({"TRN_REF_NO": [f"FT{i}" for i in range(len(rrns))], "AMOUNT": amounts, "RRN": rrns})
+
+
+def provider_frame(refnums, amounts):
+    return pd.DataFrame({
+        "Refnum_F37": refnums,
+        "AMOUNT": amounts,
+        "PAN": [f"4111{i}" for i in range(len(refnums))],
+        "Transaction_Description": ["Purchase"] * len(refnums),
+    })
+
+
+def test_matched_pairs_with_different_amounts_are_amount_mismatch(service):
+    df_eth = provider_frame(["1", "2", "3", "4"], [10.0, 10.5, np.nan, 12.0])
+    df_zzb = bank_frame(["1", "2", "3", "5"], ["10.00", "10.00", "10.00", "12.00"])
+
+    merged, _ = service.reconcile_frames(df_eth, df_zzb, "atm")
+
+    # An amount on one side only is a break; an unmatched row is not compared
+    assert merged["Recon_Status"].tolist() == ["MATCHED", "AMOUNT_MISMATCH", "AMOUNT_MISMATCH", "MISSING_IN_PROVIDER"]
+
+
+def test_profile_amount_tolerance(service, monkeypatch):
+    monkeypatch.setattr(get_profile("atm"), "amount_tolerance", (0.5, 0.0))
+    df_eth = provider_frame(["1", "2"], [10.5, 10.6])
+    df_zzb = bank_frame(["1", "2"], ["10.00", "10.00"])
+
+    merged, _ = service.reconcile_frames(df_eth, df_zzb, "atm")
+
+    assert merged["Recon_Status"].tolist() == ["MATCHED", "AMOUNT_MISMATCH"]
+
+
+def test_amount_breaks_tolerance():
+    left = [100.0, 100.0, 100.0, np.nan, 0.1 + 0.2]
+    right = [100.4, 101.5, 102.5, np.nan, 0.3]
+
+    assert amount_breaks(left, right).tolist() == [True, True, True, False, False]
+    assert amount_breaks(left, right, absolute=0.5).tolist() == [False, True, True, False, False]
+    # 2 % of the larger amount
+    assert amount_breaks(left, right, percent=2).tolist() == [False, False, True, False, False]
+
+
+def test_profiles_without_a_provider_amount_are_not_compared(service):
+    df_eth = pd.DataFrame({"Match_Key": ["1", "2"], "Transaction_Description": ["Pay"] * 2, "Provider_Ref": ["R1", "R2"]})
+    df_zzb = pd.DataFrame({"ZAMZAM_REF_NO": ["Z1", "Z2"], "AMOUNT": ["10.00", "99.00"], "Match_Key": ["1", "2"]})
+
+    merged, _ = service.reconcile_frames(df_eth, df_zzb, "mpesa")
+
+    assert merged["Recon_Status"].tolist() == ["MATCHED", "MATCHED"]
+
+
+def test_amount_breaks_get_their_own_report_sheet(service):
+    merged, _ = service.reconcile_frames(provider_frame(["1", "2"], [10.0, 11.0]),
+                                         bank_frame(["1", "2"], ["10.00", "10.00"]), "atm")
+
+    sheets = dict(service.report_sheets(merged, "atm"))
+    assert sheets["Amount_Mismatch"]["RRN"].tolist() == ["2"]
+    dashboard = sheets["Dashboard"].set_index("Metric")["Count"]
+    assert dashboard["Amount Mismatch (Action Required)"] == 1
@@ -0,0 +1,76 @@
+import json
+import os
+
+import pandas as pd
+
+from app import batch, config
+from app.batch import BATCH_SUMMARY_FILE, BatchPair, run_batch, run_pair, scan_directory
+
+
+def write_pair(directory, name, rrns):
+    """Writes NAME.provider.csv / NAME.bank.csv in the ATM layout, every bank row matched."""
+    directory.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame({
+        "Refnum_F37": rrns, "AMOUNT": [100.0] * len(rrns), "PAN": ["4000"] * len(rrns),
+        "Transaction_Description": ["Withdrawal"] * len(rrns), "Issuer": ["ETS"] * len(rrns),
+        "Acquirer": ["ETS"] * len(rrns),
+    }).to_csv(directory / f"{name}.provider.csv", index=False)
+    pd.DataFrame({"TRN_REF_NO": rrns, "AMOUNT": [100.0] * len(rrns), "RRN": rrns}).to_csv(
+        directory / f"{name}.bank.csv", index=False)
+
+
+def read_summary(output_dir, recon_type, name):
+    with open(os.path.join(output_dir, recon_type, f"{name}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_pairs_are_scanned_by_folder(tmp_path):
+    write_pair(tmp_path / "atm", "day1", ["111111"])
+    write_pair(tmp_path / "misc", "day2", ["222222"])
+    (tmp_path / "atm" / "lonely.bank.csv").write_text("RRN\n1\n")
+
+    pairs = scan_directory(str(tmp_path), "mpesa")
+    assert [(p.recon_type, p.name) for p in pairs] == [("atm", "day1"), ("mpesa", "day2")]
+
+
+def test_pair_report_and_summary_without_the_upload_cache(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(config, "CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "CACHE_DIR", str(cache_dir))
+    write_pair(tmp_path / "in", "day1", ["111111", "222222"])
+    pair = BatchPair("day1", str(tmp_path / "in" / "day1.provider.csv"), str(tmp_path / "in" / "day1.bank.csv"), "ATM")
+
+    summary = run_pair(pair, str(tmp_path / "out"))
+    assert summary["status"] == "done"
+    assert summary["rows"] == 2
+    assert os.path.exists(summary["report"])
+    assert read_summary(tmp_path / "out", "atm", "day1") == summary
+    assert not cache_dir.exists()
+
+
+def test_rerun_skips_finished_pairs_until_inputs_change_or_force(tmp_path):
+    input_dir, output_dir = tmp_path / "in", str(tmp_path / "out")
+    write_pair(input_dir / "atm", "day1", ["111111"])
+    write_pair(input_dir / "atm", "day2", ["222222"])
+    # A bank file without its key columns fails
+    (input_dir / "atm" / "day2.bank.csv").write_text("OTHER\nx\n")
+    pairs = scan_directory(str(input_dir), "atm")
+
+    first = run_batch(pairs, output_dir, workers=1)
+    assert (first["done"], first["failed"], first["skipped"]) == (1, 1, 0)
+    assert read_summary(output_dir, "atm", "day2")["status"] == "failed"
+    with open(os.path.join(output_dir, BATCH_SUMMARY_FILE), encoding="utf-8") as f:
+        assert [f["name"] for f in json.load(f)["failures"]] == ["day2"]
+
+    # The failed pair is retried once fixed; the finished one is skipped
+    write_pair(input_dir / "atm", "day2", ["222222"])
+    second = run_batch(pairs, output_dir, workers=1)
+    assert (second["done"], second["failed"], second["skipped"]) == (1, 0, 1)
+    assert not batch.is_done(pairs[0], output_dir, mode="full")
+
+    forced = run_batch(pairs, output_dir, workers=1, force=True)
+    assert (forced["done"], forced["skipped"]) == (2, 0)
+
+    assert batch.is_done(pairs[0], output_dir)
+    write_pair(input_dir / "atm", "day1", ["111111", "333333"])
+    assert not batch.is_done(pairs[0], output_dir)
@@ -0,0 +1,88 @@
+import os
+
+import pandas as pd
+import pytest
+
+from app.services.cache import ParsedFrameCache
+from app.services.metrics import collect_timings
+from app.services.reconciliation import ReconciliationService
+
+
+def frame(start: int) -> pd.DataFrame:
+    return pd.DataFrame({"RRN": [str(i) for i in range(start, start + 100)], "AMOUNT": [10.0] * 100})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParsedFrameCache(directory=str(tmp_path / "cache"), enabled=True)
+
+
+def entry_path(cache, key):
+    return os.path.join(cache.directory, key + ".parquet")
+
+
+def test_keys_cover_content_and_parse_settings():
+    key = ParsedFrameCache.make_key(b"upload", "atm.abc", "eth", "calamine")
+    assert key == ParsedFrameCache.make_key(b"upload", "atm.abc", "eth", "calamine")
+    assert len({key, ParsedFrameCache.make_key(b"upload2", "atm.abc", "eth", "calamine"),
+                ParsedFrameCache.make_key(b"upload", "atm.def", "eth", "calamine"),
+                ParsedFrameCache.make_key(b"upload", "atm.abc", "zzb", "calamine"),
+                ParsedFrameCache.make_key(b"upload", "atm.abc", "eth", "openpyxl")}) == 5
+
+
+def test_miss_then_hit(cache):
+    assert cache.get("a") is None
+    cache.put("a", frame(0))
+    pd.testing.assert_frame_equal(cache.get("a"), frame(0))
+
+
+def test_least_recently_used_entries_are_evicted_past_max_bytes(cache):
+    cache.put("a", frame(0))
+    cache.put("b", frame(100))
+    os.utime(entry_path(cache, "a"), (100, 100))
+    os.utime(entry_path(cache, "b"), (200, 200))
+    # Reading "a" makes "b" the least recently used entry
+    assert cache.get("a") is not None
+
+    size = os.path.getsize(entry_path(cache, "a"))
+    cache.max_bytes = size * 5 // 2
+    cache.put("c", frame(200))
+
+    assert sorted(name.split(".")[0] for name in os.listdir(cache.directory)) == ["a", "c"]
+    assert cache.get("b") is None
+
+
+def test_unreadable_and_uncacheable_entries(cache):
+    with open(entry_path(cache, "broken"), "wb") as f:
+        f.write(b"not parquet")
+    assert cache.get("broken") is None
+    assert not os.path.exists(entry_path(cache, "broken"))
+
+    # Parquet cannot store a column mixing numbers and text
+    cache.put("mixed", pd.DataFrame({"RRN": [1, "A2"]}))
+    assert cache.get("mixed") is None
+    assert os.listdir(cache.directory) == []
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = ParsedFrameCache(directory=str(tmp_path / "cache"), enabled=False)
+    cache.put("a", frame(0))
+    assert cache.get("a") is None
+    assert not (tmp_path / "cache").exists()
+
+
+def test_identical_uploads_are_parsed_once(cache):
+    provider = b"REFNUM,AMOUNT,PAN\n111111,10.0,4111\n"
+    bank = b"TRN_REF_NO,AMOUNT,RRN\nFT1,10.00,111111\n"
+    service = ReconciliationService(cache=cache)
+
+    with collect_timings() as first:
+        eth, zzb = service.load_frames(provider, bank, "atm", "auto")
+    with collect_timings() as second:
+        cached_eth, cached_zzb = service.load_frames(provider, bank, "atm", "auto")
+
+    assert [t.stage for t in first] == ["parse", "rename"]
+    assert second == []
+    pd.testing.assert_frame_equal(cached_eth, eth)
+    pd.testing.assert_frame_equal(cached_zzb, zzb)
+    assert len(os.listdir(cache.directory)) == 2
@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+from app import config
+from app.services.cache import ParsedFrameCache
+from app.services.reconciliation import ReconciliationService, check_mode, find_terminal_columns, terminal_summary
+
+
+@pytest.fixture
+def service():
+    return ReconciliationService(cache=ParsedFrameCache(enabled=False))
+
+
+@pytest.fixture(autouse=True)
+def no_probable_match(monkeypatch):
+    monkeypatch.setattr(config, "PROBABLE_MATCH_ENABLED", False)
+
+
+def bank_frame(rrns, **columns):
+    return pd.DataFrame({"TRN_REF_NO": [f"FT{i}" for i in range(len(rrns))], "AMOUNT": ["10.00"] * len(rrns),
+                         "RRN": rrns, **columns})
+
+
+def provider_frame(refnums, **columns):
+    return pd.DataFrame({
+        "Refnum_F37": refnums,
+        "AMOUNT": [10.0] * len(refnums),
+        "PAN": [f"4111{i}" for i in range(len(refnums))],
+        "Transaction_Description": ["Purchase"] * len(refnums),
+        **columns,
+    })
+
+
+def test_full_mode_appends_provider_only_rows(service):
+    df_eth = provider_frame(["1", "2", "1", "3", None])
+    df_zzb = bank_frame(["1", "4"])
+
+    merged, _ = service.reconcile_frames(df_eth, df_zzb, "atm", "full")
+
+    # A duplicate of a matched key is not provider-only; a row with an empty key is
+    assert merged["Recon_Status"].tolist() == ["MATCHED", "MISSING_IN_PROVIDER",
+                                               "MISSING_IN_BANK", "MISSING_IN_BANK", "MISSING_IN_BANK"]
+    assert merged["PAN"].fillna("").tolist() == ["41110", "", "41111", "41113", "41114"]
+    assert merged["_merge"].tolist() == ["both", "left_only", "right_only", "right_only", "right_only"]
+    assert merged["RRN"].isna().tolist() == [False, False, True, True, True]
+
+
+def test_left_mode_leaves_provider_only_rows_out(service):
+    merged, _ = service.reconcile_frames(provider_frame(["1", "2"]), bank_frame(["1", "4"]), "atm", "left")
+    assert merged["Recon_Status"].tolist() == ["MATCHED", "MISSING_IN_PROVIDER"]
+
+
+def test_modes_are_checked():
+    assert check_mode(None) == "left"
+    assert check_mode(" FULL ") == "full"
+    with pytest.raises(ValueError, match="Unknown reconcile mode"):
+        check_mode("outer")
+
+
+def test_terminal_columns_are_found_by_name():
+    assert find_terminal_columns(["TERMINAL_ID_x", "Term Id", "RRN"]) == ["TERMINAL_ID_x", "Term Id"]
+    assert find_terminal_columns(["Terminal Location Id", "RRN"]) == ["Terminal Location Id"]
+    assert find_terminal_columns(["RRN", 7]) == []
+
+
+def test_terminal_summary_counts_statuses_per_terminal(service):
+    df_eth = provider_frame(["1", "3", "5"], TERMINAL_ID=["T1", "T2", "T3"])
+    df_zzb = bank_frame(["1", "2", "4"], TERMINAL_ID=["T1", "T1", "T2"])
+    merged, _ = service.reconcile_frames(df_eth, df_zzb, "atm", "full")
+
+    summary = terminal_summary(merged)
+    # Provider-only rows use the provider's terminal id; most unmatched first
+    assert summary[0] == {"terminal": "T2", "MATCHED": 0, "MISSING_IN_PROVIDER": 1, "MISSING_IN_BANK": 1, "total": 2}
+    assert [entry["terminal"] for entry in summary] == ["T2", "T1", "T3"]
+    assert terminal_summary(merged.drop(columns=[c for c in merged.columns if "TERMINAL" in c])) is None
+
+    sheets = dict(service.report_sheets(merged, "atm", mode="full"))
+    assert sheets["Missing_In_Bank"]["Refnum_F37"].tolist() == ["3", "5"]
+    assert sheets["Terminals"]["terminal"].tolist() == ["T2", "T1", "T3"]
@@ -0,0 +1,119 @@
+import json
+import os
+import socket
+import stat
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from app.services.jobs import DONE, FAILED, JobManager, JobQueueFullError, ReconciliationJob
+
+
+class BlockingService:
+    """Stands in for ReconciliationService; process_files waits until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def process_files(self, eth_content, zzb_content, recon_type, engine, mode):
+        self.release.wait(5)
+        return pd.DataFrame({"RRN": ["1", "2"], "Recon_Status": ["MATCHED", "MISSING_IN_PROVIDER"]})
+
+
+def wait_finished(manager, job_ids):
+    deadline = time.time() + 5
+    while not all(manager.get(job_id).finished for job_id in job_ids) and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_submissions_over_max_pending_are_refused(tmp_path):
+    service = BlockingService()
+    manager = JobManager(service, max_workers=1, max_pending=2, directory=str(tmp_path))
+    try:
+        jobs = [manager.submit(b"eth", b"zzb") for _ in range(2)]
+        with pytest.raises(JobQueueFullError):
+            manager.submit(b"eth", b"zzb")
+
+        service.release.set()
+        wait_finished(manager, [job.id for job in jobs])
+        assert [manager.get(job.id).status for job in jobs] == [DONE, DONE]
+        # Finished jobs no longer count
+        assert manager.submit(b"eth", b"zzb").status in ("queued", "running", DONE)
+    finally:
+        service.release.set()
+        manager.shutdown()
+
+
+def test_jobs_are_visible_to_other_managers_sharing_the_directory(tmp_path):
+    service = BlockingService()
+    service.release.set()
+    accepting = JobManager(service, max_workers=1, directory=str(tmp_path))
+    other = JobManager(service, max_workers=1, directory=str(tmp_path))
+    try:
+        job_id = accepting.submit(b"eth", b"zzb").id
+        wait_finished(other, [job_id])
+
+        job = other.get(job_id)
+        assert job.status == DONE
+        assert (job.rows, job.mismatch_count) == (2, 1)
+        assert job.summary == {"MATCHED": 1, "MISSING_IN_PROVIDER": 1}
+        assert [row["RRN"] for row in job.preview] == ["1", "2"]
+        assert job.result_df is None
+
+        assert other.load_result(job)
+        assert job.result_df["RRN"].tolist() == ["1", "2"]
+        assert job.mismatch_positions.tolist() == [1]
+        assert other.get("0" * 32) is None
+        assert other.get("../" + job_id) is None
+    finally:
+        accepting.shutdown()
+        other.shutdown()
+
+
+def test_unfinished_job_of_an_exited_process_is_failed(tmp_path):
+    manager = JobManager(BlockingService(), directory=str(tmp_path))
+    job = ReconciliationJob("atm")
+    # Above the largest pid Linux hands out
+    record = {**job.to_dict(), "status": "running", "owner": [socket.gethostname(), 2 ** 22 + 1]}
+    (tmp_path / f"{job.id}.json").write_text(json.dumps(record))
+
+    stored = manager.get(job.id)
+    assert stored.status == FAILED
+    assert stored.finished
+    assert not manager.load_result(stored)
+
+
+def test_results_with_mixed_columns_are_stored_as_arrow(tmp_path):
+    class MixedService(BlockingService):
+        def process_files(self, eth_content, zzb_content, recon_type, engine, mode):
+            return pd.DataFrame({"RRN": [1, "A2", None], "AMOUNT": [1.5, 2.0, 3.0],
+                                 "Recon_Status": ["MATCHED", "MISSING_IN_PROVIDER", "MATCHED"]})
+
+    manager = JobManager(MixedService(), directory=str(tmp_path))
+    try:
+        job = manager.submit(b"", b"")
+        wait_finished(manager, [job.id])
+        assert manager.get(job.id).status == DONE
+        assert sorted(p.name for p in tmp_path.iterdir()) == sorted([f"{job.id}.json", f"{job.id}.arrow"])
+
+        other = JobManager(MixedService(), directory=str(tmp_path))
+        stored = other.get(job.id)
+        assert other.load_result(stored)
+        assert stored.result_df["RRN"].tolist() == ["1", "A2", None]
+        assert stored.result_df["AMOUNT"].tolist() == [1.5, 2.0, 3.0]
+        assert stored.mismatch_positions.tolist() == [1]
+    finally:
+        manager.shutdown()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="directory modes are POSIX only")
+def test_job_directory_open_to_other_users_is_refused(tmp_path):
+    directory = tmp_path / "jobs"
+    JobManager(BlockingService(), directory=str(directory))
+    assert stat.S_IMODE(directory.stat().st_mode) == 0o700
+
+    directory.chmod(0o777)
+    with pytest.raises(RuntimeError, match="mode 0700"):
+        JobManager(BlockingService(), directory=str(directory))
@@ -0,0 +1,86 @@
+import pytest
+
+from app.services.cache import ParsedFrameCache
+from app.services.ledger import DuplicateRunError, IncrementalReconciler, LedgerStore
+from app.services.reconciliation import ReconciliationService
+
+
+def provider_csv(*refnums) -> bytes:
+    lines = ["REFNUM,AMOUNT,PAN,TRANSACTION_DESCRIPTION,ISSUER,ACQUIRER"]
+    lines += [f"{ref},10.0,4111,Purchase,ZamZam,Other" for ref in refnums]
+    return "\n".join(lines).encode()
+
+
+def bank_csv(*rrns) -> bytes:
+    lines = ["TRN_REF_NO,AMOUNT,RRN"] + [f"FT{rrn},10.00,{rrn}" for rrn in rrns]
+    return "\n".join(lines).encode()
+
+
+@pytest.fixture
+def reconciler(tmp_path):
+    service = ReconciliationService(cache=ParsedFrameCache(enabled=False))
+    return IncrementalReconciler(service, LedgerStore(str(tmp_path / "ledger.sqlite")))
+
+
+def test_open_items_carry_over_to_the_next_run(reconciler):
+    merged, run = reconciler.reconcile(provider_csv(111111, 222222), bank_csv(111111, 333333),
+                                       "atm", "2025-01-01")
+    assert merged["Recon_Status"].tolist() == ["MATCHED", "MISSING_IN_PROVIDER"]
+    assert (run["opened_bank"], run["opened_provider"]) == (1, 1)
+
+    # The bank item open since day 1 meets its provider row; the day-1 provider item meets a new bank row
+    merged, run = reconciler.reconcile(provider_csv(333333, 444444), bank_csv(222222),
+                                       "atm", "2025-01-02")
+    assert merged["RRN"].astype(str).tolist() == ["333333", "222222"]
+    assert merged["Recon_Status"].tolist() == ["MATCHED", "MATCHED"]
+    assert merged["Opened_On"].tolist() == ["2025-01-01", "2025-01-02"]
+    assert (run["closed_bank"], run["closed_provider"]) == (1, 1)
+    assert (run["open_bank"], run["open_provider"]) == (0, 1)
+    assert reconciler.store.open_counts("atm") == {
+        "bank": {"total": 0, "by_opened_on": {}},
+        "provider": {"total": 1, "by_opened_on": {"2025-01-02": 1}},
+    }
+
+
+def test_same_uploads_are_applied_once(reconciler):
+    reconciler.reconcile(provider_csv(111111), bank_csv(111111), "atm", "2025-01-01")
+    with pytest.raises(DuplicateRunError):
+        reconciler.reconcile(provider_csv(111111), bank_csv(111111), "atm", "2025-01-02")
+
+
+def test_history_lists_runs_newest_first(reconciler):
+    reconciler.reconcile(provider_csv(111111), bank_csv(111111, 222222), "atm", "2025-01-01")
+    reconciler.reconcile(provider_csv(222222), bank_csv(333333), "atm", "2025-01-02")
+
+    history = reconciler.store.history("atm")
+    assert [run["business_date"] for run in history] == ["2025-01-02", "2025-01-01"]
+    assert history[0]["summary"] == {"MATCHED": 1, "MISSING_IN_PROVIDER": 1}
+    assert (history[0]["closed_bank"], history[0]["open_bank"]) == (1, 1)
+    assert reconciler.store.history("atm", limit=1) == history[:1]
+    # Each recon type keeps its own ledger
+    assert reconciler.store.history("mpesa") == []
+    assert reconciler.store.open_counts("mpesa")["bank"]["total"] == 0
+
+
+def test_provider_rows_without_a_key_are_not_kept_open(reconciler):
+    _, run = reconciler.reconcile(provider_csv(111111, "", 222222, 222222), bank_csv(333333), "atm", "2025-01-01")
+    # 111111 and 222222 open once each; the empty key is dropped
+    assert run["opened_provider"] == 2
+
+
+def test_failed_run_leaves_the_ledger_unchanged(reconciler, monkeypatch):
+    reconciler.reconcile(provider_csv(111111), bank_csv(222222), "atm", "2025-01-01")
+
+    def broken_open_items(*args, **kwargs):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(reconciler.store, "open_items", broken_open_items)
+        with pytest.raises(OSError):
+            reconciler.reconcile(provider_csv(222222), bank_csv(333333), "atm", "2025-01-02")
+
+    assert len(reconciler.store.history("atm")) == 1
+    assert reconciler.store.open_counts("atm")["bank"]["by_opened_on"] == {"2025-01-01": 1}
+    # The uploads of the failed run were not recorded, so they can be applied again
+    _, run = reconciler.reconcile(provider_csv(222222), bank_csv(333333), "atm", "2025-01-02")
+    assert run["closed_bank"] == 1
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app import main
+from app.limits import ReconcileLimiter, UploadLimitMiddleware
+from app.services.jobs import JobManager
+
+MB = 1024 * 1024
+UPLOAD = {"eth_file": ("eth.csv", b"REFNUM,AMOUNT\n1,1\n"), "zzb_file": ("zzb.csv", b"RRN,AMOUNT\n1,1\n")}
+
+
+async def echo_size(request: Request):
+    return JSONResponse({"size": len(await request.body())})
+
+
+@pytest.fixture
+def limited_client():
+    app = Starlette(routes=[Route("/upload", echo_size, methods=["POST"]),
+                            Route("/stream/upload", echo_size, methods=["POST"])])
+    return TestClient(UploadLimitMiddleware(app, default_mb=1, path_mb={"/stream": 2}))
+
+
+def test_bodies_over_the_limit_get_413(limited_client):
+    response = limited_client.post("/upload", content=b"x" * (MB + 1))
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Upload too large, the limit is 1 MB"}
+
+    assert limited_client.post("/upload", content=b"x" * MB).json() == {"size": MB}
+    # Path prefixes get their own limit
+    assert limited_client.post("/stream/upload", content=b"x" * (MB + 1)).status_code == 200
+
+
+def test_chunked_bodies_are_cut_off_at_the_limit(limited_client):
+    # A generator body is sent chunked, without Content-Length
+    response = limited_client.post("/upload", content=(b"x" * (MB // 2) for _ in range(3)))
+    assert response.status_code == 413
+    assert limited_client.post("/upload", content=(b"x" * (MB // 2) for _ in range(2))).json() == {"size": MB}
+
+
+def test_waiting_for_a_busy_slot_times_out_with_503():
+    limiter = ReconcileLimiter(1, timeout=0.05)
+
+    async def scenario():
+        async with limiter.slot():
+            assert limiter.to_dict() == {"in_flight": 1, "waiting": 0, "max_concurrent": 1}
+            with pytest.raises(HTTPException) as raised:
+                async with limiter.slot():
+                    pass
+            return raised.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.headers == {"Retry-After": "1"}
+    assert limiter.to_dict() == {"in_flight": 0, "waiting": 0, "max_concurrent": 1}
+
+
+def test_reconcile_without_a_free_slot_is_turned_away(monkeypatch):
+    limiter = ReconcileLimiter(1, timeout=0.05)
+    # Every slot taken
+    limiter._semaphore = asyncio.Semaphore(0)
+    monkeypatch.setattr(main, "reconcile_limiter", limiter)
+
+    response = TestClient(main.app).post("/api/v1/reconcile", files=UPLOAD)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_job_submissions_over_the_pending_limit_get_503(monkeypatch, tmp_path):
+    class BlockedService:
+        def process_files(self, *args):
+            released.wait(5)
+            raise RuntimeError("stopped")
+
+    released = threading.Event()
+    manager = JobManager(BlockedService(), max_workers=1, max_pending=1, directory=str(tmp_path))
+    monkeypatch.setattr(main, "job_manager", manager)
+    monkeypatch.setattr(main.config, "QUEUE_TIMEOUT_SECONDS", 12.5)
+    client = TestClient(main.app)
+    try:
+        assert client.post("/api/v1/jobs", files=UPLOAD).status_code == 202
+        response = client.post("/api/v1/jobs", files=UPLOAD)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "13"
+    finally:
+        released.set()
+        manager.shutdown()
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from app.main import build_reconcile_payload
+
+
+def result_frame(statuses):
+    return pd.DataFrame({"RRN": [str(i) for i in range(len(statuses))], "Recon_Status": statuses})
+
+
+def test_reconcile_payload_lists_every_mismatch_without_limit():
+    payload = build_reconcile_payload(result_frame(["MATCHED"] + ["MISSING_IN_PROVIDER"] * 1500))
+
+    assert payload["mismatch_total"] == 1500
+    assert len(payload["mismatches"]) == 1500
+    assert payload["limit"] is None
+    assert payload["next_offset"] is None
+
+
+def test_reconcile_payload_pages_with_limit():
+    result_df = result_frame(["MISSING_IN_PROVIDER", "MATCHED", "AMOUNT_MISMATCH", "MISSING_IN_PROVIDER"])
+
+    first = build_reconcile_payload(result_df, offset=0, limit=2)
+    assert [row["RRN"] for row in first["mismatches"]] == ["0", "2"]
+    assert first["next_offset"] == 2
+
+    last = build_reconcile_payload(result_df, offset=first["next_offset"], limit=2)
+    assert [row["RRN"] for row in last["mismatches"]] == ["3"]
+    assert last["next_offset"] is None
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from app.services.match_engine import as_text, canonical_keys, match_keys, match_keys_both, normalize_key_pair
+
+
+def keys(*values):
+    return pd.Series(values, dtype=object)
+
+
+def test_numeric_keys_ignore_leading_zeros_and_excel_float_suffix():
+    positions = match_keys(keys("000123456", "555.0", "777"), keys("123456", "555", "777"))
+    assert positions.tolist() == [0, 1, 2]
+
+
+def test_one_alphanumeric_key_does_not_change_how_other_rows_match():
+    positions = match_keys(keys("000123456", "555.0", "777", "ABC"), keys("123456", "555", "777"))
+    assert positions.tolist() == [0, 1, 2, -1]
+
+    positions = match_keys(keys("123.0", "456"), keys("123", "00456", "XYZ-1"))
+    assert positions.tolist() == [0, 1]
+
+
+def test_numeric_columns_match_text_columns():
+    provider = pd.Series([123.0, np.nan, 456.0])
+    positions = match_keys(keys("00123", "456.00", "ABC", None), provider)
+    assert positions.tolist() == [0, 2, -1, -1]
+    assert normalize_key_pair(pd.Series([1, 2]), provider)[-1] == "int"
+
+
+def test_keys_over_int64_range_still_match_canonically():
+    positions = match_keys(keys("0000000000000000000012", "123456789012345678901"),
+                           keys("12", "123456789012345678901.0"))
+    assert positions.tolist() == [0, 1]
+
+
+def test_empty_keys_never_match():
+    positions = match_keys(keys("", "nan", None, " "), keys("", "nan", None))
+    assert positions.tolist() == [-1, -1, -1, -1]
+
+
+def test_first_duplicate_provider_key_wins():
+    assert match_keys(keys("7"), keys("8", "07", "7.0")).tolist() == [1]
+
+
+def test_right_only_uses_the_same_normalization():
+    positions, right_only = match_keys_both(keys("0042", "X1"), keys("42.0", "x1", "X1", None))
+    assert positions.tolist() == [0, 2]
+    assert right_only.tolist() == [False, True, False, True]
+
+
+def test_canonical_keys():
+    text = canonical_keys(keys(" 0012 ", "12.00", "0.0", "00", "A01", "", "nan", None, "-5"))
+    assert text.tolist()[:5] == ["12", "12", "0", "0", "A01"]
+    assert text.iloc[5:8].isna().all()
+    assert text.iloc[8] == "-5"
+
+
+def test_as_text_writes_integral_floats_without_suffix():
+    assert as_text(pd.Series([1.0, np.nan, 3.0])).tolist()[::2] == ["1", "3"]
+    assert as_text(pd.Series([1.0, np.nan])).isna().tolist() == [False, True]
+    assert as_text(pd.Series([1.5])).tolist() == ["1.5"]
+    assert as_text(keys(" a ", 5)).tolist() == ["a", "5"]
@@ -0,0 +1,96 @@
+import json
+import logging
+import re
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app, recon_service
+from app.services.metrics import PROMETHEUS_MEDIA_TYPE, MetricsRegistry, StageTiming, registry, server_timing_header, stage
+from app.utils.log import LOGGER_NAME, configure_logging
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(registry, "directory", None)
+    # A cached upload would skip the parse stage
+    monkeypatch.setattr(recon_service.cache, "enabled", False)
+    registry.reset()
+    yield TestClient(app)
+    registry.reset()
+
+
+def timing(name: str, seconds: float) -> StageTiming:
+    result = StageTiming(name, "atm")
+    result.seconds = seconds
+    return result
+
+
+def test_server_timing_sums_repeated_stages_in_order():
+    timings = [timing("parse", 0.25), timing("merge", 0.5), timing("parse", 0.25)]
+    assert server_timing_header(timings, 1.2) == "parse;dur=500.0, merge;dur=500.0, total;dur=1200.0"
+    assert server_timing_header([]) == ""
+
+
+def test_reconcile_reports_its_stages_in_server_timing_and_metrics(client):
+    provider = pd.DataFrame({"Refnum_F37": ["111111"], "AMOUNT": [10.0], "PAN": ["4000"]}).to_csv(index=False)
+    bank = pd.DataFrame({"TRN_REF_NO": ["T1"], "AMOUNT": [10.0], "RRN": ["111111"]}).to_csv(index=False)
+    response = client.post("/api/v1/reconcile", data={"recon_type": "atm"},
+                           files={"eth_file": ("eth.csv", provider.encode()), "zzb_file": ("zzb.csv", bank.encode())})
+    assert response.status_code == 200
+
+    durations = dict(re.findall(r"([\w-]+);dur=([\d.]+)", response.headers["Server-Timing"]))
+    assert {"parse", "merge", "json", "total"} <= set(durations)
+    assert float(durations["total"]) >= float(durations["parse"])
+
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"] == PROMETHEUS_MEDIA_TYPE
+    assert 'recon_stage_seconds_count{stage="parse",recon_type="atm"} 1' in metrics.text
+    assert 'recon_stage_seconds_bucket{stage="merge",recon_type="atm",le="+Inf"} 1' in metrics.text
+    assert re.search(r"^process_resident_memory_bytes \d+$", metrics.text, re.M)
+    # /metrics itself runs no stage
+    assert metrics.headers["Server-Timing"].startswith("total;dur=")
+
+
+def test_failed_stages_are_counted(client):
+    with pytest.raises(KeyError):
+        with stage("rename", "mpesa"):
+            raise KeyError("AMOUNT")
+    assert 'recon_stage_errors_total{stage="rename",recon_type="mpesa"} 1' in client.get("/metrics").text
+
+
+def test_metrics_add_up_every_published_process(tmp_path):
+    local = MetricsRegistry(str(tmp_path))
+    local.observe(timing("parse", 0.2))
+    entries = [{"stage": "parse", "recon_type": "atm", "count": 2, "seconds": 1.0, "buckets": [0] * 6 + [2] * 7,
+                "errors": 0, "rows_in": 0, "rows_out": 10, "last_peak_rss": 0, "max_peak_rss": 0}]
+    (tmp_path / "999999.json").write_text(json.dumps(entries))
+
+    totals, pids = local.collect()
+    assert totals[("parse", "atm")]["count"] == 3
+    assert totals[("parse", "atm")]["rows_out"] == 10
+    assert 999999 in pids
+
+
+def test_logging_defers_to_root_handlers(monkeypatch, caplog):
+    logger = logging.getLogger(LOGGER_NAME)
+    monkeypatch.setattr(logger, "handlers", [])
+    # caplog has put a handler on the root logger
+    configure_logging("INFO", "text")
+    assert logger.handlers == []
+    assert logger.propagate
+
+    logging.getLogger("app.tests").info("Reconciled", extra={"rows": 3})
+    assert [(r.name, r.rows) for r in caplog.records] == [("app.tests", 3)]
+
+
+def test_logging_installs_one_handler_without_root_handlers(monkeypatch):
+    logger = logging.getLogger(LOGGER_NAME)
+    monkeypatch.setattr(logger, "handlers", [])
+    monkeypatch.setattr(logging.getLogger(), "handlers", [])
+    configure_logging("INFO", "json")
+    configure_logging("DEBUG", "json")
+    assert len(logger.handlers) == 1
+    assert logger.level == logging.DEBUG
+    assert logger.propagate
@@ -0,0 +1,54 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from app.utils.normalize import normalize_result_frame
+from app.utils.serialization import dumps, records
+
+
+def test_columns_become_plain_text_and_numbers():
+    df = pd.DataFrame({
+        "when": pd.to_datetime(["2025-01-02 10:30", None]),
+        "took": pd.to_timedelta(["1h", None]),
+        "status": pd.Categorical(["MATCHED", None]),
+        "amount": [10.5, np.inf],
+        "count": pd.array([1, None], dtype="Int64"),
+        "rrn": ["000123", None],
+        "clean": [1.0, 2.0],
+    })
+
+    out = normalize_result_frame(df)
+
+    assert out["when"].tolist() == ["2025-01-02 10:30:00", ""]
+    assert out["took"].tolist() == ["0 days 01:00:00", ""]
+    assert out["status"].tolist() == ["MATCHED", ""]
+    assert out["amount"].tolist() == [10.5, ""]
+    assert out["count"].tolist() == [1, ""]
+    assert out["rrn"].tolist() == ["000123", ""]
+    # Columns with nothing to change are the original data
+    assert np.shares_memory(out["clean"].to_numpy(), df["clean"].to_numpy())
+
+
+def test_object_columns_hiding_dates_become_text():
+    df = pd.DataFrame({
+        "date": [pd.Timestamp("2025-01-02"), None, datetime.date(2025, 1, 3)],
+        "mixed": [datetime.datetime(2025, 1, 2, 8), "n/a", 5],
+        "numbers": [1.5, -np.inf, None],
+    }, dtype=object)
+
+    out = normalize_result_frame(df, fill=None)
+
+    assert out["date"].tolist() == ["2025-01-02 00:00:00", None, "2025-01-03"]
+    assert out["mixed"].tolist() == ["2025-01-02 08:00:00", "n/a", "5"]
+    assert out["numbers"].tolist() == [1.5, None, None]
+
+
+def test_input_frame_is_not_modified_and_output_serializes():
+    df = pd.DataFrame({"amount": [1.0, np.nan], "when": pd.to_datetime(["2025-01-02", None])})
+    before = df.copy()
+
+    out = normalize_result_frame(df)
+
+    pd.testing.assert_frame_equal(df, before)
+    assert dumps(records(out)) == b'[{"amount":1.0,"when":"2025-01-02"},{"amount":"","when":""}]'
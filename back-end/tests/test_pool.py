@@ -0,0 +1,34 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app import config
+from app.services.cache import ParsedFrameCache
+from app.services.pool import get_parse_executor, shutdown_executors
+from app.services.reconciliation import ReconciliationService
+
+PROVIDER_CSV = b"REFNUM,AMOUNT,PAN\n111111,10.0,4111\n"
+BANK_CSV = b"TRN_REF_NO,AMOUNT,RRN\nFT1,10.00,111111\n"
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    monkeypatch.setattr(config, "PARSE_POOL_KIND", "process")
+    monkeypatch.setattr(config, "PARSE_POOL_SIZE", 1)
+    shutdown_executors()
+    yield
+    shutdown_executors()
+
+
+def test_broken_parse_pool_is_replaced(process_pool):
+    broken = get_parse_executor()
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result()
+
+    service = ReconciliationService(cache=ParsedFrameCache(enabled=False))
+    df_eth, df_zzb = service.load_frames(PROVIDER_CSV, BANK_CSV, "atm", "auto")
+
+    assert df_eth["Refnum_F37"].tolist() == ["111111"]
+    assert df_zzb["RRN"].tolist() == ["111111"]
+    assert get_parse_executor() is not broken
@@ -0,0 +1,75 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import config
+from app.services.cache import ParsedFrameCache
+from app.services.probable_match import assign_pairs, find_probable_matches
+from app.services.profiles import get_profile
+from app.services.reconciliation import ReconciliationService
+
+
+def test_probable_match_pairs_truncated_references(monkeypatch):
+    monkeypatch.setattr(config, "PROBABLE_MATCH_ENABLED", True)
+    df_eth = pd.DataFrame({
+        "Refnum_F37": ["123456789", "777000111", "888"],
+        "AMOUNT": [10.0, 25.0, 10.0],
+        "Transaction_Description": ["Purchase"] * 3,
+    })
+    df_zzb = pd.DataFrame({
+        "TRN_REF_NO": ["FT1", "FT2", "FT3", "FT4"],
+        "AMOUNT": ["10.00", "25.00", "99.00", "10.00"],
+        "RRN": ["9123456789", "777000111.0", "8123456789", "999999999"],
+    })
+
+    service = ReconciliationService(cache=ParsedFrameCache(enabled=False))
+    merged, positions = service.reconcile_frames(df_eth, df_zzb, "atm")
+
+    # Only the tail with the same amount pairs; the exact (canonical) match stays MATCHED
+    assert merged["Recon_Status"].tolist() == ["PROBABLE_MATCH", "MATCHED", "MISSING_IN_PROVIDER", "MISSING_IN_PROVIDER"]
+    assert merged["Match_Rule"].tolist() == ["reference_tail", "key", "", ""]
+    assert positions.tolist() == [0, 1, -1, -1]
+
+
+def test_pairs_are_assigned_closest_first_each_row_once():
+    candidates = pd.DataFrame({
+        "bank": [0, 0, 1, 1, 2],
+        "provider": [5, 6, 5, 6, 6],
+        "score": [1.0, 2.0, 0.0, 3.0, 1.0],
+    })
+
+    bank, provider = assign_pairs(candidates)
+
+    # 1-5 is the closest; 0-5 then loses its provider row and 2-6 (score 1) beats 0-6 (score 2)
+    assert sorted(zip(bank.tolist(), provider.tolist())) == [(1, 5), (2, 6)]
+
+
+def residue(n, provider_refs):
+    bank = pd.DataFrame({"RRN": [f"{i}00123456" for i in range(1, n + 1)], "AMOUNT": ["10.00"] * n})
+    provider = pd.DataFrame({"Refnum_F37": provider_refs, "AMOUNT": [10.0] * len(provider_refs)})
+    return bank, provider
+
+
+def test_dense_blocks_are_skipped(monkeypatch):
+    monkeypatch.setattr(config, "PROBABLE_MAX_BLOCK_PAIRS", 10_000)
+    # 3000 rows per side share one tail and amount: every pair would tie
+    bank, provider = residue(3000, ["123456"] * 3000)
+
+    started = time.perf_counter()
+    bank_rows, _, _ = find_probable_matches(bank, provider, np.full(len(bank), -1), get_profile("atm"))
+
+    assert len(bank_rows) == 0
+    assert time.perf_counter() - started < 5
+
+
+@pytest.mark.parametrize("limit, paired", [(10_000, 60), (1_000, 0)])
+def test_blocks_up_to_the_limit_are_paired(monkeypatch, limit, paired):
+    monkeypatch.setattr(config, "PROBABLE_MAX_BLOCK_PAIRS", limit)
+    bank, provider = residue(60, ["123456"] * 60)
+
+    bank_rows, provider_rows, _ = find_probable_matches(bank, provider, np.full(len(bank), -1), get_profile("atm"))
+
+    assert len(bank_rows) == paired
+    assert len(set(provider_rows.tolist())) == paired
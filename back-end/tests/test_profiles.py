@@ -0,0 +1,75 @@
+import pytest
+import yaml
+
+from app.services.profiles import RESOLVED_COLUMNS, ColumnMatcher, ProfileRegistry, ReconProfile, get_registry
+
+SPEC = {
+    "provider": {"required_columns": ["REFNUM"], "key": "Ref", "columns": [{"contains": "REFNUM", "rename": "Ref"}]},
+    "bank": {"required_columns": ["RRN"], "key": "RRN", "columns": [{"equals": "RRN", "rename": "RRN"}]},
+}
+
+
+def write_profiles(tmp_path, data) -> str:
+    path = tmp_path / "profiles.yaml"
+    path.write_text(yaml.safe_dump(data))
+    return str(path)
+
+
+def test_shipped_profiles_load():
+    registry = get_registry()
+    assert {"atm", "mpesa", "tele", "tele-incoming"} <= set(registry.names())
+    atm = registry.get(" ATM ")
+    assert atm.name == "atm"
+    assert atm.split_by_issuer_acquirer
+    assert atm.checks_amounts
+    assert not registry.get("mpesa").checks_amounts
+    # Unknown recon types fall back to the default profile
+    assert registry.get("nonexistent") is registry.get(registry.default_profile)
+
+
+def test_profiles_are_read_from_yaml(tmp_path):
+    registry = ProfileRegistry.from_yaml(write_profiles(tmp_path, {
+        "default_profile": "Wallet",
+        "profiles": {"Wallet": {**SPEC, "provider_label": "Wallet Co", "amount_tolerance": {"absolute": 0.5}}},
+    }))
+    profile = registry.get("wallet")
+    assert profile.provider_label == "Wallet Co"
+    assert profile.amount_tolerance[0] == 0.5
+    assert profile.provider.matcher.rename_map(["refnum_f37 ", "Other"]) == {"refnum_f37 ": "Ref"}
+
+
+@pytest.mark.parametrize("data, message", [
+    ({"profiles": {}}, "No profiles defined"),
+    ({"default_profile": "other", "profiles": {"wallet": SPEC}}, "default_profile 'other'"),
+    ({"profiles": {"wallet": {"provider": SPEC["provider"]}}}, "missing 'bank'"),
+    ({"profiles": {"wallet": {**SPEC, "bank": {**SPEC["bank"], "dtypes": {"RRN": "date"}}}}}, "unsupported dtype"),
+    ({"profiles": {"wallet": {**SPEC, "probable_match": [{"type": "fuzzy"}]}}}, "rule type"),
+])
+def test_invalid_profiles_are_refused(tmp_path, data, message):
+    with pytest.raises(ValueError, match=message):
+        ProfileRegistry.from_yaml(write_profiles(tmp_path, data))
+
+
+def test_fingerprint_follows_the_profile_content():
+    reordered = {"bank": SPEC["bank"], "provider": SPEC["provider"]}
+    changed = {**SPEC, "bank": {**SPEC["bank"], "key": "TRN_REF_NO"}}
+    assert ReconProfile("a", SPEC).fingerprint == ReconProfile("b", reordered).fingerprint
+    assert ReconProfile("a", SPEC).fingerprint != ReconProfile("a", changed).fingerprint
+
+
+def test_column_rules_apply_in_order_and_resolved_names_are_bounded():
+    matcher = ColumnMatcher([
+        {"equals": "RRN", "rename": "RRN"},
+        {"contains": "RRN", "rename": "Other_RRN"},
+    ])
+    assert matcher.resolve(" rrn ") == "RRN"
+    assert matcher.resolve("ORIGINAL_RRN") == "Other_RRN"
+    assert matcher.resolve("AMOUNT") is None
+
+    for i in range(RESOLVED_COLUMNS * 2):
+        matcher.resolve(f"junk header {i}")
+    assert matcher.resolve.cache_info().currsize == RESOLVED_COLUMNS
+    assert matcher.resolve(" rrn ") == "RRN"
+
+    with pytest.raises(ValueError, match="exactly one"):
+        ColumnMatcher([{"contains": "A", "equals": "A", "rename": "B"}])
@@ -0,0 +1,93 @@
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.excel_parser import load_excel_dynamic
+from app.utils.readers import ARROW, CSV, PARQUET, XLS, XLSX, check_engine, detect_format, read_columnar
+
+FRAME = pd.DataFrame({"RRN": ["000123", "000456"], "AMOUNT": ["100.00", "250.50"]})
+
+
+def csv_bytes() -> bytes:
+    return ("Bank statement\n\n" + FRAME.to_csv(index=False)).encode()
+
+
+def xlsx_bytes() -> bytes:
+    buffer = io.BytesIO()
+    FRAME.to_excel(buffer, index=False, engine="openpyxl")
+    return buffer.getvalue()
+
+
+def parquet_bytes() -> bytes:
+    buffer = io.BytesIO()
+    pq.write_table(pa.Table.from_pandas(FRAME, preserve_index=False), buffer)
+    return buffer.getvalue()
+
+
+def arrow_bytes(stream: bool = False) -> bytes:
+    table = pa.Table.from_pandas(FRAME, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    new_writer = pa.ipc.new_stream if stream else pa.ipc.new_file
+    with new_writer(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+@pytest.mark.parametrize("content, fmt", [
+    (xlsx_bytes(), XLSX),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"\x00" * 8, XLS),
+    (parquet_bytes(), PARQUET),
+    (arrow_bytes(), ARROW),
+    (arrow_bytes(stream=True), ARROW),
+    (csv_bytes(), CSV),
+    (b"", CSV),
+], ids=["xlsx", "xls", "parquet", "arrow-file", "arrow-stream", "csv", "empty"])
+def test_format_is_detected_from_magic_bytes(content, fmt):
+    assert detect_format(content) == fmt
+
+
+@pytest.mark.parametrize("content", [parquet_bytes(), arrow_bytes(), arrow_bytes(stream=True)],
+                         ids=["parquet", "arrow-file", "arrow-stream"])
+def test_columnar_uploads_are_read_with_their_own_columns(content):
+    pd.testing.assert_frame_equal(read_columnar(content, detect_format(content)), FRAME)
+
+
+@pytest.mark.parametrize("content", [
+    csv_bytes(), FRAME.to_csv(index=False, sep=";").encode(), FRAME.to_csv(index=False, sep="\t").encode(),
+    parquet_bytes(), arrow_bytes(),
+], ids=["csv-title-row", "semicolon", "tab", "parquet", "arrow"])
+def test_text_and_columnar_uploads_keep_reference_numbers_as_text(content):
+    df = load_excel_dynamic(content, ["RRN", "AMOUNT"])
+    assert df.columns.tolist() == ["RRN", "AMOUNT"]
+    assert df["RRN"].tolist() == ["000123", "000456"]
+    assert df["AMOUNT"].astype(float).tolist() == [100.0, 250.5]
+
+
+def test_workbook_header_is_found_below_a_title_row():
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        pd.DataFrame([["Bank statement"]]).to_excel(writer, index=False, header=False)
+        FRAME.to_excel(writer, index=False, startrow=2)
+    df = load_excel_dynamic(buffer.getvalue(), ["RRN", "AMOUNT"], engine="openpyxl")
+    assert df.columns.tolist() == ["RRN", "AMOUNT"]
+    assert df["AMOUNT"].astype(float).tolist() == [100.0, 250.5]
+
+
+def test_engine_names_are_checked():
+    assert check_engine(None) == "auto"
+    assert check_engine(" OpenPyXL ") == "openpyxl"
+    with pytest.raises(ValueError, match="Unknown Excel engine"):
+        check_engine("xlrd")
+
+
+def test_unknown_engine_is_rejected_before_parsing():
+    client = TestClient(app)
+    files = {"eth_file": ("eth.csv", csv_bytes()), "zzb_file": ("zzb.csv", csv_bytes())}
+    response = client.post("/api/v1/jobs", files=files, data={"engine": "bogus"})
+    assert response.status_code == 422
+    assert "Unknown Excel engine" in response.json()["detail"]
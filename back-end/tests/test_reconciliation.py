@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+from app import config
+from app.services.cache import ParsedFrameCache
+from app.services.reconciliation import ReconciliationService
+
+
+@pytest.fixture
+def service():
+    return ReconciliationService(cache=ParsedFrameCache(enabled=False))
+
+
+@pytest.fixture(autouse=True)
+def no_probable_match(monkeypatch):
+    monkeypatch.setattr(config, "PROBABLE_MATCH_ENABLED", False)
+
+
+def bank_frame(rrns, amounts=None):
+    return pd.DataFrame({
+        "TRN_REF_NO": [f"FT{i}" for i in range(len(rrns))],
+        "AMOUNT": amounts if amounts is not None else ["10.00"] * len(rrns),
+        "RRN": rrns,
+    })
+
+
+def provider_frame(refnums, amounts=None):
+    return pd.DataFrame({
+        "Refnum_F37": refnums,
+        "AMOUNT": amounts if amounts is not None else [10.0] * len(refnums),
+        "PAN": [f"4111{i}" for i in range(len(refnums))],
+        "Transaction_Description": ["Purchase"] * len(refnums),
+        "Issuer": ["ZamZam"] * len(refnums),
+        "Acquirer": ["Other"] * len(refnums),
+    })
+
+
+def baseline(df_eth, df_zzb, how):
+    """The reconcile before the match engine: keys as str, first provider row per key, pd.merge."""
+    df_eth = df_eth.copy()
+    df_zzb = df_zzb.copy()
+    df_eth["Refnum_F37"] = df_eth["Refnum_F37"].astype(str).str.strip()
+    df_eth = df_eth.drop_duplicates(subset=["Refnum_F37"])
+    df_zzb["RRN"] = df_zzb["RRN"].astype(str).str.strip()
+    merged = pd.merge(df_zzb, df_eth, left_on="RRN", right_on="Refnum_F37", how=how, indicator=True)
+    merged["Recon_Status"] = merged["_merge"].map({
+        "both": "MATCHED", "left_only": "MISSING_IN_PROVIDER", "right_only": "MISSING_IN_BANK"
+    }).astype(str)
+    return merged
+
+
+def rows(df):
+    columns = ["RRN", "Refnum_F37", "PAN", "Recon_Status"]
+    return sorted(tuple("" if pd.isna(v) else str(v) for v in row) for row in df[columns].itertuples(index=False))
+
+
+@pytest.mark.parametrize("mode, how", [("left", "left"), ("full", "outer")])
+def test_classification_matches_baseline_merge(service, mode, how):
+    df_eth = provider_frame(["200", "100", "500", "100", " 600 "])
+    df_zzb = bank_frame(["100", "200", "300", "200", "400", "600"])
+
+    expected = baseline(df_eth, df_zzb, how)
+    merged, _ = service.reconcile_frames(df_eth.copy(), df_zzb.copy(), "atm", mode)
+
+    assert rows(merged) == rows(expected)
+    # Bank rows keep their order and come first
+    assert merged["RRN"].tolist()[:6] == ["100", "200", "300", "200", "400", "600"]
+    assert merged["Recon_Status"].value_counts()[lambda c: c > 0].to_dict() == \
+        expected["Recon_Status"].value_counts().to_dict()
+
+
+def test_keys_match_in_canonical_form(service):
+    df_eth = provider_frame([123456.0, 555.0, 777.0])
+    df_zzb = bank_frame(["000123456", "555.0", "ABC"])
+
+    merged, positions = service.reconcile_frames(df_eth, df_zzb, "atm")
+
+    assert positions.tolist() == [0, 1, -1]
+    assert merged["Recon_Status"].tolist() == ["MATCHED", "MATCHED", "MISSING_IN_PROVIDER"]
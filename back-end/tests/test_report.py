@@ -0,0 +1,20 @@
+import openpyxl
+import pandas as pd
+
+from app.services.report_writer import write_workbook
+
+
+def test_sheets_are_written_in_chunks_in_row_order(tmp_path):
+    path = tmp_path / "report.xlsx"
+    first = pd.DataFrame({"RRN": [str(i) for i in range(25)], "Amount": [float(i) for i in range(25)]})
+    sheets = [("First", first), ("Empty", first.iloc[:0]), ("Second", first.iloc[:3])]
+
+    assert write_workbook(str(path), iter(sheets), chunk_rows=4) == 28
+
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    assert workbook.sheetnames == ["First", "Empty", "Second"]
+    rows = list(workbook["First"].iter_rows(values_only=True))
+    assert rows[0] == ("RRN", "Amount")
+    assert rows[1:] == [(str(i), i) for i in range(25)]
+    assert list(workbook["Empty"].iter_rows(values_only=True)) == [("RRN", "Amount")]
+    assert len(list(workbook["Second"].iter_rows(values_only=True))) == 4
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from app.services.reconciliation import ReconciliationService
+
+
+def partition(df, recon_type):
+    sheets = ReconciliationService(cache=None).partition_report_sheets(df, recon_type)
+    return [(name, positions.tolist()) for name, positions in sheets]
+
+
+def test_sheets_without_issuer_split_follow_description_order():
+    df = pd.DataFrame({
+        "Match_Key": ["1", "2", "3", "4"],
+        "Transaction_Description": ["Cash Withdrawal", "", "Account2Account", "Cash Withdrawal"],
+        "Recon_Status": ["MATCHED"] * 4,
+    })
+
+    assert partition(df, "mpesa") == [
+        ("ATM", [0, 3]),
+        ("General", [1]),
+        ("A2A", [2]),
+    ]
+
+
+def test_atm_sheets_split_by_issuer_and_acquirer():
+    df = pd.DataFrame({
+        "RRN": [str(i) for i in range(6)],
+        "Transaction_Description": ["Balance Inquiry/Card", "Cash Withdrawal", "Balance Inquiry/Card",
+                                    "Cash Withdrawal", "Balance Inquiry/Card", "Cash Withdrawal"],
+        "Issuer": ["ZamZam Bank", "Other", "Other", "zamzam", "ZamZam", "Other"],
+        "Acquirer": ["ZamZam", "ZamZam", "Other", "Other", "Other", "Other"],
+        "Recon_Status": ["MATCHED"] * 6,
+    })
+
+    # Issue / Acquire / Both within each description; rows where ZamZam is neither side get no sheet
+    # and characters Excel refuses in sheet names are dropped
+    assert partition(df, "atm") == [
+        ("Balance InquiryCard-Issue", [4]),
+        ("Balance InquiryCard-Both", [0]),
+        ("ATM-Issue", [3]),
+        ("ATM-Acquire", [1]),
+    ]
+
+
+def test_partition_matches_filtering_each_sheet():
+    rng = np.random.default_rng(7)
+    n = 2000
+    df = pd.DataFrame({
+        "Transaction_Description": rng.choice(["Cash Withdrawal", "Account2Account", "Balance Inquiry", ""], n),
+        "Issuer": rng.choice(["ZamZam", "Other"], n),
+        "Acquirer": rng.choice(["ZamZam", "Other"], n),
+    })
+
+    expected = []
+    for description in df["Transaction_Description"].unique():
+        name = ReconciliationService.abbreviate_description(None, description or "General")
+        rows = df["Transaction_Description"] == description
+        issuer, acquirer = df["Issuer"] == "ZamZam", df["Acquirer"] == "ZamZam"
+        for side, mask in (("Issue", issuer & ~acquirer), ("Acquire", acquirer & ~issuer), ("Both", issuer & acquirer)):
+            positions = np.flatnonzero((rows & mask).to_numpy()).tolist()
+            if positions:
+                expected.append((f"{name}-{side}", positions))
+
+    assert partition(df, "atm") == expected
@@ -0,0 +1,43 @@
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from app.services.reconciliation import ReconciliationService, combine_sheets
+
+
+def atm_result():
+    return pd.DataFrame({
+        "RRN": ["1", "2", "3", "4", "5"],
+        "Transaction_Description": ["Purchase", "POS PUR THEM-ON-THEM", "Purchase", "Cash Withdrawal", "POS PUR THEM-ON-THEM"],
+        "Issuer": ["ZamZam", "ZamZam", "Other", "ZamZam", "ZamZam"],
+        "Acquirer": ["Other", "Other", "ZamZam", "Other", "Other"],
+        "Recon_Status": ["MATCHED", "MISSING_IN_PROVIDER", "MATCHED", "MATCHED", "MATCHED"],
+    })
+
+
+def test_descriptions_abbreviating_to_one_sheet_name_share_the_sheet():
+    sheets = ReconciliationService(cache=None).partition_report_sheets(atm_result(), "atm")
+
+    assert [(name, positions.tolist()) for name, positions in sheets] == [
+        ("POS-Issue", [0, 1, 4]),
+        ("POS-Acquire", [2]),
+        ("ATM-Issue", [3]),
+    ]
+
+
+def test_report_with_colliding_sheet_names_is_written(tmp_path):
+    path = tmp_path / "report.xlsx"
+    ReconciliationService(cache=None).write_excel_report(atm_result(), str(path), "atm")
+
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    assert workbook.sheetnames == ["Dashboard", "POS-Issue", "POS-Acquire", "ATM-Issue", "Action_Required"]
+    assert [row[0] for row in workbook["POS-Issue"].iter_rows(min_row=2, values_only=True)] == ["1", "2", "5"]
+
+
+def test_combine_sheets_merges_names_excel_treats_as_equal():
+    sheets = [("POS-Issue", np.array([0, 4])), ("ATM", np.array([1])), ("pos-issue", np.array([2, 3]))]
+
+    assert [(name, positions.tolist()) for name, positions in combine_sheets(sheets)] == [
+        ("POS-Issue", [0, 2, 3, 4]),
+        ("ATM", [1]),
+    ]
@@ -0,0 +1,25 @@
+import pandas as pd
+
+from app.services.streaming import StreamingReconciler
+
+
+def test_stream_matches_keys_in_canonical_form(tmp_path):
+    eth_path, zzb_path, out_path = tmp_path / "eth.csv", tmp_path / "zzb.csv", tmp_path / "out.csv"
+    pd.DataFrame({
+        "REFNUM": ["123456", "555", "777", "ABC", "777"],
+        "AMOUNT": [10.0, 20.0, 30.0, 40.0, 99.0],
+        "PAN": ["4111"] * 5,
+    }).to_csv(eth_path, index=False)
+    pd.DataFrame({
+        "TRN_REF_NO": ["FT1", "FT2", "FT3", "FT4", "FT5"],
+        "AMOUNT": ["10.00", "20.00", "31.00", "40.00", "50.00"],
+        "RRN": ["000123456", "555.0", " 777 ", "ABC", ""],
+    }).to_csv(zzb_path, index=False)
+
+    result = StreamingReconciler(chunk_rows=2).reconcile(str(eth_path), str(zzb_path), str(out_path), "atm")
+
+    out = pd.read_csv(out_path, dtype=str, keep_default_na=False)
+    # The first provider row of a key wins, the empty key never matches
+    assert out["Recon_Status"].tolist() == ["MATCHED", "MATCHED", "AMOUNT_MISMATCH", "MATCHED", "MISSING_IN_PROVIDER"]
+    assert out["Refnum_F37"].tolist() == ["123456", "555", "777", "ABC", ""]
+    assert result == {"summary": {"MATCHED": 3, "AMOUNT_MISMATCH": 1, "MISSING_IN_PROVIDER": 1}, "rows": 5}